@@ -0,0 +1,757 @@
+"""
+Motor de batallas puro: reglas de combate y simulación del mejor de 3.
+
+No depende de la base de datos ni de FastAPI. Trabaja sobre registros simples
+(`PokemonStats`, `TrainerInfo`) que se pueden serializar con pickle, por lo que
+la simulación completa puede ejecutarse en un `ProcessPoolExecutor` mientras el
+event loop solo carga datos y persiste resultados.
+"""
+from dataclasses import asdict, dataclass, field, replace
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import random
+import time
+
+from .type_chart import get_type_multiplier
+
+# Versión de las reglas del motor. Debe incrementarse con cualquier cambio que
+# altere el resultado de una batalla para una misma semilla (orden de tiradas,
+# fórmulas, textos del registro), ya que las repeticiones dependen de ello.
+ENGINE_VERSION = 1
+
+# Nivel máximo de un Pokémon (las subidas de nivel se recortan a este valor)
+MAX_POKEMON_LEVEL = 100
+
+# Generador por defecto para llamadas sueltas (las batallas usan el suyo propio)
+_default_rng = random.Random()
+
+# --------------------------------------------------
+# EVENTOS DE BATALLA
+# --------------------------------------------------
+
+class BattleEvent(NamedTuple):
+    """
+    Suceso compacto de una batalla. El significado de cada campo según `kind`:
+
+    - EVENT_ROUND_START: turn = número de ronda.
+    - EVENT_SEND_OUT: side sale con `pokemon` (id); con FLAG_KEPT, hp = HP arrastrado.
+    - EVENT_START: hp = HP inicial del entrenador, damage = HP inicial del oponente.
+    - EVENT_FIRST_ATTACKER: side ataca primero.
+    - EVENT_ATTACK: side usa `move` y causa `damage`; hp = HP restante del defensor.
+    - EVENT_COUNTER: side contraataca antes de debilitarse; hp = HP restante del rival.
+    - EVENT_FAINT: el Pokémon de side se debilitó.
+    - EVENT_LEVEL_UP: `pokemon` de side sube `damage` niveles; hp = nuevo nivel.
+    - EVENT_ROUND_END: side gana la ronda (SIDE_DRAW si empatan); damage/hp = marcador.
+    """
+    kind: int
+    turn: int
+    side: int
+    pokemon: int
+    move: str
+    damage: int
+    flags: int
+    hp: int
+
+EVENT_ROUND_START = 0
+EVENT_SEND_OUT = 1
+EVENT_START = 2
+EVENT_FIRST_ATTACKER = 3
+EVENT_ATTACK = 4
+EVENT_COUNTER = 5
+EVENT_FAINT = 6
+EVENT_LEVEL_UP = 7
+EVENT_ROUND_END = 8
+
+SIDE_TRAINER = 0
+SIDE_OPPONENT = 1
+SIDE_DRAW = 2
+
+FLAG_CRITICAL = 1
+FLAG_SPECIAL = 2
+FLAG_RESISTED = 4
+FLAG_SUPER_EFFECTIVE = 8
+FLAG_NOT_EFFECTIVE = 16
+FLAG_KEPT = 32
+
+# --------------------------------------------------
+# REGISTROS DE ENTRADA
+# --------------------------------------------------
+
+@dataclass
+class PokemonStats:
+    """Estadísticas de un Pokémon necesarias para simular un combate"""
+    id: int
+    name: str
+    element: Optional[str] = None
+    hp: Optional[int] = None
+    attack: Optional[int] = None
+    defense: Optional[int] = None
+    special_attack: Optional[int] = None
+    special_defense: Optional[int] = None
+    speed: Optional[int] = None
+    moves: List[str] = field(default_factory=list)
+    current_hp: Optional[int] = None
+    level: int = 1
+
+    @classmethod
+    def from_pokemon(cls, pokemon) -> "PokemonStats":
+        """Crea el registro a partir de un objeto ORM o esquema Pydantic"""
+        return cls(
+            id=pokemon.id,
+            name=pokemon.name,
+            element=pokemon.element,
+            hp=pokemon.hp,
+            attack=pokemon.attack,
+            defense=pokemon.defense,
+            special_attack=pokemon.special_attack,
+            special_defense=pokemon.special_defense,
+            speed=pokemon.speed,
+            moves=list(pokemon.moves or []),
+            current_hp=pokemon.current_hp,
+            level=pokemon.level if pokemon.level is not None else 1,
+        )
+
+@dataclass
+class TrainerInfo:
+    """Datos de un entrenador usados por la simulación"""
+    id: int
+    name: str
+
+    @classmethod
+    def from_trainer(cls, trainer) -> "TrainerInfo":
+        return cls(id=trainer.id, name=trainer.name)
+
+def build_snapshot(
+    trainer: TrainerInfo,
+    opponent: TrainerInfo,
+    trainer_roster: Sequence[PokemonStats],
+    opponent_roster: Sequence[PokemonStats]
+) -> dict:
+    """Foto serializable en JSON de las entradas de una batalla (antes de subir de nivel)"""
+    return {
+        "trainer": asdict(trainer),
+        "opponent": asdict(opponent),
+        "trainer_roster": [asdict(p) for p in trainer_roster],
+        "opponent_roster": [asdict(p) for p in opponent_roster],
+    }
+
+def load_snapshot(snapshot: dict) -> tuple:
+    """
+    Reconstruye los registros guardados con `build_snapshot`.
+    Retorna: (trainer, opponent, trainer_roster, opponent_roster)
+    """
+    return (
+        TrainerInfo(**snapshot["trainer"]),
+        TrainerInfo(**snapshot["opponent"]),
+        [PokemonStats(**p) for p in snapshot["trainer_roster"]],
+        [PokemonStats(**p) for p in snapshot["opponent_roster"]],
+    )
+
+# --------------------------------------------------
+# MECÁNICAS DE COMBATE MEJORADAS CON NIVELES
+# --------------------------------------------------
+
+def get_random_attack(pokemon: PokemonStats, rng: random.Random = _default_rng) -> str:
+    """Obtiene un ataque aleatorio de los movimientos del Pokémon con 30% de probabilidad de ataque especial"""
+    if pokemon.moves and len(pokemon.moves) > 0:
+        if rng.random() < 0.3 and hasattr(pokemon, 'special_attack'):
+            return f"{rng.choice(pokemon.moves)} (Especial)"
+        return rng.choice(pokemon.moves)
+    return rng.choice(["Placaje", "Arañazo", "Gruñido"])
+
+def calculate_damage(
+    attacker: PokemonStats,
+    defender: PokemonStats,
+    attack_used: str,
+    attacker_level: int = 1,
+    defender_level: int = 1,
+    type_multiplier: Optional[float] = None,
+    rng: random.Random = _default_rng
+) -> tuple:
+    """
+    Calcula el daño de un ataque considerando:
+    - Ataque/Defensa base o Ataque Especial/Defensa Especial
+    - Ventaja de tipo (se puede pasar ya calculada en `type_multiplier`)
+    - Nivel del Pokémon
+    - Aleatoriedad
+    Retorna: (daño, es_crítico, es_especial, resistió)
+    """
+    # Determinar si es un ataque especial
+    is_special = "especial" in attack_used.lower()
+
+    # Daño base con variación aleatoria
+    if is_special and hasattr(attacker, 'special_attack'):
+        base_damage = rng.randint(5, min(attacker.special_attack, 100) or 20)
+        defense_stat = defender.special_defense if hasattr(defender, 'special_defense') else (defender.defense or 10)
+    else:
+        base_damage = rng.randint(5, min(attacker.attack, 100) or 15)
+        defense_stat = defender.defense or 10
+
+    # Bonus por nivel del Pokémon (1-2% por nivel)
+    attacker_level_bonus = 1 + (attacker_level * 0.02)
+    base_damage = int(base_damage * attacker_level_bonus)
+
+    # Reducción por defensa y nivel del defensor (1-1.5% por nivel)
+    defense_level_reduction = max(1, defense_stat / (10 * (1 + defender_level * 0.015)))
+
+    # Multiplicador por tipo
+    if type_multiplier is None:
+        type_multiplier = get_type_multiplier(attacker.element or "Normal", defender.element or "Normal")
+
+    # Daño final
+    damage = max(1, int((base_damage * type_multiplier) / defense_level_reduction))
+
+    # Bonus adicional por ataque especial
+    if is_special:
+        damage = int(damage * 1.3)  # 30% más de daño para ataques especiales
+
+    # Posibilidad de golpe crítico (10% base + 0.1% por nivel del atacante)
+    critical_chance = 0.1 + (attacker_level * 0.001)
+    is_critical = rng.random() < critical_chance
+    if is_critical:
+        damage = int(damage * 1.5)
+
+    # Probabilidad de resistencia (0.1% por nivel del defensor)
+    resist_chance = defender_level * 0.001
+    if rng.random() < resist_chance:
+        damage = max(1, int(damage * 0.7))  # Reduce el daño en 30%
+        return damage, is_critical, is_special, True  # Último parámetro indica resistencia
+
+    return damage, is_critical, is_special, False
+
+def determine_first_attacker(
+    pokemon1: PokemonStats,
+    pokemon2: PokemonStats,
+    rng: random.Random = _default_rng
+) -> tuple:
+    """
+    Determina qué Pokémon ataca primero basado en la velocidad y nivel.
+    Retorna: (attacker, defender, is_pokemon1_first)
+    """
+    # Velocidad base + 1% por nivel
+    speed1 = (pokemon1.speed if hasattr(pokemon1, 'speed') and pokemon1.speed else 50) * (1 + (pokemon1.level if hasattr(pokemon1, 'level') else 1) * 0.01)
+    speed2 = (pokemon2.speed if hasattr(pokemon2, 'speed') and pokemon2.speed else 50) * (1 + (pokemon2.level if hasattr(pokemon2, 'level') else 1) * 0.01)
+
+    if speed1 == speed2:
+        # Empate en velocidad, se decide al azar
+        if rng.random() < 0.5:
+            return pokemon1, pokemon2, True
+        else:
+            return pokemon2, pokemon1, False
+    elif speed1 > speed2:
+        return pokemon1, pokemon2, True
+    else:
+        return pokemon2, pokemon1, False
+
+def calculate_level_up(pokemon: PokemonStats, battle_duration: int, is_winner: bool) -> int:
+    """
+    Calcula cuántos niveles sube un Pokémon después de una batalla
+    - battle_duration: Número de turnos que duró la batalla
+    - is_winner: Si el Pokémon ganó la batalla
+    """
+    if pokemon.level >= MAX_POKEMON_LEVEL:
+        return 0
+
+    base_exp = 10
+    duration_bonus = min(battle_duration * 0.2, 20)  # Máximo 20 de bonus por duración
+    winner_bonus = 15 if is_winner else 0
+
+    total_exp = base_exp + duration_bonus + winner_bonus
+    levels_gained = min(int(total_exp / 20), 2)  # Máximo 2 niveles por batalla
+
+    return min(levels_gained, MAX_POKEMON_LEVEL - pokemon.level)
+
+# --------------------------------------------------
+# SIMULACIÓN DE BATALLA INDIVIDUAL
+# --------------------------------------------------
+
+def simulate_single_battle(
+    trainer: TrainerInfo,
+    opponent: TrainerInfo,
+    trainer_pokemon: PokemonStats,
+    opponent_pokemon: PokemonStats,
+    previous_trainer_hp: Optional[int] = None,
+    rng: random.Random = _default_rng,
+    events: Optional[List[BattleEvent]] = None
+) -> dict:
+    """
+    Simula una sola batalla entre dos Pokémon.
+    Todas las tiradas usan `rng`, de modo que la misma semilla reproduce la batalla.
+    Los sucesos se agregan a `events` como tuplas `BattleEvent`; el texto se genera
+    aparte con `render_battle_log` solo si alguien lo pide.
+    Retorna un diccionario con el resultado.
+    """
+    if events is None:
+        events = []
+
+    # Inicialización de HP
+    max_trainer_hp = trainer_pokemon.hp or 100
+    max_opponent_hp = opponent_pokemon.hp or 100
+    trainer_hp = previous_trainer_hp if previous_trainer_hp is not None else (trainer_pokemon.current_hp if trainer_pokemon.current_hp is not None else max_trainer_hp)
+    opponent_hp = opponent_pokemon.current_hp if opponent_pokemon.current_hp is not None else max_opponent_hp
+
+    # Obtener niveles de los Pokémon
+    trainer_pokemon_level = trainer_pokemon.level
+    opponent_pokemon_level = opponent_pokemon.level
+
+    last_trainer_attack = ""
+    last_opponent_attack = ""
+    turn_count = 0
+
+    # Multiplicadores de tipo (constantes durante toda la batalla)
+    trainer_multiplier = get_type_multiplier(trainer_pokemon.element or "Normal", opponent_pokemon.element or "Normal")
+    opponent_multiplier = get_type_multiplier(opponent_pokemon.element or "Normal", trainer_pokemon.element or "Normal")
+
+    # Determinar quién ataca primero
+    _, _, is_trainer_first = determine_first_attacker(
+        trainer_pokemon, opponent_pokemon, rng
+    )
+
+    events.append(BattleEvent(EVENT_START, 0, SIDE_TRAINER, 0, "", opponent_hp, 0, trainer_hp))
+    events.append(BattleEvent(EVENT_FIRST_ATTACKER, 0, SIDE_TRAINER if is_trainer_first else SIDE_OPPONENT, 0, "", 0, 0, 0))
+
+    # Sistema de turnos
+    while True:
+        turn_count += 1
+
+        # Verificar si la batalla ha terminado
+        if trainer_hp <= 0 or opponent_hp <= 0:
+            break
+
+        # Turno del atacante actual
+        if is_trainer_first:
+            attacker_pokemon = trainer_pokemon
+            defender_pokemon = opponent_pokemon
+            attacker_level = trainer_pokemon_level
+            defender_level = opponent_pokemon_level
+            type_multiplier = trainer_multiplier
+        else:
+            attacker_pokemon = opponent_pokemon
+            defender_pokemon = trainer_pokemon
+            attacker_level = opponent_pokemon_level
+            defender_level = trainer_pokemon_level
+            type_multiplier = opponent_multiplier
+
+        # Ataque
+        attack_used = get_random_attack(attacker_pokemon, rng)
+        damage, is_critical, is_special, resisted = calculate_damage(
+            attacker_pokemon,
+            defender_pokemon,
+            attack_used,
+            attacker_level,
+            defender_level,
+            type_multiplier,
+            rng
+        )
+
+        # Registrar el último ataque y aplicar daño (el HP no puede ser negativo)
+        if is_trainer_first:
+            last_trainer_attack = attack_used
+            opponent_hp = max(0, opponent_hp - damage)
+            remaining_hp = opponent_hp
+        else:
+            last_opponent_attack = attack_used
+            trainer_hp = max(0, trainer_hp - damage)
+            remaining_hp = trainer_hp
+
+        flags = (
+            (FLAG_CRITICAL if is_critical else 0)
+            | (FLAG_SPECIAL if is_special else 0)
+            | (FLAG_RESISTED if resisted else 0)
+            | (FLAG_SUPER_EFFECTIVE if type_multiplier > 1.5 else 0)
+            | (FLAG_NOT_EFFECTIVE if type_multiplier < 0.5 else 0)
+        )
+        attacker_side = SIDE_TRAINER if is_trainer_first else SIDE_OPPONENT
+        events.append(BattleEvent(EVENT_ATTACK, turn_count, attacker_side, 0, attack_used, damage, flags, remaining_hp))
+
+        # Verificar si el defensor se debilitó
+        if remaining_hp <= 0:
+            defender_side = SIDE_OPPONENT if is_trainer_first else SIDE_TRAINER
+
+            # 10% + 0.1% por nivel de probabilidad de un último ataque antes de debilitarse
+            last_attack_chance = 0.1 + defender_level * 0.001
+            if rng.random() < last_attack_chance:
+                last_attack = get_random_attack(defender_pokemon, rng)
+                last_damage, last_critical, last_special, _ = calculate_damage(
+                    defender_pokemon,
+                    attacker_pokemon,
+                    last_attack,
+                    defender_level,
+                    attacker_level,
+                    opponent_multiplier if is_trainer_first else trainer_multiplier,
+                    rng
+                )
+
+                if is_trainer_first:
+                    trainer_hp = max(0, trainer_hp - last_damage)
+                    attacker_hp = trainer_hp
+                else:
+                    opponent_hp = max(0, opponent_hp - last_damage)
+                    attacker_hp = opponent_hp
+
+                counter_flags = (FLAG_CRITICAL if last_critical else 0) | (FLAG_SPECIAL if last_special else 0)
+                events.append(BattleEvent(EVENT_COUNTER, turn_count, defender_side, 0, last_attack, last_damage, counter_flags, attacker_hp))
+
+            events.append(BattleEvent(EVENT_FAINT, turn_count, defender_side, 0, "", 0, 0, 0))
+            break
+
+        # Cambiar turnos para el siguiente ataque
+        is_trainer_first = not is_trainer_first
+
+    # Determinar el ganador de esta batalla
+    if trainer_hp > 0 and opponent_hp <= 0:
+        winner = "trainer"
+        winner_name = trainer.name
+        winner_pokemon = trainer_pokemon
+        loser_name = opponent.name
+        loser_pokemon = opponent_pokemon
+    elif opponent_hp > 0 and trainer_hp <= 0:
+        winner = "opponent"
+        winner_name = opponent.name
+        winner_pokemon = opponent_pokemon
+        loser_name = trainer.name
+        loser_pokemon = trainer_pokemon
+    else:
+        winner = "draw"
+        winner_name = "Empate"
+        loser_name = "Empate"
+        winner_pokemon = None
+        loser_pokemon = None
+
+    # Calcular subida de nivel para los Pokémon
+    trainer_levels_gained = calculate_level_up(trainer_pokemon, turn_count, winner == "trainer")
+    opponent_levels_gained = calculate_level_up(opponent_pokemon, turn_count, winner == "opponent")
+
+    if trainer_levels_gained > 0:
+        events.append(BattleEvent(EVENT_LEVEL_UP, turn_count, SIDE_TRAINER, trainer_pokemon.id, "", trainer_levels_gained, 0, trainer_pokemon_level + trainer_levels_gained))
+    if opponent_levels_gained > 0:
+        events.append(BattleEvent(EVENT_LEVEL_UP, turn_count, SIDE_OPPONENT, opponent_pokemon.id, "", opponent_levels_gained, 0, opponent_pokemon_level + opponent_levels_gained))
+
+    return {
+        "winner": winner,
+        "winner_name": winner_name,
+        "loser_name": loser_name,
+        "winner_pokemon": winner_pokemon,
+        "loser_pokemon": loser_pokemon,
+        "trainer_hp_remaining": max(0, trainer_hp),
+        "opponent_hp_remaining": max(0, opponent_hp),
+        "events": events,
+        "trainer_pokemon": trainer_pokemon,
+        "opponent_pokemon": opponent_pokemon,
+        "last_trainer_attack": last_trainer_attack,
+        "last_opponent_attack": last_opponent_attack,
+        "turn_count": turn_count,
+        "trainer_levels_gained": trainer_levels_gained,
+        "opponent_levels_gained": opponent_levels_gained
+    }
+
+# --------------------------------------------------
+# SIMULACIÓN DE BATALLA COMPLETA (MEJOR DE 3)
+# --------------------------------------------------
+
+def simulate_best_of_three(
+    trainer: TrainerInfo,
+    opponent: TrainerInfo,
+    trainer_roster: Sequence[PokemonStats],
+    opponent_roster: Sequence[PokemonStats],
+    keep_winner_pokemon: bool = True,
+    seed: Optional[int] = None,
+    render_log: bool = False,
+    events: Optional[List[BattleEvent]] = None
+) -> dict:
+    """
+    Simula un combate completo (mejor de 3) sin tocar la base de datos.
+    Los registros recibidos no se modifican: las subidas de nivel se aplican
+    sobre copias. `levels_gained` suma los niveles de todas las rondas por
+    Pokémon (para persistirlos en una sola sentencia) y `level_ups` trae el
+    nivel final de cada uno.
+
+    Cada combate usa su propio generador inicializado con `seed` (se genera una
+    si no se indica). Con la misma semilla, los mismos registros y la misma
+    `ENGINE_VERSION` el resultado y el registro de batalla son idénticos.
+
+    Los sucesos se devuelven en `events`; el texto en español (`battle_log`)
+    solo se genera con `render_log=True`. Se puede pasar una lista propia en
+    `events` para observar los sucesos a medida que se producen.
+
+    Retorna un diccionario con las rondas, los eventos, el marcador, el ganador
+    general y los niveles finales de los Pokémon que subieron.
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 63)
+    rng = random.Random(seed)
+
+    # Copias locales: los niveles cambian entre rondas
+    trainer_pokemons = [replace(p) for p in trainer_roster]
+    opponent_pokemons = [replace(p) for p in opponent_roster]
+
+    if events is None:
+        events = []
+    battle_results = []
+    trainer_wins = 0
+    opponent_wins = 0
+    level_ups = {}
+    levels_gained: Dict[int, int] = {}
+
+    # Variables para mantener Pokémon ganadores entre batallas
+    current_trainer_pokemon = None
+    current_opponent_pokemon = None
+
+    # Mejor de 3 batallas
+    for battle_num in range(1, 4):
+        events.append(BattleEvent(EVENT_ROUND_START, battle_num, SIDE_TRAINER, 0, "", 0, 0, 0))
+
+        # Selección de Pokémon para esta batalla
+        if keep_winner_pokemon and current_trainer_pokemon and current_trainer_pokemon.get("hp_remaining", 0) > 0:
+            trainer_pokemon = current_trainer_pokemon["pokemon"]
+            events.append(BattleEvent(EVENT_SEND_OUT, battle_num, SIDE_TRAINER, trainer_pokemon.id, "", 0, FLAG_KEPT, current_trainer_pokemon["hp_remaining"]))
+        else:
+            trainer_pokemon = rng.choice(trainer_pokemons)
+            events.append(BattleEvent(EVENT_SEND_OUT, battle_num, SIDE_TRAINER, trainer_pokemon.id, "", 0, 0, 0))
+            current_trainer_pokemon = None
+
+        if keep_winner_pokemon and current_opponent_pokemon and current_opponent_pokemon.get("hp_remaining", 0) > 0:
+            opponent_pokemon = current_opponent_pokemon["pokemon"]
+            events.append(BattleEvent(EVENT_SEND_OUT, battle_num, SIDE_OPPONENT, opponent_pokemon.id, "", 0, FLAG_KEPT, current_opponent_pokemon["hp_remaining"]))
+        else:
+            opponent_pokemon = rng.choice(opponent_pokemons)
+            events.append(BattleEvent(EVENT_SEND_OUT, battle_num, SIDE_OPPONENT, opponent_pokemon.id, "", 0, 0, 0))
+            current_opponent_pokemon = None
+
+        # Simular la batalla individual
+        previous_trainer_hp = current_trainer_pokemon["hp_remaining"] if current_trainer_pokemon else None
+        result = simulate_single_battle(
+            trainer, opponent, trainer_pokemon, opponent_pokemon, previous_trainer_hp, rng, events
+        )
+
+        # Actualizar niveles de los Pokémon
+        if result["trainer_levels_gained"] > 0:
+            trainer_pokemon.level = min(MAX_POKEMON_LEVEL, trainer_pokemon.level + result["trainer_levels_gained"])
+            level_ups[trainer_pokemon.id] = trainer_pokemon.level
+            levels_gained[trainer_pokemon.id] = levels_gained.get(trainer_pokemon.id, 0) + result["trainer_levels_gained"]
+
+        if result["opponent_levels_gained"] > 0:
+            opponent_pokemon.level = min(MAX_POKEMON_LEVEL, opponent_pokemon.level + result["opponent_levels_gained"])
+            level_ups[opponent_pokemon.id] = opponent_pokemon.level
+            levels_gained[opponent_pokemon.id] = levels_gained.get(opponent_pokemon.id, 0) + result["opponent_levels_gained"]
+
+        # Actualizar conteo de victorias
+        if result["winner"] == "trainer":
+            trainer_wins += 1
+            round_winner = SIDE_TRAINER
+            if keep_winner_pokemon:
+                current_trainer_pokemon = {
+                    "pokemon": result["winner_pokemon"],
+                    "hp_remaining": result["trainer_hp_remaining"]
+                }
+                current_opponent_pokemon = None
+        elif result["winner"] == "opponent":
+            opponent_wins += 1
+            round_winner = SIDE_OPPONENT
+            if keep_winner_pokemon:
+                current_opponent_pokemon = {
+                    "pokemon": result["winner_pokemon"],
+                    "hp_remaining": result["opponent_hp_remaining"]
+                }
+                current_trainer_pokemon = None
+        else:
+            round_winner = SIDE_DRAW
+            current_trainer_pokemon = None
+            current_opponent_pokemon = None
+
+        events.append(BattleEvent(EVENT_ROUND_END, battle_num, round_winner, 0, "", trainer_wins, 0, opponent_wins))
+
+        # Guardar resultados
+        battle_results.append(result)
+
+        # Verificar si ya hay un ganador definitivo
+        if trainer_wins >= 2 or opponent_wins >= 2:
+            break
+
+    # Determinar el ganador general
+    if trainer_wins > opponent_wins:
+        overall_winner = trainer.name
+        overall_winner_id = trainer.id
+        overall_loser = opponent.name
+    elif opponent_wins > trainer_wins:
+        overall_winner = opponent.name
+        overall_winner_id = opponent.id
+        overall_loser = trainer.name
+    else:
+        overall_winner = "Empate"
+        overall_winner_id = None
+        overall_loser = "Empate"
+
+    outcome = {
+        "winner_id": overall_winner_id,
+        "winner_name": overall_winner,
+        "loser_name": overall_loser,
+        "trainer_wins": trainer_wins,
+        "opponent_wins": opponent_wins,
+        "rounds": battle_results,
+        "events": events,
+        "battle_log": None,
+        "level_ups": level_ups,
+        "levels_gained": levels_gained,
+        "keep_winner_pokemon": keep_winner_pokemon,
+        "seed": seed,
+        "engine_version": ENGINE_VERSION
+    }
+    if render_log:
+        outcome["battle_log"] = render_battle_log(
+            events, trainer, opponent, trainer_roster, opponent_roster, keep_winner_pokemon
+        )
+    return outcome
+
+def simulate_best_of_three_timed(
+    trainer: TrainerInfo,
+    opponent: TrainerInfo,
+    trainer_roster: Sequence[PokemonStats],
+    opponent_roster: Sequence[PokemonStats],
+    keep_winner_pokemon: bool = True,
+    seed: Optional[int] = None,
+    render_log: bool = False
+) -> dict:
+    """
+    Igual que `simulate_best_of_three`, pero mide por separado el bucle de
+    combate y la generación del registro de texto. Agrega `timings` al
+    resultado: segundos de cada fase ("simulate" y "render").
+    """
+    start = time.perf_counter()
+    outcome = simulate_best_of_three(
+        trainer, opponent, trainer_roster, opponent_roster, keep_winner_pokemon, seed
+    )
+    simulated = time.perf_counter()
+    if render_log:
+        outcome["battle_log"] = render_battle_log(
+            outcome["events"], trainer, opponent, trainer_roster, opponent_roster, keep_winner_pokemon
+        )
+    outcome["timings"] = {"simulate": simulated - start, "render": time.perf_counter() - simulated}
+    return outcome
+
+# --------------------------------------------------
+# GENERACIÓN DEL REGISTRO DE TEXTO
+# --------------------------------------------------
+
+def _hp_status(remaining_hp: int, max_hp: int) -> str:
+    hp_percentage = (remaining_hp / max_hp) * 100
+    if hp_percentage > 60:
+        return "🟢"
+    elif hp_percentage > 30:
+        return "🟡"
+    return "🔴"
+
+def render_battle_log(
+    events: Sequence[BattleEvent],
+    trainer: TrainerInfo,
+    opponent: TrainerInfo,
+    trainer_roster: Sequence[PokemonStats],
+    opponent_roster: Sequence[PokemonStats],
+    keep_winner_pokemon: bool = True
+) -> List[str]:
+    """
+    Convierte los eventos de `simulate_best_of_three` en el registro de texto
+    en español. Los equipos deben ser los mismos (niveles previos a la batalla)
+    que se pasaron a la simulación.
+    """
+    trainers = (trainer, opponent)
+    rosters = (
+        {p.id: replace(p) for p in trainer_roster},
+        {p.id: replace(p) for p in opponent_roster},
+    )
+    on_field = [None, None]  # Pokémon en el campo de cada lado
+    log = []
+
+    for event in events:
+        kind = event.kind
+
+        if kind == EVENT_ATTACK:
+            attacker = on_field[event.side]
+            defender = on_field[1 - event.side]
+            max_hp = defender.hp or 100
+            flags = event.flags
+            type_message = ""
+            if flags & FLAG_SUPER_EFFECTIVE:
+                type_message = " ¡Es muy efectivo!"
+            elif flags & FLAG_NOT_EFFECTIVE:
+                type_message = " ¡No es muy efectivo..."
+            critical_message = " 💥¡Golpe crítico!" if flags & FLAG_CRITICAL else ""
+            special_message = " ✨(Ataque especial)" if flags & FLAG_SPECIAL else ""
+            resist_message = " 🛡️¡Resistió el daño!" if flags & FLAG_RESISTED else ""
+            log.append(
+                f"🔹 Turno {event.turn}: {attacker.name} usa {event.move}{special_message} "
+                f"contra {defender.name} -{event.damage} HP{type_message}{critical_message}{resist_message} "
+                f"{_hp_status(event.hp, max_hp)} HP: {event.hp}/{max_hp}"
+            )
+
+        elif kind == EVENT_COUNTER:
+            last_critical_msg = " 💥¡Golpe crítico!" if event.flags & FLAG_CRITICAL else ""
+            last_special_msg = " ✨(Ataque especial)" if event.flags & FLAG_SPECIAL else ""
+            log.append(
+                f"🔥 ¡{on_field[event.side].name} contraataca con {event.move}{last_special_msg} antes de debilitarse! "
+                f"-{event.damage} HP{last_critical_msg}"
+            )
+
+        elif kind == EVENT_FAINT:
+            log.append(f"💀 ¡{on_field[event.side].name} se debilitó!")
+
+        elif kind == EVENT_ROUND_START:
+            log.append(f"🔥BATALLA {event.turn} 🔥")
+
+        elif kind == EVENT_SEND_OUT:
+            pokemon = rosters[event.side][event.pokemon]
+            on_field[event.side] = pokemon
+            name = trainers[event.side].name
+            if event.flags & FLAG_KEPT:
+                verb = "en el campo" if event.side == SIDE_TRAINER else "en combate"
+                log.append(f"⚡ {name} mantiene a {pokemon.name} {verb}! (HP: {event.hp}/{pokemon.hp})")
+            elif not keep_winner_pokemon:
+                log.append(f"⚡ {name} elige a {pokemon.name} (Nv. {pokemon.level})")
+            elif event.side == SIDE_TRAINER:
+                log.append(f"⚡ {name} elige a {pokemon.name} (Nv. {pokemon.level}) para la Batalla {event.turn}!")
+            else:
+                log.append(f"⚡ {name} saca a {pokemon.name} (Nv. {pokemon.level}) al ruedo!")
+
+        elif kind == EVENT_START:
+            t, o = on_field
+            log.append(
+                f"⚔️ ¡Comienza la batalla entre {t.name} (Nv. {t.level}, HP: {event.hp}/{t.hp or 100}), "
+                f"vs {o.name} (Nv. {o.level}, HP: {event.damage}/{o.hp or 100})!"
+            )
+
+        elif kind == EVENT_FIRST_ATTACKER:
+            log.append(f"⚡ ¡{on_field[event.side].name} es más rápido y ataca primero!")
+
+        elif kind == EVENT_LEVEL_UP:
+            pokemon = rosters[event.side][event.pokemon]
+            log.append(f"🎉 ¡{pokemon.name} subió {event.damage} nivel(es)! Ahora es nivel {event.hp}")
+            pokemon.level = event.hp
+
+        elif kind == EVENT_ROUND_END:
+            winner_name = trainers[event.side].name if event.side != SIDE_DRAW else "Empate"
+            log.append(f"🏆 Resultado de la Batalla {event.turn}: ¡{winner_name} se lleva la victoria!")
+            log.append(f"📊 Marcador: {trainer.name} {event.damage} - {event.hp} {opponent.name}")
+
+    # Resultado final a partir del último marcador
+    last_round = next((e for e in reversed(events) if e.kind == EVENT_ROUND_END), None)
+    trainer_wins = last_round.damage if last_round else 0
+    opponent_wins = last_round.hp if last_round else 0
+
+    commentator = "¡Esto fue épico! 🌟"
+    if trainer_wins > opponent_wins:
+        overall_winner = trainer.name
+        commentator += f" ¡Y con una actuación estelar, {overall_winner} se corona como el campeón de este encuentro! 🎉"
+    elif opponent_wins > trainer_wins:
+        overall_winner = opponent.name
+        commentator += f" ¡Increíble! ¡{overall_winner} demuestra su poder y se lleva la victoria general! 🏆"
+    else:
+        overall_winner = "Empate"
+        commentator += " ¡Un final reñido! ¡La batalla termina en un empate! 🤝"
+
+    log.append("🎯 RESULTADO FINAL 🎯")
+    log.append(
+        f"{trainer.name}: {trainer_wins} victoria(s) | "
+        f"{opponent.name}: {opponent_wins} victoria(s)"
+    )
+    log.append(f"🏅 ¡{overall_winner} gana el combate!")
+    log.append(f"💬 Comentario del experto: {commentator}")
+    return log
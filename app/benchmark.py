@@ -0,0 +1,260 @@
+"""
+Micro-benchmarks del motor de batallas con control de regresiones.
+
+Mide cuatro niveles sobre equipos sintéticos generados con una semilla fija:
+- get_type_multiplier: consultas a la tabla de tipos por segundo.
+- calculate_damage: turnos (ataques) por segundo.
+- simulate_single_battle: combates de una ronda y turnos por segundo.
+- simulate_battle: batallas completas por segundo con la ruta real de la API
+  (carga de equipos, mejor de 3, registro y persistencia), sobre un sustituto
+  en memoria de `crud` en lugar de la base de datos.
+
+Uso:
+    python -m app.benchmark                  # compara con la línea base (la crea si no existe)
+    python -m app.benchmark --update         # reescribe la línea base
+    python -m app.benchmark --threshold 0.2  # tolera hasta un 20% de caída
+
+Sale con código 1 si alguna métrica cae más que el umbral respecto a la
+línea base (BENCHMARK_THRESHOLD, 0.15 por defecto). Cada benchmark se repite
+y se conserva la mejor repetición para reducir el ruido.
+"""
+from contextlib import contextmanager
+from dataclasses import replace
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from .battle_engine import (
+    ENGINE_VERSION, EVENT_ATTACK, PokemonStats, TrainerInfo, calculate_damage, simulate_single_battle
+)
+from .routers import battle as battle_router  # Importado aquí: no cuenta en el tiempo de los benchmarks
+from .type_chart import get_type_multiplier
+
+BENCHMARK_SEED = 1234
+BENCHMARK_THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", "0.15"))
+BENCHMARK_BASELINE = os.getenv("BENCHMARK_BASELINE", "benchmark_baseline.json")
+
+ELEMENTS = [
+    "Fuego", "Agua", "Planta", "Eléctrico", "Hielo", "Lucha", "Veneno", "Tierra",
+    "Volador", "Psíquico", "Bicho", "Roca", "Fantasma", "Dragón", "Siniestro",
+    "Acero", "Hada", "Normal", "Fuego/Volador", "Roca/Tierra", "Agua/Hielo",
+]
+MOVES = ["Placaje", "Lanzallamas", "Hidrobomba", "Rayo", "Terremoto", "Psíquico"]
+
+# --------------------------------------------------
+# DATOS SINTÉTICOS
+# --------------------------------------------------
+
+def synthetic_roster(rng: random.Random, first_id: int, size: int = 6) -> List[PokemonStats]:
+    """Equipo aleatorio (reproducible con `rng`) con estadísticas en rangos reales"""
+    roster = []
+    for pokemon_id in range(first_id, first_id + size):
+        roster.append(PokemonStats(
+            id=pokemon_id,
+            name=f"Sintético {pokemon_id}",
+            element=rng.choice(ELEMENTS),
+            hp=rng.randint(40, 120),
+            attack=rng.randint(30, 130),
+            defense=rng.randint(30, 130),
+            special_attack=rng.randint(30, 130),
+            special_defense=rng.randint(30, 130),
+            speed=rng.randint(20, 130),
+            moves=rng.sample(MOVES, 3),
+            level=rng.randint(1, 60),
+        ))
+    return roster
+
+class MemoryCrud:
+    """
+    Sustituto en memoria de las funciones de `crud` que usa `simulate_battle`.
+    No aplica las subidas de nivel para que todas las repeticiones simulen
+    exactamente los mismos equipos.
+    """
+
+    def __init__(self, trainers: Dict[int, TrainerInfo], rosters: Dict[int, List[PokemonStats]]):
+        self.trainers = trainers
+        self.rosters = rosters
+        self.battles: List[Tuple[dict, List[dict]]] = []
+        self.turns = 0
+
+    async def get_trainer(self, db, trainer_id: int):
+        return self.trainers.get(trainer_id)
+
+    async def get_trainer_pokemons(self, db, trainer_id: int):
+        return [SimpleNamespace(pokemon=p) for p in self.rosters.get(trainer_id, [])]
+
+    async def persist_battle(self, db, battle_data: dict, participants: List[dict], levels_gained: Dict[int, int], job=None) -> int:
+        self.battles.append((battle_data, participants))
+        return len(self.battles)
+
+@contextmanager
+def memory_backend(store: MemoryCrud, seed: int):
+    """
+    Ejecuta `routers.battle.simulate_battle` sin base de datos ni pool de
+    procesos: `crud` se reemplaza por `store` y la simulación corre en línea
+    con semillas derivadas de `seed`. Los turnos simulados se suman en `store.turns`.
+    """
+    rng = random.Random(seed)
+
+    async def run_inline(func, *args, **kwargs):
+        outcome = func(*args, seed=rng.randrange(2 ** 63), **kwargs)
+        store.turns += sum(1 for event in outcome["events"] if event.kind == EVENT_ATTACK)
+        return outcome
+
+    saved = battle_router.crud, battle_router.run_in_battle_pool
+    battle_router.crud, battle_router.run_in_battle_pool = store, run_inline
+    try:
+        yield battle_router.simulate_battle
+    finally:
+        battle_router.crud, battle_router.run_in_battle_pool = saved
+
+# --------------------------------------------------
+# BENCHMARKS
+# --------------------------------------------------
+# Cada benchmark ejecuta una carga fija y devuelve {métrica: cantidad}; la
+# tasa por segundo se calcula con el tiempo de la mejor repetición.
+
+def bench_type_multiplier(seed: int, scale: int) -> Dict[str, int]:
+    rng = random.Random(seed)
+    pairs = [(rng.choice(ELEMENTS), rng.choice(ELEMENTS)) for _ in range(1000)]
+    for _ in range(scale * 50):
+        for attacker, defender in pairs:
+            get_type_multiplier(attacker, defender)
+    return {"lookups": scale * 50 * len(pairs)}
+
+def bench_calculate_damage(seed: int, scale: int) -> Dict[str, int]:
+    rng = random.Random(seed)
+    roster = synthetic_roster(rng, 1, 12)
+    pairs = [(rng.choice(roster), rng.choice(roster), rng.choice(MOVES + ["Rayo (Especial)"])) for _ in range(1000)]
+    for _ in range(scale * 20):
+        for attacker, defender, move in pairs:
+            calculate_damage(attacker, defender, move, attacker.level, defender.level, rng=rng)
+    return {"turns": scale * 20 * len(pairs)}
+
+def bench_single_battle(seed: int, scale: int) -> Dict[str, int]:
+    rng = random.Random(seed)
+    trainer, opponent = TrainerInfo(1, "Rojo"), TrainerInfo(2, "Azul")
+    roster = synthetic_roster(rng, 1, 12)
+    battles = turns = 0
+    for _ in range(scale * 500):
+        result = simulate_single_battle(
+            trainer, opponent, replace(rng.choice(roster)), replace(rng.choice(roster)), rng=rng
+        )
+        battles += 1
+        turns += result["turn_count"]
+    return {"battles": battles, "turns": turns}
+
+def bench_simulate_battle(seed: int, scale: int) -> Dict[str, int]:
+    rng = random.Random(seed)
+    n_trainers = 8
+    trainers = {t: TrainerInfo(t, f"Entrenador {t}") for t in range(1, n_trainers + 1)}
+    rosters = {t: synthetic_roster(rng, t * 100, 6) for t in trainers}
+    pairs = [tuple(rng.sample(sorted(trainers), 2)) for _ in range(scale * 100)]
+    store = MemoryCrud(trainers, rosters)
+
+    async def run(simulate_battle):
+        for trainer_id, opponent_id in pairs:
+            await simulate_battle(None, trainer_id, opponent_id, True, "text")
+
+    with memory_backend(store, seed) as simulate_battle:
+        asyncio.run(run(simulate_battle))
+    return {"battles": len(store.battles), "turns": store.turns}
+
+BENCHMARKS: Dict[str, Callable[[int, int], Dict[str, int]]] = {
+    "get_type_multiplier": bench_type_multiplier,
+    "calculate_damage": bench_calculate_damage,
+    "simulate_single_battle": bench_single_battle,
+    "simulate_battle": bench_simulate_battle,
+}
+
+def run_benchmarks(seed: int = BENCHMARK_SEED, repeat: int = 5, scale: int = 1) -> dict:
+    """
+    Ejecuta todos los benchmarks y retorna las tasas por segundo de cada
+    métrica (ej: {"simulate_battle": {"battles/s": ..., "turns/s": ...}}).
+    """
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        best: Optional[float] = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            counts = bench(seed, scale)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {f"{metric}/s": round(n / best, 1) for metric, n in counts.items()}
+        results[name]["seconds"] = round(best, 4)
+    return {
+        "engine_version": ENGINE_VERSION,
+        "python": platform.python_version(),
+        "seed": seed,
+        "scale": scale,
+        "benchmarks": results,
+    }
+
+# --------------------------------------------------
+# LÍNEA BASE
+# --------------------------------------------------
+
+def compare_with_baseline(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Compara las tasas con la línea base.
+    Retorna la descripción de cada métrica que cayó más que `threshold` (0.15 = 15%).
+    """
+    regressions = []
+    for name, metrics in baseline.get("benchmarks", {}).items():
+        for metric, base_rate in metrics.items():
+            if not metric.endswith("/s") or not base_rate:
+                continue
+            rate = current["benchmarks"].get(name, {}).get(metric)
+            if rate is None:
+                continue
+            change = (rate - base_rate) / base_rate
+            if change < -threshold:
+                regressions.append(f"{name} {metric}: {base_rate:,.1f} → {rate:,.1f} ({change:+.1%})")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del motor de batallas")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE, help="Archivo JSON con la línea base")
+    parser.add_argument("--update", action="store_true", help="Reescribir la línea base con esta ejecución")
+    parser.add_argument("--threshold", type=float, default=BENCHMARK_THRESHOLD, help="Caída máxima tolerada (0.15 = 15%%)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por benchmark (se usa la mejor)")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplicador de la carga de cada benchmark")
+    parser.add_argument("--seed", type=int, default=BENCHMARK_SEED)
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.seed, args.repeat, args.scale)
+    for name, metrics in current["benchmarks"].items():
+        rates = ", ".join(f"{v:,.1f} {k}" for k, v in metrics.items() if k.endswith("/s"))
+        print(f"{name:<24} {rates}")
+
+    if args.update or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"✔ Línea base guardada en {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if (baseline.get("seed"), baseline.get("scale")) != (current["seed"], current["scale"]):
+        print("⚠ La línea base se generó con otra semilla o escala; las cargas no son comparables")
+    if baseline.get("engine_version") != ENGINE_VERSION:
+        print("⚠ La línea base corresponde a otra versión del motor")
+
+    regressions = compare_with_baseline(current, baseline, args.threshold)
+    if regressions:
+        print(f"✖ Regresiones mayores al {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print(f"✔ Sin regresiones mayores al {args.threshold:.0%} respecto a {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
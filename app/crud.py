@@ -1,10 +1,15 @@
 # Importaciones de SQLAlchemy para operaciones asíncronas
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, or_
+from sqlalchemy import (
+    func, or_, insert, update, delete, values, column, literal, literal_column, true, text, union_all, Float, Integer, Text
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.orm import selectinload, joinedload
-from datetime import datetime, timezone
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import json
+import os
 
 # Importaciones de SQLAlchemy para operaciones síncronas
 from sqlalchemy.orm import Session
@@ -15,6 +20,14 @@ from app.routers.auth import get_password_hash
 # Importaciones de nuestros módulos internos
 from . import schemas  # Esquemas Pydantic para validación de datos
 from . import models  # Modelos de la base de datos
+from .ratings import INITIAL_RATING, elo_update  # Fórmula del rating Elo
+from .odds_cache import ODDS_CACHE  # Caché de probabilidades (se invalida al cambiar equipos)
+from .search_cache import SEARCH_CACHE  # Caché de búsquedas por nombre (se invalida al cambiar Pokémon)
+from .battle_engine import MAX_POKEMON_LEVEL  # Nivel máximo de un Pokémon
+from .pagination import keyset_after, page_key  # Paginación por cursor (keyset)
+from .search_index import (  # Índices en memoria para la búsqueda flexible
+    index_pokemon_name, normalize_text, rebuild_name_indexes, unindex_pokemon_name
+)
 
 # Funciones CRUD para administradores
 async def get_admin_by_username(db: AsyncSession, username: str):
@@ -64,38 +77,223 @@ async def get_pokemon(db: AsyncSession, pokemon_id: int):
     )
     return result.scalar_one_or_none()
 
+# Columnas filtrables por rango; cada una tiene un índice (columna, id) que sirve para ordenar
+POKEMON_STAT_COLUMNS = ("level", "hp", "attack", "defense", "special_attack", "special_defense", "speed")
+POKEMON_SORT_COLUMNS = ("id", "name") + POKEMON_STAT_COLUMNS
+
+# Filas estimadas a partir de las cuales se rechaza un orden que no sale de un índice
+POKEMON_SORT_MAX_ROWS = int(os.getenv("POKEMON_SORT_MAX_ROWS", "10000"))
+
+def _pokemon_types():
+    """Tipos de `element` en minúsculas como arreglo (la expresión del índice ix_pokemons_types)"""
+    return func.string_to_array(
+        func.lower(models.Pokemon.element), literal_column("'/'"), type_=ARRAY(Text)
+    )
+
+def _sorted_rows(plan: dict) -> float:
+    """Mayor cantidad estimada de filas que entra a un nodo Sort del plan"""
+    rows = plan["Plans"][0]["Plan Rows"] if plan["Node Type"] == "Sort" else 0
+    for child in plan.get("Plans", ()):
+        rows = max(rows, _sorted_rows(child))
+    return rows
+
+async def _check_sort_plan(db: AsyncSession, query):
+    """
+    Pide al planificador el plan de `query` (sin ejecutarla) y rechaza los
+    que ordenan en memoria más de POKEMON_SORT_MAX_ROWS filas.
+    
+    Raises:
+        ValueError: Si el orden no lo resuelve un índice y la tabla es grande.
+    """
+    compiled = query.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    connection = await db.connection()
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    if _sorted_rows(plan[0]["Plan"]) > POKEMON_SORT_MAX_ROWS:
+        raise ValueError(
+            "El orden pedido recorrería demasiados Pokémon sin índice; "
+            "agrega filtros o un límite"
+        )
+
+async def _fetch_regions(
+    db: AsyncSession,
+    regions: list,
+    start: int,
+    after: Optional[tuple],
+    limit: Optional[int],
+    check_plan: bool = False
+) -> list:
+    """
+    Recorre en orden las regiones de un listado, cada una un par (consulta,
+    claves de orden), desde la región `start`, hasta juntar `limit + 1` filas.
+    Dentro de la región inicial continúa después de los últimos valores de
+    `after` (uno por clave).
+    """
+    rows = []
+    for position, (query, keys) in enumerate(regions[start:], start):
+        if after is not None and position == start:
+            query = query.where(keyset_after(keys, after[-len(keys):]))
+        query = query.order_by(
+            *(expression.desc() if descending else expression for expression, descending in keys)
+        )
+        if limit is not None:
+            query = query.limit(limit + 1 - len(rows))
+        if check_plan:
+            await _check_sort_plan(db, query)
+        result = await db.execute(query)
+        rows.extend(result.scalars().all())
+        if limit is not None and len(rows) > limit:
+            break
+    return rows
+
+def pokemon_cursor_types(sort: str) -> tuple:
+    """Tipos de la clave de los cursores de `get_pokemons` para el orden `sort`"""
+    if sort == "id":
+        return (int,)
+    value_type = str if sort == "name" else int
+    return ((value_type, type(None)), int)  # (valor de `sort` o NULL, id)
+
 async def get_pokemons(
     db: AsyncSession, 
-    name: Optional[str] = None
+    name: Optional[str] = None,
+    elements: Optional[List[str]] = None,
+    ranges: Optional[Dict[str, Tuple[Optional[int], Optional[int]]]] = None,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None
 ):
     """
-    Obtiene una lista paginada de Pokémon con opción de filtrado por nombre.
+    Obtiene una página de Pokémon con filtros por nombre, tipo y estadísticas.
     
     Args:
         db: Sesión de base de datos.
-        skip: Número de registros a saltar (paginación).
-        limit: Máximo número de registros a devolver.
         name: Filtro opcional por nombre (búsqueda parcial case insensitive).
+        elements: Tipos que el Pokémon debe tener todos (ej: ["Fuego", "Volador"]).
+        ranges: Mínimo y máximo (inclusive, None = sin cota) por columna de
+            POKEMON_STAT_COLUMNS (ej: {"speed": (91, None)}).
+        sort: Columna de POKEMON_SORT_COLUMNS por la que ordenar (desempate por ID).
+        descending: Orden descendente.
+        limit: Máximo número de registros a devolver (None = todos).
+        after: Clave de la última fila de la página anterior: (valor de
+            `sort`, id), o (id,) si se ordena por ID.
         
     Returns:
-        Lista de Pokémon.
+        (Lista de Pokémon, clave para la página siguiente o None).
+        
+    Raises:
+        ValueError: Si el orden no puede resolverse con un índice sobre una
+            tabla grande (ver `_check_sort_plan`).
     """
     query = select(models.Pokemon)
     
     if name:
         query = query.where(
-            func.lower(models.Pokemon.name).contains(func.lower(name)))
-    result = await db.execute(query)
-    return result.scalars().all()
+            models.Pokemon.name_normalized.contains(normalize_text(name), autoescape=True))
+    if elements:
+        wanted = [element.strip().lower() for element in elements]
+        query = query.where(_pokemon_types().contains(wanted))
+    for column_name, (low, high) in (ranges or {}).items():
+        column = getattr(models.Pokemon, column_name)
+        if low is not None:
+            query = query.where(column >= low)
+        if high is not None:
+            query = query.where(column <= high)
+
+    pokemon_id = models.Pokemon.id
+    if not sort or sort == "id":
+        regions = [(query, [(pokemon_id, descending)])]
+        key_of = lambda pokemon: (pokemon.id,)
+        start = 0
+    else:
+        # Como en el índice (columna, id), los NULL van al final en orden
+        # ascendente y al principio en descendente. Cada región se recorre
+        # por separado para que la condición del cursor sea un rango simple.
+        column = models.Pokemon.name_normalized if sort == "name" else getattr(models.Pokemon, sort)
+        with_value = (query.where(column.isnot(None)), [(column, descending), (pokemon_id, descending)])
+        without_value = (query.where(column.is_(None)), [(pokemon_id, descending)])
+        regions = [without_value, with_value] if descending else [with_value, without_value]
+        key_of = lambda pokemon: (getattr(pokemon, column.key), pokemon.id)
+        if after is None:
+            start = 0
+        elif after[0] is None:
+            start = 0 if descending else 1  # El cursor quedó entre los NULL
+        else:
+            start = 1 if descending else 0
+
+    pokemons = await _fetch_regions(
+        db, regions, start, after, limit, check_plan=bool(sort) and sort != "id"
+    )
+    return pokemons, page_key(pokemons, limit, key_of)
 
 async def get_pokemon_by_name(db: AsyncSession, name: str):
-    """Busca un Pokémon por nombre exacto (case insensitive)"""
+    """Busca un Pokémon por nombre exacto (sin distinguir mayúsculas ni acentos)"""
     result = await db.execute(
         select(models.Pokemon)
-        .where(func.lower(models.Pokemon.name) == func.lower(name))
+        .where(models.Pokemon.name_normalized == normalize_text(name))
+        .order_by(models.Pokemon.id)
+        .limit(1)
     )
     return result.scalars().first()
 
+def _prefix_range(column, prefix: str):
+    """
+    Condición `column LIKE 'prefix%'` escrita como rango (>= prefix y < siguiente
+    prefijo) para que el índice B-tree la resuelva aunque el plan sea genérico.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (column >= prefix) & (column < upper)
+
+async def get_pokemons_by_ids(db: AsyncSession, pokemon_ids: List[int]):
+    """Busca Pokémon por lista de IDs, en el mismo orden de la lista"""
+    if not pokemon_ids:
+        return []
+    result = await db.execute(
+        select(models.Pokemon)
+        .where(models.Pokemon.id.in_(pokemon_ids))
+    )
+    by_id = {p.id: p for p in result.scalars().all()}
+    return [by_id[pokemon_id] for pokemon_id in pokemon_ids if pokemon_id in by_id]
+
+async def load_pokemon_name_index(db: AsyncSession) -> int:
+    """
+    Construye los índices de nombres en memoria (solo lee id y nombre).
+    
+    Args:
+        db: Sesión de base de datos.
+        
+    Returns:
+        Cantidad de Pokémon indexados.
+    """
+    result = await db.execute(select(models.Pokemon.id, models.Pokemon.name))
+    rows = result.all()
+    rebuild_name_indexes(rows)
+    return len(rows)
+
+async def autocomplete_pokemon_names(db: AsyncSession, prefix: str, limit: int = 10):
+    """
+    Pares (id, nombre) cuyo nombre normalizado empieza por `prefix`, en orden
+    alfabético (rango sobre el índice de name_normalized).
+    
+    Args:
+        db: Sesión de base de datos.
+        prefix: Texto escrito hasta ahora.
+        limit: Máximo de sugerencias.
+        
+    Returns:
+        Lista de tuplas (id, nombre).
+    """
+    prefix = normalize_text(prefix)
+    query = select(models.Pokemon.id, models.Pokemon.name)
+    if prefix:
+        query = query.where(_prefix_range(models.Pokemon.name_normalized, prefix))
+    result = await db.execute(
+        query.order_by(models.Pokemon.name_normalized, models.Pokemon.id).limit(limit)
+    )
+    return [tuple(row) for row in result.all()]
+
 async def get_pokemons_by_names(db: AsyncSession, names: List[str]):
     """Busca Pokémon por lista de nombres exactos"""
     result = await db.execute(
@@ -104,44 +302,114 @@ async def get_pokemons_by_names(db: AsyncSession, names: List[str]):
     )
     return result.scalars().all()
 
+# Motor de búsqueda por nombre: "trgm" (pg_trgm + índice GIN), "like" o
+# "auto" (trgm si la extensión se pudo instalar al iniciar, si no like)
+POKEMON_SEARCH_BACKEND = os.getenv("POKEMON_SEARCH_BACKEND", "auto")
+_search_backend = "like"
+
+def configure_search_backend(trigram_available: bool) -> str:
+    """
+    Elige el motor de búsqueda según la configuración y la disponibilidad
+    de pg_trgm (evento de inicio). Retorna el motor elegido.
+    """
+    global _search_backend
+    if POKEMON_SEARCH_BACKEND == "like" or not trigram_available:
+        if POKEMON_SEARCH_BACKEND == "trgm":
+            print("⚠ POKEMON_SEARCH_BACKEND=trgm pero pg_trgm no está disponible; se usa LIKE")
+        _search_backend = "like"
+    else:
+        _search_backend = "trgm"
+    return _search_backend
+
+def search_cursor_scope(name: str) -> Tuple[str, tuple]:
+    """
+    Alcance y tipos de la clave de los cursores de `search_pokemons_by_name`
+    para `name` (el orden depende del motor).
+    """
+    if _search_backend == "trgm":
+        types = (bool, float, float, int, int)  # (prefijo, word_similarity, similarity, longitud, id)
+    else:
+        types = (int, int, int)  # (grupo, longitud, id)
+    return f"search:{_search_backend}:{normalize_text(name)}", types
+
 async def search_pokemons_by_name(
     db: AsyncSession,
     name: str,
-) -> List[models.Pokemon]:
+    limit: int = 20,
+    after: Optional[tuple] = None
+) -> Tuple[List[models.Pokemon], Optional[tuple]]:
     """
     Búsqueda avanzada por nombre con:
     - Coincidencias parciales en cualquier parte del nombre
     - Case insensitive
     - Ordenamiento por mejor coincidencia
     
+    Compara contra `name_normalized` (sin acentos). Con el motor "trgm" también
+    encuentra nombres parecidos (word_similarity de pg_trgm) y ordena por
+    similitud usando el índice GIN; con "like" los nombres que empiezan por el
+    término salen del índice B-tree y solo si faltan resultados se recorre la
+    tabla con LIKE. En ambos casos el top-k se corta en la base de datos.
+    
     Args:
         db: Sesión de base de datos.
         name: Término de búsqueda.
-        skip: Registros a saltar.
         limit: Máximo de resultados.
+        after: Clave de la última fila de la página anterior (la que retornó
+            la llamada previa con el mismo término y motor).
         
     Returns:
-        Lista de Pokémon ordenados por relevancia.
+        (Lista de Pokémon ordenados por relevancia, clave para la página
+        siguiente o None).
     """
-    query = (
-        select(models.Pokemon)
-        .where(
-            or_(
-                func.lower(models.Pokemon.name).contains(func.lower(name)),
-                models.Pokemon.name.ilike(f"%{name}%")
-            )
+    term = normalize_text(name)
+    normalized = models.Pokemon.name_normalized
+
+    if _search_backend == "trgm":
+        # `name %> term` equivale a word_similarity(term, name) >= umbral y usa el índice GIN
+        keys = [
+            (normalized.startswith(term, autoescape=True), True),
+            (func.word_similarity(term, normalized), True),
+            (func.similarity(term, normalized), True),
+            (func.length(models.Pokemon.name), False),
+            (models.Pokemon.id, False),
+        ]
+        query = (
+            select(models.Pokemon, *(expression for expression, _ in keys))
+            .where(or_(normalized.contains(term, autoescape=True), normalized.op("%>")(term)))
         )
-        .order_by(
-            # Primero los que empiezan con el término de búsqueda
-            func.lower(models.Pokemon.name).startswith(func.lower(name)).desc(),
-            # Luego por longitud del nombre (más corto primero)
-            func.length(models.Pokemon.name)
+        if after is not None:
+            query = query.where(keyset_after(keys, after))
+        result = await db.execute(
+            query
+            .order_by(*(expression.desc() if descending else expression for expression, descending in keys))
+            .limit(limit + 1)
         )
-        
-    )
-    
-    result = await db.execute(query)
-    return result.scalars().all()
+        rows = result.all()
+        next_key = page_key(rows, limit, lambda row: tuple(row[1:]))
+        return [row[0] for row in rows], next_key
+
+    # Primero los que empiezan con el término de búsqueda (rango en el índice),
+    # luego el resto de los que lo contienen; en cada grupo por longitud del
+    # nombre (más corto primero). La clave es (grupo, longitud, id).
+    keys = [(func.length(models.Pokemon.name), False), (models.Pokemon.id, False)]
+    contains = select(models.Pokemon).where(normalized.contains(term, autoescape=True))
+    if term:
+        regions = [
+            (select(models.Pokemon).where(_prefix_range(normalized, term)), keys),
+            (contains.where(~_prefix_range(normalized, term)), keys),
+        ]
+    else:
+        regions = [(contains, keys)]
+    start = 0 if after is None else after[0]
+    if not isinstance(start, int) or not 0 <= start < len(regions):
+        raise ValueError("Cursor no válido")
+    pokemons = await _fetch_regions(db, regions, start, after, limit)
+
+    def key_of(pokemon):
+        region = 0 if not term or pokemon.name_normalized.startswith(term) else 1
+        return (region, len(pokemon.name), pokemon.id)
+
+    return pokemons, page_key(pokemons, limit, key_of)
 
 async def create_pokemon(db: AsyncSession, pokemon: schemas.PokemonCreate):
     """
@@ -156,10 +424,13 @@ async def create_pokemon(db: AsyncSession, pokemon: schemas.PokemonCreate):
     """
     data = pokemon.dict()
     data["moves"] = parse_moves(data.get("moves"))
+    data["name_normalized"] = normalize_text(data["name"])
     db_pokemon = models.Pokemon(**data)
     db.add(db_pokemon)
     await db.commit()
     await db.refresh(db_pokemon)
+    index_pokemon_name(db_pokemon.id, db_pokemon.name)
+    SEARCH_CACHE.bump()
     return db_pokemon
 
 async def update_pokemon(
@@ -184,8 +455,12 @@ async def update_pokemon(
             if key == "moves":
                 value = parse_moves(value)
             setattr(db_pokemon, key, value)
+        db_pokemon.name_normalized = normalize_text(db_pokemon.name)
         await db.commit()
         await db.refresh(db_pokemon)
+        ODDS_CACHE.invalidate_pokemon(pokemon_id)
+        index_pokemon_name(pokemon_id, db_pokemon.name)
+        SEARCH_CACHE.bump()
     return db_pokemon
 
 async def delete_pokemon(db: AsyncSession, pokemon_id: int):
@@ -203,6 +478,9 @@ async def delete_pokemon(db: AsyncSession, pokemon_id: int):
     if db_pokemon:
         await db.delete(db_pokemon)
         await db.commit()
+        ODDS_CACHE.invalidate_pokemon(pokemon_id)
+        unindex_pokemon_name(pokemon_id)
+        SEARCH_CACHE.bump()
     return db_pokemon
 
 async def flexible_pokemon_search(
@@ -225,17 +503,14 @@ async def flexible_pokemon_search(
         Lista de Pokémon que coinciden con el término.
     """
     # Primero intenta búsqueda exacta
-    exact_match = await db.execute(
-        select(models.Pokemon)
-        .where(func.lower(models.Pokemon.name) == func.lower(search_term))
-    )
-    exact_match = exact_match.scalars().first()
+    exact_match = await get_pokemon_by_name(db, search_term)
     
     if exact_match:
         return [exact_match]
     
     # Si no hay coincidencia exacta, busca coincidencias parciales
-    return await search_pokemons_by_name(db, search_term, skip, limit)
+    pokemons, _ = await search_pokemons_by_name(db, search_term, limit)
+    return pokemons
 
 ## ------------------------- CRUD para Entrenadores ------------------------- ##
 
@@ -256,24 +531,25 @@ async def get_trainer(db: AsyncSession, trainer_id: int):
     )
     return result.scalar_one_or_none()
 
-async def get_trainers(db: AsyncSession, skip: int = 0, limit: int = 10):
+async def get_trainers(db: AsyncSession, limit: int = 10, after: Optional[int] = None):
     """
-    Obtiene una lista paginada de entrenadores.
+    Obtiene una página de entrenadores ordenados por ID.
     
     Args:
         db: Sesión de base de datos.
-        skip: Registros a saltar.
         limit: Máximo de resultados.
+        after: ID del último entrenador de la página anterior.
         
     Returns:
-        Lista de entrenadores.
+        (Lista de entrenadores, ID para la página siguiente o None).
     """
-    result = await db.execute(
-        select(models.Trainer)
-        .offset(skip)
-        .limit(limit)
-    )
-    return result.scalars().all()
+    query = select(models.Trainer)
+    if after is not None:
+        query = query.where(models.Trainer.id > after)
+    result = await db.execute(query.order_by(models.Trainer.id).limit(limit + 1))
+    trainers = list(result.scalars().all())
+    next_key = page_key(trainers, limit, lambda trainer: trainer.id)
+    return trainers, next_key
 
 async def create_trainer(db: AsyncSession, trainer: schemas.TrainerCreate):
     """
@@ -331,8 +607,56 @@ async def delete_trainer(db: AsyncSession, trainer_id: int):
     if db_trainer:
         await db.delete(db_trainer)
         await db.commit()
+        ODDS_CACHE.invalidate_trainer(trainer_id)
     return db_trainer
 
+async def get_leaderboard(db: AsyncSession, limit: int = 10):
+    """
+    Obtiene los entrenadores con mejor rating Elo (usa el índice por rating).
+    
+    Args:
+        db: Sesión de base de datos.
+        limit: Número de entrenadores a devolver.
+        
+    Returns:
+        Lista de tuplas (TrainerRating, nombre del entrenador) de mayor a menor rating.
+    """
+    result = await db.execute(
+        select(models.TrainerRating, models.Trainer.name)
+        .join(models.Trainer, models.Trainer.id == models.TrainerRating.trainer_id)
+        .order_by(models.TrainerRating.rating.desc(), models.TrainerRating.trainer_id)
+        .limit(limit)
+    )
+    return result.all()
+
+async def get_trainer_rating(db: AsyncSession, trainer_id: int):
+    """
+    Obtiene el rating de un entrenador y su posición en la tabla.
+    
+    Args:
+        db: Sesión de base de datos.
+        trainer_id: ID del entrenador.
+        
+    Returns:
+        Tupla (TrainerRating, nombre, posición) o None si aún no tiene batallas calificadas.
+    """
+    result = await db.execute(
+        select(models.TrainerRating, models.Trainer.name)
+        .join(models.Trainer, models.Trainer.id == models.TrainerRating.trainer_id)
+        .where(models.TrainerRating.trainer_id == trainer_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+
+    # Posición = entrenadores con rating estrictamente mayor + 1 (rango del índice)
+    better = await db.execute(
+        select(func.count())
+        .select_from(models.TrainerRating)
+        .where(models.TrainerRating.rating > row[0].rating)
+    )
+    return row[0], row[1], better.scalar_one() + 1
+
 ## ------------------------- Relación Pokémon-Entrenadores ------------------------- ##
 
 async def add_pokemon_to_trainer(
@@ -353,6 +677,7 @@ async def add_pokemon_to_trainer(
     db.add(db_trainer_pokemon)
     await db.commit()
     await db.refresh(db_trainer_pokemon)
+    ODDS_CACHE.invalidate_trainer(trainer_pokemon.trainer_id)
     return db_trainer_pokemon
 
 async def get_trainer_pokemons(db: AsyncSession, trainer_id: int):
@@ -373,6 +698,27 @@ async def get_trainer_pokemons(db: AsyncSession, trainer_id: int):
     )
     return result.scalars().all()
 
+async def get_trainers_with_pokemons(db: AsyncSession, trainer_ids: List[int]):
+    """
+    Obtiene varios entrenadores con sus equipos completos en una sola consulta.
+    
+    Args:
+        db: Sesión de base de datos.
+        trainer_ids: IDs de los entrenadores.
+        
+    Returns:
+        Lista de entrenadores encontrados (con `pokemons` y cada `pokemon` cargados).
+    """
+    result = await db.execute(
+        select(models.Trainer)
+        .where(models.Trainer.id.in_(trainer_ids))
+        .options(
+            joinedload(models.Trainer.pokemons)
+            .joinedload(models.TrainerPokemon.pokemon)
+        )
+    )
+    return result.unique().scalars().all()
+
 async def remove_pokemon_from_trainer(
     db: AsyncSession, 
     trainer_id: int, 
@@ -400,6 +746,7 @@ async def remove_pokemon_from_trainer(
     if db_trainer_pokemon:
         await db.delete(db_trainer_pokemon)
         await db.commit()
+        ODDS_CACHE.invalidate_trainer(trainer_id)
     return db_trainer_pokemon
 
 ## ------------------------- Funciones de Batalla ------------------------- ##
@@ -462,6 +809,7 @@ async def create_battle(db: AsyncSession, battle: schemas.BattleCreate):
 
     db_battle = models.Battle(
         trainer_id=battle.trainer_id,
+        opponent_id=battle.opponent_id,
         opponent_name=opponent.name,
         winner=None,
         date=datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
@@ -495,31 +843,30 @@ async def get_battle(db: AsyncSession, battle_id: int):
     
     return battle
 
-async def get_battles(db: AsyncSession, skip: int = 0, limit: int = 10):
+async def get_battles(db: AsyncSession, limit: int = 10, after: Optional[int] = None):
     """
-    Obtiene una lista paginada de batallas con información extendida.
+    Obtiene una página de batallas ordenadas por ID, con información extendida.
     
     Args:
         db: Sesión de base de datos.
-        skip: Registros a saltar.
         limit: Máximo de resultados.
+        after: ID de la última batalla de la página anterior.
         
     Returns:
-        Lista de batallas con datos extendidos.
+        (Lista de batallas con datos extendidos, ID para la página siguiente o None).
     """
-    result = await db.execute(
-        select(models.Battle)
-        .options(joinedload(models.Battle.trainer))
-        .offset(skip)
-        .limit(limit)
-    )
-    battles = result.scalars().all()
+    query = select(models.Battle).options(joinedload(models.Battle.trainer))
+    if after is not None:
+        query = query.where(models.Battle.id > after)
+    result = await db.execute(query.order_by(models.Battle.id).limit(limit + 1))
+    battles = list(result.scalars().all())
+    next_key = page_key(battles, limit, lambda battle: battle.id)
     
     for battle in battles:
         if not hasattr(battle, 'trainer_name') and hasattr(battle, 'trainer'):
             battle.trainer_name = battle.trainer.name
     
-    return battles
+    return battles, next_key
 
 async def update_battle(
     db: AsyncSession, 
@@ -587,10 +934,251 @@ async def add_pokemon_to_battle(
     """
     db_battle_pokemon = models.BattlePokemon(**battle_pokemon.dict())
     db.add(db_battle_pokemon)
+    # Sin el resultado de la batalla solo se pueden sumar rondas y debilitados
+    # Mismo orden de tablas que `persist_battle` (entrenadores, luego Pokémon)
+    fainted = int(battle_pokemon.hp_remaining == 0)
+    if battle_pokemon.trainer_id is not None:
+        await _upsert_stats(db, models.TrainerBattleStats, "trainer_id", [
+            {"trainer_id": battle_pokemon.trainer_id, "pokemon_used": 1, "pokemon_fainted": fainted}
+        ])
+    await _upsert_stats(db, models.PokemonBattleStats, "pokemon_id", [
+        {"pokemon_id": battle_pokemon.pokemon_id, "rounds": 1, "faints": fainted}
+    ])
     await db.commit()
     await db.refresh(db_battle_pokemon)
     return db_battle_pokemon
 
+async def _insert_battle(db: AsyncSession, battle_data: dict, participants: List[dict]) -> int:
+    """Inserta la batalla y sus participantes en una sola sentencia (CTE ... RETURNING)"""
+    new_battle = (
+        insert(models.Battle)
+        .values(**battle_data)
+        .returning(models.Battle.id)
+        .cte("new_battle")
+    )
+    rows = values(
+        column("pokemon_id", Integer),
+        column("hp_remaining", Integer),
+        column("battle_round", Integer),
+        column("trainer_id", Integer),
+        name="participants"
+    ).data([
+        (p["pokemon_id"], p["hp_remaining"], p["battle_round"], p.get("trainer_id"))
+        for p in participants
+    ])
+
+    result = await db.execute(
+        insert(models.BattlePokemon)
+        .from_select(
+            ["battle_id", "pokemon_id", "hp_remaining", "battle_round", "trainer_id", "participated"],
+            select(
+                new_battle.c.id, rows.c.pokemon_id, rows.c.hp_remaining,
+                rows.c.battle_round, rows.c.trainer_id, literal(True)
+            )
+            .select_from(new_battle.join(rows, true()))
+        )
+        .add_cte(new_battle)
+        .returning(models.BattlePokemon.battle_id)
+    )
+    return result.scalars().first()
+
+async def _increment_levels(db: AsyncSession, levels_gained: Dict[int, int]) -> Dict[int, int]:
+    """
+    Suma niveles de forma atómica en una sola sentencia, sin leer las filas antes:
+    UPDATE pokemons SET level = LEAST(MAX_POKEMON_LEVEL, level + n) FROM (VALUES (id, n), ...).
+    Batallas simultáneas con el mismo Pokémon no pierden subidas de nivel.
+    Retorna el nivel resultante por ID de Pokémon.
+    """
+    levels_gained = {pokemon_id: n for pokemon_id, n in levels_gained.items() if n}
+    if not levels_gained:
+        return {}
+    gains = values(
+        column("id", Integer),
+        column("n", Integer),
+        name="levels_gained"
+    ).data(sorted(levels_gained.items()))
+    result = await db.execute(
+        update(models.Pokemon.__table__)
+        .where(models.Pokemon.id == gains.c.id)
+        .values(level=func.least(MAX_POKEMON_LEVEL, func.coalesce(models.Pokemon.level, 1) + gains.c.n))
+        .returning(models.Pokemon.id, models.Pokemon.level)
+    )
+    new_levels = dict(result.all())
+    # Las huellas con el nivel anterior ya no se volverán a pedir
+    for pokemon_id in new_levels:
+        ODDS_CACHE.invalidate_pokemon(pokemon_id)
+    return new_levels
+
+RATING_COUNTERS = ("games", "wins", "losses", "draws")
+
+async def _lock_ratings(db: AsyncSession, trainer_ids) -> Dict[int, float]:
+    """
+    Crea las filas de rating que falten y bloquea (FOR UPDATE) las de todos
+    los entrenadores de `trainer_ids`, cada paso en una sola sentencia
+    ordenada por ID. Es lo primero que escribe una transacción de batallas:
+    como todas toman estos bloqueos al inicio y en el mismo orden, dos
+    escrituras simultáneas (batallas sueltas o torneos) se serializan sin
+    riesgo de interbloqueo.
+    Retorna el rating actual por ID de entrenador.
+    """
+    ids = sorted(set(trainer_ids))
+    if not ids:
+        return {}
+    await db.execute(
+        pg_insert(models.TrainerRating)
+        .values([{"trainer_id": t, "rating": INITIAL_RATING} for t in ids])
+        .on_conflict_do_nothing(index_elements=["trainer_id"])
+    )
+    result = await db.execute(
+        select(models.TrainerRating.trainer_id, models.TrainerRating.rating)
+        .where(models.TrainerRating.trainer_id.in_(ids))
+        .order_by(models.TrainerRating.trainer_id)
+        .with_for_update()
+    )
+    return dict(result.all())
+
+async def _apply_ratings(
+    db: AsyncSession,
+    ratings: Dict[int, float],
+    results: List[Tuple[int, int, Optional[int]]]
+):
+    """
+    Aplica en orden los resultados (trainer_id, opponent_id, winner_id) al
+    rating Elo de `ratings` (filas ya bloqueadas con `_lock_ratings`) y
+    guarda los cambios de todos los entrenadores en un UPDATE multi-fila.
+    """
+    counts: Dict[int, dict] = {}
+    for trainer_id, opponent_id, winner_id in results:
+        ratings[trainer_id], ratings[opponent_id] = elo_update(
+            ratings[trainer_id], ratings[opponent_id], trainer_id, winner_id
+        )
+        for rated_id in (trainer_id, opponent_id):
+            row = counts.setdefault(rated_id, dict.fromkeys(RATING_COUNTERS, 0))
+            row["games"] += 1
+            if winner_id is None:
+                row["draws"] += 1
+            elif winner_id == rated_id:
+                row["wins"] += 1
+            else:
+                row["losses"] += 1
+    if not counts:
+        return
+
+    changes = values(
+        column("trainer_id", Integer),
+        column("rating", Float),
+        *(column(c, Integer) for c in RATING_COUNTERS),
+        name="rating_changes"
+    ).data([
+        (trainer_id, ratings[trainer_id], *(row[c] for c in RATING_COUNTERS))
+        for trainer_id, row in sorted(counts.items())
+    ])
+    rating = models.TrainerRating.__table__.c
+    await db.execute(
+        update(models.TrainerRating.__table__)
+        .where(rating.trainer_id == changes.c.trainer_id)
+        .values(
+            rating=changes.c.rating,
+            updated_at=datetime.now(timezone.utc),
+            **{c: rating[c] + changes.c[c] for c in RATING_COUNTERS}
+        )
+    )
+
+class BattleJobLost(Exception):
+    """El trabajo de la cola ya no pertenece a este worker (otro lo reclamó o lo terminó)"""
+
+async def persist_battle(
+    db: AsyncSession,
+    battle_data: dict,
+    participants: List[dict],
+    levels_gained: Dict[int, int],
+    job: Optional[Tuple[int, int]] = None
+) -> int:
+    """
+    Guarda el resultado completo de una batalla en una sola transacción:
+    la fila de la batalla y sus participantes en una sentencia (INSERT con
+    CTE ... RETURNING), el rating Elo y las estadísticas acumuladas de ambos
+    entrenadores y sus Pokémon, y todas las subidas de nivel en un UPDATE
+    multi-fila atómico (ver `_increment_levels`).
+
+    Args:
+        db: Sesión de base de datos.
+        battle_data: Columnas de la tabla battles (trainer_id, opponent_id, winner_id, ...).
+        participants: Filas de battle_pokemons sin battle_id
+            (pokemon_id, hp_remaining, battle_round, trainer_id).
+        levels_gained: Niveles ganados por ID de Pokémon (todas las rondas sumadas).
+        job: (ID, número de reclamo) del trabajo de la cola que simuló la
+            batalla; se marca done con su battle_id en la misma transacción.
+
+    Returns:
+        El ID de la batalla creada.
+
+    Raises:
+        BattleJobLost: Si el trabajo fue reclamado de nuevo o terminado por
+            otro worker (no se guarda nada).
+    """
+    trainer_id, opponent_id = battle_data["trainer_id"], battle_data["opponent_id"]
+    ratings = await _lock_ratings(db, (trainer_id, opponent_id))
+    battle_id = await _insert_battle(db, battle_data, participants)
+    if job is not None:
+        await _finish_job_with_battle(db, job, battle_id)
+    await _apply_ratings(db, ratings, [(trainer_id, opponent_id, battle_data.get("winner_id"))])
+    await _increment_battle_stats(db, [(battle_data, participants)])
+    await _increment_levels(db, levels_gained)
+    await db.commit()
+    return battle_id
+
+async def _finish_job_with_battle(db: AsyncSession, job: Tuple[int, int], battle_id: int):
+    """
+    Marca done el trabajo `job` = (id, reclamo) solo si sigue running con ese
+    número de reclamo; si no, revierte la transacción y lanza BattleJobLost.
+    Así un worker lento no guarda dos veces la misma batalla.
+    """
+    job_id, attempt = job
+    result = await db.execute(
+        update(models.BattleJob)
+        .where(
+            models.BattleJob.id == job_id,
+            models.BattleJob.status == "running",
+            models.BattleJob.attempts == attempt
+        )
+        .values(status="done", battle_id=battle_id, finished_at=datetime.now(timezone.utc))
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        raise BattleJobLost(f"El trabajo {job_id} ya no pertenece a este worker")
+
+async def persist_battles(
+    db: AsyncSession,
+    battles: List[Tuple[dict, List[dict]]],
+    levels_gained: Dict[int, int]
+) -> List[int]:
+    """
+    Guarda varias batallas (por ejemplo, un torneo) en una sola transacción.
+    Los ratings de todos los participantes se bloquean antes de insertar nada
+    y las estadísticas se suman con un solo upsert por tabla.
+
+    Args:
+        db: Sesión de base de datos.
+        battles: Pares (battle_data, participants) como en `persist_battle`.
+        levels_gained: Niveles ganados por ID de Pokémon en todas las batallas.
+
+    Returns:
+        Los IDs de las batallas creadas, en el mismo orden.
+    """
+    ratings = await _lock_ratings(
+        db, [t for battle_data, _ in battles for t in (battle_data["trainer_id"], battle_data["opponent_id"])]
+    )
+    battle_ids = [await _insert_battle(db, battle_data, participants) for battle_data, participants in battles]
+    await _apply_ratings(db, ratings, [
+        (battle_data["trainer_id"], battle_data["opponent_id"], battle_data.get("winner_id"))
+        for battle_data, _ in battles
+    ])
+    await _increment_battle_stats(db, battles)
+    await _increment_levels(db, levels_gained)
+    await db.commit()
+    return battle_ids
+
 async def get_battle_pokemons(db: AsyncSession, battle_id: int):
     """
     Obtiene todos los Pokémon participantes en una batalla.
@@ -607,4 +1195,401 @@ async def get_battle_pokemons(db: AsyncSession, battle_id: int):
         .where(models.BattlePokemon.battle_id == battle_id)
         .options(selectinload(models.BattlePokemon.pokemon))
     )
-    return result.scalars().all()
\ No newline at end of file
+    return result.scalars().all()
+
+## ------------------------- Exportación masiva ------------------------- ##
+
+# Filas que trae cada viaje al cursor del servidor durante una exportación
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+POKEMON_EXPORT_COLUMNS = (
+    "id", "name", "element", "hp", "attack", "defense", "special_attack",
+    "special_defense", "speed", "moves", "current_hp", "level",
+)
+BATTLE_EXPORT_COLUMNS = (
+    "id", "trainer_id", "opponent_id", "opponent_name", "winner", "winner_id",
+    "date", "seed", "engine_version", "keep_winner_pokemon",
+)
+
+async def stream_export_rows(
+    db: AsyncSession,
+    model,
+    columns: Tuple[str, ...],
+    batch_size: int = EXPORT_BATCH_SIZE
+):
+    """
+    Recorre una tabla completa por ID con un cursor del servidor.
+    
+    Args:
+        db: Sesión de base de datos (se mantiene ocupada hasta terminar).
+        model: Modelo de la tabla (ej: models.Pokemon).
+        columns: Columnas a leer.
+        batch_size: Filas por lote.
+        
+    Yields:
+        Listas de hasta `batch_size` tuplas con los valores de `columns`.
+    """
+    query = select(*(getattr(model, name) for name in columns)).order_by(model.id)
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield rows
+
+## ------------------------- Estadísticas de Batallas ------------------------- ##
+
+TRAINER_STATS_COLUMNS = ("battles", "wins", "losses", "draws", "pokemon_used", "pokemon_fainted")
+POKEMON_STATS_COLUMNS = ("battles", "wins", "losses", "draws", "rounds", "faints")
+
+async def _upsert_stats(db: AsyncSession, model, key: str, rows: List[dict]):
+    """
+    Suma contadores a una tabla de estadísticas sin leerla antes:
+    INSERT ... ON CONFLICT DO UPDATE SET col = col + EXCLUDED.col.
+    Las filas van ordenadas por clave para que batallas simultáneas bloqueen
+    en el mismo orden.
+    """
+    if not rows:
+        return
+    counters = [c for c in rows[0] if c != key]
+    rows = sorted(
+        ({c: row.get(c, 0) for c in (key, *counters)} for row in rows),
+        key=lambda row: row[key]
+    )
+    stmt = pg_insert(model).values(rows)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[key],
+            set_={c: getattr(model, c) + getattr(stmt.excluded, c) for c in counters}
+        )
+    )
+
+async def _increment_battle_stats(db: AsyncSession, battles: List[Tuple[dict, List[dict]]]):
+    """
+    Suma las batallas (pares battle_data, participants) a las estadísticas de
+    sus entrenadores y Pokémon con un solo upsert por tabla.
+    """
+    def outcome(winner_id: Optional[int], side_id: int) -> dict:
+        if winner_id is None:
+            return {"wins": 0, "losses": 0, "draws": 1}
+        won = int(winner_id == side_id)
+        return {"wins": won, "losses": 1 - won, "draws": 0}
+
+    trainers: Dict[int, dict] = {}
+    pokemons: Dict[int, dict] = {}
+    for battle_data, participants in battles:
+        winner_id = battle_data.get("winner_id")
+        for side_id in (battle_data["trainer_id"], battle_data["opponent_id"]):
+            row = trainers.setdefault(side_id, dict.fromkeys(TRAINER_STATS_COLUMNS, 0))
+            row["battles"] += 1
+            for column_name, n in outcome(winner_id, side_id).items():
+                row[column_name] += n
+
+        # Un Pokémon cuenta una batalla por bando, aunque pelee varias rondas
+        sides: Dict[Tuple[int, int], dict] = {}
+        for p in participants:
+            fainted = int(p["hp_remaining"] == 0)
+            side = sides.setdefault((p["pokemon_id"], p["trainer_id"]), {"rounds": 0, "faints": 0})
+            side["rounds"] += 1
+            side["faints"] += fainted
+            trainers[p["trainer_id"]]["pokemon_used"] += 1
+            trainers[p["trainer_id"]]["pokemon_fainted"] += fainted
+
+        for (pokemon_id, side_id), side in sides.items():
+            row = pokemons.setdefault(pokemon_id, dict.fromkeys(POKEMON_STATS_COLUMNS, 0))
+            row["battles"] += 1
+            for column_name, n in {**outcome(winner_id, side_id), **side}.items():
+                row[column_name] += n
+
+    await _upsert_stats(
+        db, models.TrainerBattleStats, "trainer_id",
+        [{"trainer_id": trainer_id, **row} for trainer_id, row in trainers.items()]
+    )
+    await _upsert_stats(
+        db, models.PokemonBattleStats, "pokemon_id",
+        [{"pokemon_id": pokemon_id, **row} for pokemon_id, row in pokemons.items()]
+    )
+
+async def get_trainer_stats(db: AsyncSession, trainer_id: int):
+    """
+    Obtiene las estadísticas acumuladas de un entrenador.
+    
+    Args:
+        db: Sesión de base de datos.
+        trainer_id: ID del entrenador.
+        
+    Returns:
+        La fila de trainer_stats o None si aún no tiene batallas.
+    """
+    return await db.get(models.TrainerBattleStats, trainer_id)
+
+async def get_pokemon_stats(db: AsyncSession, pokemon_id: int):
+    """
+    Obtiene las estadísticas acumuladas de un Pokémon.
+    
+    Args:
+        db: Sesión de base de datos.
+        pokemon_id: ID del Pokémon.
+        
+    Returns:
+        La fila de pokemon_stats o None si aún no participó en batallas.
+    """
+    return await db.get(models.PokemonBattleStats, pokemon_id)
+
+async def rebuild_battle_stats(db: AsyncSession) -> Dict[str, int]:
+    """
+    Reconstruye trainer_stats y pokemon_stats desde el historial de batallas
+    (battles y battle_pokemons) en una sola transacción. Las tablas quedan
+    bloqueadas para escritura mientras tanto, así ninguna batalla nueva se
+    suma a medias. Las batallas antiguas cuentan con los bandos que les
+    completó `migrations.backfill_battle_sides` al iniciar la aplicación.
+    
+    Args:
+        db: Sesión de base de datos.
+        
+    Returns:
+        Cantidad de filas reconstruidas por tabla (trainers, pokemons).
+    """
+    await db.execute(text("LOCK TABLE trainer_stats, pokemon_stats IN EXCLUSIVE MODE"))
+    await db.execute(delete(models.TrainerBattleStats))
+    await db.execute(delete(models.PokemonBattleStats))
+
+    battle, participant = models.Battle, models.BattlePokemon
+
+    # Entrenadores: una fila por bando de cada batalla
+    sides = union_all(
+        select(battle.trainer_id.label("trainer_id"), battle.winner_id, battle.winner)
+        .where(battle.trainer_id.isnot(None)),
+        select(battle.opponent_id, battle.winner_id, battle.winner)
+        .where(battle.opponent_id.isnot(None)),
+    ).subquery("sides")
+    results = (
+        select(
+            sides.c.trainer_id,
+            func.count().label("battles"),
+            func.count().filter(sides.c.winner_id == sides.c.trainer_id).label("wins"),
+            func.count().filter(sides.c.winner_id != sides.c.trainer_id).label("losses"),
+            func.count().filter(sides.c.winner.is_(None)).label("draws"),
+        )
+        .group_by(sides.c.trainer_id)
+        .subquery("results")
+    )
+    usage = (
+        select(
+            participant.trainer_id,
+            func.count().label("pokemon_used"),
+            func.count().filter(participant.hp_remaining == 0).label("pokemon_fainted"),
+        )
+        .where(participant.trainer_id.isnot(None))
+        .group_by(participant.trainer_id)
+        .subquery("usage")
+    )
+    trainer_rows = await db.execute(
+        insert(models.TrainerBattleStats)
+        .from_select(
+            ["trainer_id", *TRAINER_STATS_COLUMNS],
+            select(
+                func.coalesce(results.c.trainer_id, usage.c.trainer_id),
+                *(func.coalesce(results.c[c], 0) for c in ("battles", "wins", "losses", "draws")),
+                *(func.coalesce(usage.c[c], 0) for c in ("pokemon_used", "pokemon_fainted")),
+            )
+            .select_from(results.join(usage, results.c.trainer_id == usage.c.trainer_id, full=True))
+        )
+        .returning(models.TrainerBattleStats.trainer_id)
+    )
+    trainers = len(trainer_rows.all())
+
+    # Pokémon: una fila por Pokémon, batalla y bando
+    appearances = (
+        select(
+            participant.pokemon_id,
+            participant.battle_id,
+            participant.trainer_id,
+            func.count().label("rounds"),
+            func.count().filter(participant.hp_remaining == 0).label("faints"),
+        )
+        .where(participant.pokemon_id.isnot(None))
+        .group_by(participant.pokemon_id, participant.battle_id, participant.trainer_id)
+        .subquery("appearances")
+    )
+    pokemon_rows = await db.execute(
+        insert(models.PokemonBattleStats)
+        .from_select(
+            ["pokemon_id", *POKEMON_STATS_COLUMNS],
+            select(
+                appearances.c.pokemon_id,
+                func.count(),
+                func.count().filter(battle.winner_id == appearances.c.trainer_id),
+                func.count().filter(battle.winner_id != appearances.c.trainer_id),
+                func.count().filter(battle.winner.is_(None)),
+                func.sum(appearances.c.rounds),
+                func.sum(appearances.c.faints),
+            )
+            .select_from(appearances.join(battle, battle.id == appearances.c.battle_id))
+            .group_by(appearances.c.pokemon_id)
+        )
+        .returning(models.PokemonBattleStats.pokemon_id)
+    )
+    pokemons = len(pokemon_rows.all())
+
+    await db.commit()
+    return {"trainers": trainers, "pokemons": pokemons}
+
+## ------------------------- Cola de Batallas ------------------------- ##
+
+async def create_battle_job(
+    db: AsyncSession,
+    battle: schemas.BattleCreate,
+    keep_winner_pokemon: bool = True,
+    log: str = "text"
+):
+    """
+    Encola una batalla para que la simule un worker.
+    
+    Args:
+        db: Sesión de base de datos.
+        battle: Datos de la batalla.
+        keep_winner_pokemon: Regla de la simulación.
+        log: Formato del registro (none, events o text).
+        
+    Returns:
+        El trabajo creado (estado pending).
+        
+    Raises:
+        ValueError: Si algún entrenador no existe.
+    """
+    opponent = await get_trainer(db, battle.opponent_id)
+    trainer = await get_trainer(db, battle.trainer_id)
+
+    if not opponent or not trainer:
+        raise ValueError("Entrenador no encontrado")
+
+    db_job = models.BattleJob(
+        trainer_id=battle.trainer_id,
+        opponent_id=battle.opponent_id,
+        keep_winner_pokemon=keep_winner_pokemon,
+        log=log,
+        status="pending"
+    )
+
+    db.add(db_job)
+    await db.commit()
+    await db.refresh(db_job)
+    return db_job
+
+async def get_battle_job(db: AsyncSession, job_id: int):
+    """
+    Obtiene un trabajo de la cola por su ID.
+    
+    Args:
+        db: Sesión de base de datos.
+        job_id: ID del trabajo.
+        
+    Returns:
+        El trabajo encontrado o None si no existe.
+    """
+    result = await db.execute(
+        select(models.BattleJob)
+        .where(models.BattleJob.id == job_id)
+    )
+    return result.scalar_one_or_none()
+
+async def claim_battle_job(db: AsyncSession, stale_after_seconds: int, max_attempts: int):
+    """
+    Reclama el siguiente trabajo de la cola y lo marca como running.
+    
+    `FOR UPDATE SKIP LOCKED` hace que cada worker tome una fila distinta sin
+    esperar a los demás. Primero se toma el pendiente más antiguo (índice
+    parcial ix_battle_jobs_pending) y, si no hay, un trabajo running cuyo
+    worker dejó de responder hace más de `stale_after_seconds` (índice
+    parcial ix_battle_jobs_running). Los abandonados que ya se reclamaron
+    `max_attempts` veces se marcan failed.
+    
+    Args:
+        db: Sesión de base de datos.
+        stale_after_seconds: Tiempo tras el cual un trabajo running se considera abandonado.
+        max_attempts: Reclamos permitidos antes de dejar de reintentar.
+        
+    Returns:
+        El trabajo reclamado o None si la cola está vacía.
+    """
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=stale_after_seconds)
+    # Los abandonados que ya agotaron sus reclamos no se reintentan: terminan como failed
+    await db.execute(
+        update(models.BattleJob)
+        .where(
+            models.BattleJob.status == "running",
+            models.BattleJob.started_at < stale_before,
+            models.BattleJob.attempts >= max_attempts
+        )
+        .values(
+            status="failed",
+            error=f"El trabajo no terminó tras {max_attempts} intentos",
+            finished_at=now
+        )
+    )
+    result = await db.execute(
+        select(models.BattleJob)
+        .where(models.BattleJob.status == "pending")
+        .order_by(models.BattleJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    db_job = result.scalar_one_or_none()
+
+    if db_job is None:
+        result = await db.execute(
+            select(models.BattleJob)
+            .where(
+                models.BattleJob.status == "running",
+                models.BattleJob.started_at < stale_before,
+                models.BattleJob.attempts < max_attempts
+            )
+            .order_by(models.BattleJob.started_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        db_job = result.scalar_one_or_none()
+
+    if db_job:
+        db_job.status = "running"
+        db_job.started_at = now
+        db_job.attempts += 1
+    await db.commit()
+    return db_job
+
+async def complete_battle_job(
+    db: AsyncSession,
+    job_id: int,
+    attempt: int,
+    status: str,
+    result: Optional[dict] = None,
+    error: Optional[str] = None
+):
+    """
+    Registra el final de un trabajo de la cola. Solo se aplica si el trabajo
+    sigue en manos del reclamo `attempt` (un worker lento no pisa el
+    resultado del que lo retomó).
+    
+    Args:
+        db: Sesión de base de datos.
+        job_id: ID del trabajo.
+        attempt: Número de reclamo del worker que lo procesó.
+        status: Estado final (done o failed). Con done el trabajo ya quedó
+            marcado junto con la batalla (`persist_battle`); aquí solo se
+            agrega el resultado.
+        result: BattleResult serializado (si terminó bien).
+        error: Motivo del fallo.
+    """
+    query = update(models.BattleJob).where(
+        models.BattleJob.id == job_id,
+        models.BattleJob.attempts == attempt
+    )
+    if status == "done":
+        query = query.where(models.BattleJob.status == "done").values(result=result)
+    else:
+        query = query.where(models.BattleJob.status == "running").values(
+            status=status,
+            error=error,
+            finished_at=datetime.now(timezone.utc)
+        )
+    await db.execute(query)
+    await db.commit()
@@ -0,0 +1,67 @@
+"""
+Exportación masiva de tablas en NDJSON (un objeto JSON por línea) o CSV.
+
+La respuesta se transmite mientras se lee: `crud.stream_export_rows` recorre
+la tabla con un cursor del servidor por lotes de EXPORT_BATCH_SIZE filas y
+cada lote se escribe como un fragmento de la respuesta. La memoria usada no
+depende del tamaño de la tabla y el primer byte sale con el primer lote (el
+encabezado CSV, antes de consultar).
+
+La exportación abre su propia sesión: las dependencias de FastAPI se cierran
+antes de que termine de enviarse una respuesta en streaming.
+"""
+from typing import Iterable, Sequence, Tuple
+import csv
+import io
+import json
+
+from fastapi.responses import StreamingResponse
+
+from . import crud
+from .database import AsyncSessionLocal
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+def encode_ndjson(columns: Sequence[str], rows: Iterable[Tuple]) -> str:
+    """Líneas NDJSON de un lote de filas"""
+    return "".join(
+        json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n"
+        for row in rows
+    )
+
+def _csv_value(value):
+    """Listas y objetos como JSON dentro de la celda; NULL como celda vacía"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return "" if value is None else value
+
+def encode_csv(rows: Iterable[Sequence]) -> str:
+    """Líneas CSV de un lote de filas"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+def export_response(model, columns: Tuple[str, ...], export_format: str, filename: str) -> StreamingResponse:
+    """
+    Respuesta que transmite la tabla de `model` completa (ordenada por ID)
+    en `export_format` ("ndjson" o "csv").
+    """
+    async def chunks():
+        if export_format == "csv":
+            yield encode_csv([columns])
+        async with AsyncSessionLocal() as db:
+            async for rows in crud.stream_export_rows(db, model, columns):
+                if export_format == "csv":
+                    yield encode_csv(rows)
+                else:
+                    yield encode_ndjson(columns, rows)
+
+    return StreamingResponse(
+        chunks(),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
@@ -0,0 +1,94 @@
+"""
+Workers asíncronos de la cola de batallas (tabla battle_jobs).
+
+POST /batallas/?queue=true solo inserta el trabajo y responde al instante.
+Cada worker reclama trabajos con `SELECT ... FOR UPDATE SKIP LOCKED`, así que
+se pueden sumar workers (o instancias de la API) sin que dos procesen el mismo.
+La simulación usa `simulate_battle`, igual que la ruta síncrona.
+
+Variables de entorno:
+- BATTLE_JOB_WORKERS: workers por proceso (0 deshabilita el consumo de la cola).
+- BATTLE_JOB_POLL_SECONDS: espera cuando la cola está vacía.
+- BATTLE_JOB_TIMEOUT_SECONDS: tras este tiempo un trabajo running se reintenta.
+
+La batalla y el estado done del trabajo se guardan en la misma transacción,
+condicionada a que el trabajo siga en manos del mismo reclamo (`attempts`):
+un worker que tardó más que el timeout no vuelve a guardar la batalla.
+"""
+from typing import List
+import asyncio
+import os
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from . import crud
+from .database import AsyncSessionLocal
+from .routers.battle import simulate_battle
+
+BATTLE_JOB_WORKERS = int(os.getenv("BATTLE_JOB_WORKERS", "2"))
+BATTLE_JOB_POLL_SECONDS = float(os.getenv("BATTLE_JOB_POLL_SECONDS", "0.5"))
+BATTLE_JOB_TIMEOUT_SECONDS = int(os.getenv("BATTLE_JOB_TIMEOUT_SECONDS", "300"))
+BATTLE_JOB_MAX_ATTEMPTS = 3
+
+_workers: List[asyncio.Task] = []
+
+async def process_next_job() -> bool:
+    """
+    Reclama y procesa un trabajo de la cola.
+    Retorna False si no había trabajos pendientes.
+    """
+    async with AsyncSessionLocal() as db:
+        job = await crud.claim_battle_job(db, BATTLE_JOB_TIMEOUT_SECONDS, BATTLE_JOB_MAX_ATTEMPTS)
+        if job is None:
+            return False
+        job_id, attempt = job.id, job.attempts  # El rollback expira el objeto
+
+        try:
+            result = await simulate_battle(
+                db, job.trainer_id, job.opponent_id, job.keep_winner_pokemon, job.log,
+                job=(job_id, attempt)
+            )
+        except crud.BattleJobLost:
+            # Otro worker lo retomó (este tardó más que BATTLE_JOB_TIMEOUT_SECONDS): nada que guardar
+            return True
+        except HTTPException as e:
+            # Errores de validación (entrenador sin Pokémon, etc.): no se reintentan
+            await db.rollback()
+            await crud.complete_battle_job(db, job_id, attempt, "failed", error=e.detail)
+        except Exception as e:
+            await db.rollback()
+            await crud.complete_battle_job(
+                db, job_id, attempt, "failed", error=f"Error al simular la batalla: {e}"
+            )
+        else:
+            # La batalla y el estado done ya se guardaron juntos; solo falta el resultado
+            await crud.complete_battle_job(db, job_id, attempt, "done", result=jsonable_encoder(result))
+        return True
+
+async def _worker_loop():
+    while True:
+        try:
+            if not await process_next_job():
+                await asyncio.sleep(BATTLE_JOB_POLL_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Base de datos caída u otro error transitorio: reintentar más tarde
+            print(f"✖ Error en el worker de batallas: {e}")
+            await asyncio.sleep(BATTLE_JOB_POLL_SECONDS)
+
+def start_job_workers():
+    """Lanza los workers de la cola (evento de inicio de la aplicación)"""
+    for _ in range(BATTLE_JOB_WORKERS - len(_workers)):
+        _workers.append(asyncio.create_task(_worker_loop()))
+
+async def stop_job_workers():
+    """
+    Detiene los workers (evento de apagado). Un trabajo interrumpido queda
+    running y otro worker lo retoma al vencer BATTLE_JOB_TIMEOUT_SECONDS.
+    """
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
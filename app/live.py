@@ -0,0 +1,123 @@
+"""
+Batallas en vivo: eventos turno a turno para espectadores (SSE / WebSocket).
+
+El bucle de turnos del motor es código síncrono y CPU intensivo, así que se
+ejecuta en un hilo; cada `BattleEvent` que produce se entrega al event loop en
+cuanto ocurre y `stream_best_of_three` lo expone como un generador asíncrono.
+
+Una sola simulación alimenta a todos los espectadores: `LiveBattle` guarda los
+mensajes ya emitidos (para quien se conecta tarde) y reparte cada mensaje
+nuevo a la cola de cada suscriptor.
+"""
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional, Set, Union
+import asyncio
+import os
+import uuid
+
+from .battle_engine import BattleEvent, simulate_best_of_three
+
+# Segundos que una batalla terminada sigue disponible para nuevos espectadores
+LIVE_RETENTION_SECONDS = int(os.getenv("LIVE_RETENTION_SECONDS", "300"))
+
+# --------------------------------------------------
+# EVENTOS A MEDIDA QUE OCURREN
+# --------------------------------------------------
+
+class _EventSink(list):
+    """Lista de eventos que además avisa al event loop de cada evento nuevo"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        super().__init__()
+        self._loop = loop
+        self._queue = queue
+
+    def append(self, event: BattleEvent):
+        super().append(event)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+async def stream_best_of_three(*args, **kwargs) -> AsyncIterator[Union[BattleEvent, dict]]:
+    """
+    Igual que `simulate_best_of_three` pero produce cada `BattleEvent` en cuanto
+    el motor lo genera. El último elemento es el diccionario con el resultado.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    future = loop.run_in_executor(
+        None, partial(simulate_best_of_three, *args, events=_EventSink(loop, queue), **kwargs)
+    )
+    # Los avisos de eventos van por call_soon_threadsafe antes que este: el orden se conserva
+    future.add_done_callback(lambda _: queue.put_nowait(done))
+
+    while True:
+        item = await queue.get()
+        if item is done:
+            break
+        yield item
+    yield await future
+
+# --------------------------------------------------
+# DIFUSIÓN A ESPECTADORES
+# --------------------------------------------------
+
+class LiveBattle:
+    """
+    Batalla en curso compartida por todos sus espectadores.
+    Los mensajes son diccionarios con `type`: "event", "result" o "error".
+    """
+
+    def __init__(self, trainer_id: int, opponent_id: int):
+        self.live_id = uuid.uuid4().hex
+        self.trainer_id = trainer_id
+        self.opponent_id = opponent_id
+        self.history: List[dict] = []
+        self.finished = False
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def publish(self, message: dict):
+        """Envía un mensaje a todos los espectadores conectados"""
+        self.history.append(message)
+        for queue in self._subscribers:
+            queue.put_nowait(message)
+
+    def close(self):
+        """Marca la batalla como terminada y libera a los espectadores"""
+        self.finished = True
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        asyncio.get_running_loop().call_later(
+            LIVE_RETENTION_SECONDS, LIVE_BATTLES.pop, self.live_id, None
+        )
+
+    async def subscribe(self) -> AsyncIterator[dict]:
+        """Mensajes desde el inicio de la batalla y luego los nuevos hasta que termine"""
+        queue: asyncio.Queue = asyncio.Queue()
+        # Sin await entre copiar el historial y registrarse: no se pierde ningún mensaje
+        backlog = list(self.history)
+        live = not self.finished
+        if live:
+            self._subscribers.add(queue)
+        try:
+            for message in backlog:
+                yield message
+            if not live:
+                return
+            while True:
+                message = await queue.get()
+                if message is None:
+                    return
+                yield message
+        finally:
+            self._subscribers.discard(queue)
+
+# Batallas en vivo por `live_id` (en memoria del proceso)
+LIVE_BATTLES: Dict[str, LiveBattle] = {}
+
+def start_live_battle(trainer_id: int, opponent_id: int) -> LiveBattle:
+    """Registra una batalla en vivo nueva"""
+    live = LiveBattle(trainer_id, opponent_id)
+    LIVE_BATTLES[live.live_id] = live
+    return live
@@ -1,7 +1,7 @@
 # app/main.py
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -12,9 +12,14 @@ from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncEngine
 
 # Importaciones de tu aplicación
-from app.database import engine, Base
+from app.database import engine, Base, AsyncSessionLocal
+from app.crud import POKEMON_SEARCH_BACKEND, configure_search_backend, load_pokemon_name_index
 from app.routers import pokemon, trainer, battle, auth, admin
 from app.initial_data import create_initial_admin
+from app.migrations import enable_trigram_search, run_migrations
+from app.workers import shutdown_battle_executor
+from app.jobs import start_job_workers, stop_job_workers
+from app.timing import BATTLE_PHASES
 from app.models import *
 
 # --------------------------------------------------
@@ -64,6 +69,12 @@ async def initialize_database():
             print("✔ Base de datos inicializada correctamente")
         else:
             print("✔ Tablas ya existen en la base de datos")
+
+        # Tablas y columnas agregadas en versiones posteriores
+        async with engine.begin() as conn:
+            await run_migrations(conn)
+            trigram_available = POKEMON_SEARCH_BACKEND != "like" and await enable_trigram_search(conn)
+        print(f"✔ Búsqueda por nombre: {configure_search_backend(trigram_available)}")
     except Exception as e:
         print(f"✖ Error al inicializar la base de datos: {e}")
         raise
@@ -77,6 +88,16 @@ async def startup_event():
     await initialize_database()
     await create_initial_admin()
     print("✔ Verificado/Creado administrador inicial")
+    async with AsyncSessionLocal() as db:
+        indexed = await load_pokemon_name_index(db)
+    print(f"✔ Índice de búsqueda cargado ({indexed} Pokémon)")
+    start_job_workers()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Evento de apagado: detiene los workers de la cola y el pool de procesos de batallas"""
+    await stop_job_workers()
+    shutdown_battle_executor()
 
 # --------------------------------------------------
 # MIDDLEWARES
@@ -136,6 +157,11 @@ async def root():
         }
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Histogramas de las fases de las batallas (formato de texto de Prometheus)"""
+    return PlainTextResponse(BATTLE_PHASES.render(), media_type="text/plain; version=0.0.4")
+
 # --------------------------------------------------
 # INCLUSIÓN DE ROUTERS
 # --------------------------------------------------
@@ -0,0 +1,167 @@
+"""
+Migraciones idempotentes que se aplican al iniciar la aplicación.
+
+`Base.metadata.create_all` solo crea tablas que no existen; las columnas e
+índices nuevos de tablas existentes se agregan aquí con sentencias
+`IF NOT EXISTS`, de modo que ejecutarlas varias veces es seguro.
+"""
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import Base
+from app.search_index import normalize_text
+
+MIGRATIONS = [
+    # Batallas reproducibles: semilla + versión del motor + foto de estadísticas
+    "ALTER TABLE battles ADD COLUMN IF NOT EXISTS seed BIGINT",
+    "ALTER TABLE battles ADD COLUMN IF NOT EXISTS engine_version INTEGER",
+    "ALTER TABLE battles ADD COLUMN IF NOT EXISTS keep_winner_pokemon BOOLEAN DEFAULT TRUE",
+    "ALTER TABLE battles ADD COLUMN IF NOT EXISTS snapshot JSON",
+    # Oponente y ronda en la que participó cada Pokémon
+    "ALTER TABLE battles ADD COLUMN IF NOT EXISTS opponent_id INTEGER REFERENCES trainers(id)",
+    "ALTER TABLE battle_pokemons ADD COLUMN IF NOT EXISTS battle_round INTEGER",
+    # Ganador por ID (ratings y estadísticas sin comparar nombres)
+    "ALTER TABLE battles ADD COLUMN IF NOT EXISTS winner_id INTEGER REFERENCES trainers(id)",
+    # Entrenador de cada participante (estadísticas por bando)
+    "ALTER TABLE battle_pokemons ADD COLUMN IF NOT EXISTS trainer_id INTEGER REFERENCES trainers(id)",
+    # Cola de batallas: los workers solo recorren los trabajos pendientes
+    "CREATE INDEX IF NOT EXISTS ix_battle_jobs_pending ON battle_jobs (id) WHERE status = 'pending'",
+    # Recuperación de trabajos running abandonados (por antigüedad del reclamo)
+    "CREATE INDEX IF NOT EXISTS ix_battle_jobs_running ON battle_jobs (started_at) WHERE status = 'running'",
+    # Nombre normalizado e indexado (se rellena con `backfill_name_normalized`).
+    # Índice no único: los nombres de Pokémon pueden repetirse (ver models.Pokemon)
+    'ALTER TABLE pokemons ADD COLUMN IF NOT EXISTS name_normalized VARCHAR(100) COLLATE "C"',
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_name_normalized ON pokemons (name_normalized)",
+    # Filtros por estadística y tipo del listado de Pokémon
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_level ON pokemons (level, id)",
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_hp ON pokemons (hp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_attack ON pokemons (attack, id)",
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_defense ON pokemons (defense, id)",
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_special_attack ON pokemons (special_attack, id)",
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_special_defense ON pokemons (special_defense, id)",
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_speed ON pokemons (speed, id)",
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_types ON pokemons USING gin (string_to_array(lower(element), '/'))",
+]
+
+# Filas por lote al rellenar name_normalized
+BACKFILL_BATCH_SIZE = 1000
+
+# Búsqueda por trigramas: requiere la extensión pg_trgm (paquete contrib de
+# PostgreSQL y permisos para instalarla). Es opcional: si falla, la búsqueda
+# por nombre sigue usando LIKE.
+TRIGRAM_MIGRATIONS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "DROP INDEX IF EXISTS ix_pokemons_name_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_pokemons_name_normalized_trgm ON pokemons USING gin (name_normalized gin_trgm_ops)",
+]
+
+async def enable_trigram_search(conn: AsyncConnection) -> bool:
+    """
+    Instala pg_trgm y el índice GIN de nombres dentro de un savepoint.
+    Retorna False (sin abortar la transacción) si la extensión no está disponible.
+    """
+    try:
+        async with conn.begin_nested():
+            for statement in TRIGRAM_MIGRATIONS:
+                await conn.execute(text(statement))
+    except DBAPIError as e:
+        print(f"⚠ Búsqueda por trigramas no disponible: {str(e.orig).splitlines()[0]}")
+        return False
+    return True
+
+async def run_migrations(conn: AsyncConnection):
+    """Crea las tablas nuevas y aplica las migraciones pendientes"""
+    await conn.run_sync(Base.metadata.create_all)
+    for statement in MIGRATIONS:
+        await conn.execute(text(statement))
+    await backfill_name_normalized(conn)
+    await backfill_battle_sides(conn)
+
+async def backfill_name_normalized(conn: AsyncConnection) -> int:
+    """
+    Calcula name_normalized de los Pokémon que aún no lo tienen (filas
+    anteriores a la columna) con las mismas reglas que `normalize_text`.
+    Retorna la cantidad de filas actualizadas.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        # Lotes por rango de ID: nunca se cargan todas las filas pendientes a la vez
+        result = await conn.execute(
+            text(
+                "SELECT id, name FROM pokemons "
+                "WHERE name_normalized IS NULL AND id > :last_id "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE}
+        )
+        rows = [{"id": pokemon_id, "name_normalized": normalize_text(name)} for pokemon_id, name in result]
+        if not rows:
+            break
+        await conn.execute(
+            text("UPDATE pokemons SET name_normalized = :name_normalized WHERE id = :id"),
+            rows
+        )
+        updated += len(rows)
+        last_id = rows[-1]["id"]
+    if updated:
+        print(f"✔ name_normalized calculado para {updated} Pokémon")
+    return updated
+
+# Batallas anteriores a opponent_id / winner_id / battle_pokemons.trainer_id:
+# solo guardaban el nombre del oponente y del ganador, y los participantes se
+# insertaban por ronda en orden (primero el del entrenador, luego el del oponente).
+LEGACY_BATTLE_BACKFILLS = [
+    # Oponente: el único entrenador con ese nombre
+    """
+    UPDATE battles b SET opponent_id = t.id
+    FROM trainers t
+    WHERE b.opponent_id IS NULL AND t.name = b.opponent_name
+      AND (SELECT count(*) FROM trainers same WHERE same.name = b.opponent_name) = 1
+    """,
+    # Ganador: el bando cuyo nombre coincide con `winner` (si los nombres no se repiten)
+    """
+    UPDATE battles b SET winner_id = CASE
+        WHEN b.winner = t.name THEN b.trainer_id
+        ELSE b.opponent_id
+    END
+    FROM trainers t
+    WHERE t.id = b.trainer_id AND b.winner_id IS NULL AND b.winner IS NOT NULL
+      AND t.name <> b.opponent_name
+      AND (b.winner = t.name OR (b.winner = b.opponent_name AND b.opponent_id IS NOT NULL))
+    """,
+    # Participantes: posiciones impares del entrenador, pares del oponente
+    """
+    UPDATE battle_pokemons bp
+    SET trainer_id = CASE WHEN sides.position % 2 = 1 THEN sides.trainer_id ELSE sides.opponent_id END
+    FROM (
+        SELECT p.id, b.trainer_id, b.opponent_id,
+               row_number() OVER (PARTITION BY p.battle_id ORDER BY p.id) AS position
+        FROM battle_pokemons p
+        JOIN battles b ON b.id = p.battle_id
+        WHERE p.battle_id IN (
+            SELECT battle_id FROM battle_pokemons
+            GROUP BY battle_id
+            HAVING bool_and(trainer_id IS NULL) AND count(*) % 2 = 0
+        )
+    ) sides
+    WHERE bp.id = sides.id
+    """,
+]
+
+async def backfill_battle_sides(conn: AsyncConnection) -> int:
+    """
+    Completa opponent_id, winner_id y el bando de cada participante de las
+    batallas antiguas a partir de los nombres guardados, para que
+    `crud.rebuild_battle_stats` cuente sus victorias, derrotas y Pokémon.
+    Los casos ambiguos (nombres repetidos) quedan en NULL.
+    Retorna la cantidad de filas actualizadas.
+    """
+    updated = 0
+    for statement in LEGACY_BATTLE_BACKFILLS:
+        result = await conn.execute(text(statement))
+        updated += result.rowcount
+    if updated:
+        print(f"✔ Bandos de batallas antiguas completados ({updated} filas)")
+    return updated
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, ARRAY
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Float, ForeignKey, Index, ARRAY, JSON, func, literal_column
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from sqlalchemy import DateTime
@@ -24,6 +24,11 @@ class Pokemon(Base):
 
     id = Column(Integer, primary_key=True, index=True)  # ID único
     name = Column(String(100), nullable=False)  # Nombre (requerido)
+    # Nombre sin acentos, en minúsculas y con espacios simples (`normalize_text`).
+    # Collation "C": el índice B-tree sirve para igualdad y rangos de prefijo.
+    # No es único: `name` nunca lo fue (crear un Pokémon no valida repetidos) y
+    # nombres distintos pueden normalizar igual ("Pokémon" y "pokemon").
+    name_normalized = Column(String(100, collation="C"), index=True)
     element = Column(String(50))  # Tipo(s) elemental (ej: "Fuego/Volador")
     hp = Column(Integer)  # Puntos de salud base
     attack = Column(Integer)  # Ataque físico
@@ -35,6 +40,23 @@ class Pokemon(Base):
     current_hp = Column(Integer)  # HP actual (para combates en curso)
     level = Column(Integer, default=1)  # Nivel del Pokémon (nuevo campo)
 
+    # Filtros y orden del listado (`crud.get_pokemons`): un índice (estadística, id)
+    # por cada columna ordenable y un GIN sobre la lista de tipos de `element`
+    __table_args__ = (
+        Index("ix_pokemons_level", "level", "id"),
+        Index("ix_pokemons_hp", "hp", "id"),
+        Index("ix_pokemons_attack", "attack", "id"),
+        Index("ix_pokemons_defense", "defense", "id"),
+        Index("ix_pokemons_special_attack", "special_attack", "id"),
+        Index("ix_pokemons_special_defense", "special_defense", "id"),
+        Index("ix_pokemons_speed", "speed", "id"),
+        Index(
+            "ix_pokemons_types",
+            func.string_to_array(func.lower(element), literal_column("'/'")),
+            postgresql_using="gin"
+        ),
+    )
+
     # Relación muchos-a-muchos con entrenadores (a través de TrainerPokemon)
     trainer_pokemons = relationship("TrainerPokemon", back_populates="pokemon")
     
@@ -57,7 +79,7 @@ class Trainer(Base):
     pokemons = relationship("TrainerPokemon", back_populates="trainer")
     
     # Relación con las batallas que ha participado
-    battles = relationship("Battle", back_populates="trainer")
+    battles = relationship("Battle", back_populates="trainer", foreign_keys="Battle.trainer_id")
 
 class TrainerPokemon(Base):
     """
@@ -105,15 +127,23 @@ class Battle(Base):
 
     id = Column(Integer, primary_key=True, index=True)  # ID único
     trainer_id = Column(Integer, ForeignKey("trainers.id"))  # Entrenador que inició
+    opponent_id = Column(Integer, ForeignKey("trainers.id"))  # Entrenador oponente
     opponent_name = Column(String(100), nullable=False)  # Nombre del oponente
     winner = Column(String(100))  # Nombre del ganador (puede ser null para empates)
+    winner_id = Column(Integer, ForeignKey("trainers.id"))  # Entrenador ganador (null en empates)
     date = Column(
         String, 
         default=datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')  # Fecha auto-generada
     )
 
+    # Datos para repetir la batalla bajo demanda (en lugar de guardar el registro completo)
+    seed = Column(BigInteger)  # Semilla del generador aleatorio de la batalla
+    engine_version = Column(Integer)  # Versión del motor que simuló la batalla
+    keep_winner_pokemon = Column(Boolean, default=True)  # Regla usada en la simulación
+    snapshot = Column(JSON)  # Estadísticas de entrenadores y Pokémon al iniciar
+
     # Relación con el entrenador que inició la batalla
-    trainer = relationship("Trainer", back_populates="battles")
+    trainer = relationship("Trainer", back_populates="battles", foreign_keys=[trainer_id])
     
     # Relación con los Pokémon que participaron
     pokemons = relationship("BattlePokemon", back_populates="battle")
@@ -130,7 +160,91 @@ class BattlePokemon(Base):
     pokemon_id = Column(Integer, ForeignKey("pokemons.id"))  # ID del Pokémon
     hp_remaining = Column(Integer)  # HP restante al final de la batalla
     participated = Column(Boolean, default=False)  # Si participó efectivamente
+    battle_round = Column(Integer)  # Ronda del mejor de 3 en la que participó
+    trainer_id = Column(Integer, ForeignKey("trainers.id"))  # Entrenador con el que peleó
 
     # Relaciones con Batalla y Pokémon
     battle = relationship("Battle", back_populates="pokemons")
-    pokemon = relationship("Pokemon", back_populates="battles")
\ No newline at end of file
+    pokemon = relationship("Pokemon", back_populates="battles")
+
+class BattleJob(Base):
+    """
+    Batalla solicitada en segundo plano (cola persistente).
+    Los workers de app/jobs.py la reclaman con FOR UPDATE SKIP LOCKED.
+    """
+    __tablename__ = "battle_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)  # ID del trabajo
+    trainer_id = Column(Integer, ForeignKey("trainers.id"), nullable=False)  # Entrenador que inicia
+    opponent_id = Column(Integer, ForeignKey("trainers.id"), nullable=False)  # Entrenador oponente
+    keep_winner_pokemon = Column(Boolean, default=True)  # Regla de la simulación
+    log = Column(String(10), default="text")  # Formato del registro (none, events o text)
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, done o failed
+    attempts = Column(Integer, nullable=False, default=0)  # Veces que un worker lo reclamó
+    battle_id = Column(Integer, ForeignKey("battles.id"))  # Batalla creada al terminar
+    result = Column(JSON)  # BattleResult serializado
+    error = Column(String)  # Motivo del fallo
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime(timezone=True))  # Último reclamo por un worker
+    finished_at = Column(DateTime(timezone=True))
+
+class TrainerRating(Base):
+    """
+    Rating Elo de cada entrenador, actualizado en la misma transacción que
+    registra cada batalla. El índice por rating sirve la tabla de posiciones
+    sin recorrer el historial de batallas.
+    """
+    __tablename__ = "trainer_ratings"
+    __table_args__ = (
+        Index("ix_trainer_ratings_rating", "rating", "trainer_id"),
+    )
+
+    trainer_id = Column(
+        Integer,
+        ForeignKey("trainers.id", ondelete="CASCADE"),
+        primary_key=True
+    )  # Entrenador calificado
+    rating = Column(Float, nullable=False, default=1500.0)  # Rating Elo
+    games = Column(Integer, nullable=False, default=0)  # Batallas calificadas
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True))  # Última batalla calificada
+
+class TrainerBattleStats(Base):
+    """
+    Estadísticas acumuladas de batallas por entrenador (rollup).
+    Se incrementan al registrar cada batalla y se pueden reconstruir desde
+    el historial con `crud.rebuild_battle_stats`.
+    """
+    __tablename__ = "trainer_stats"
+
+    trainer_id = Column(
+        Integer,
+        ForeignKey("trainers.id", ondelete="CASCADE"),
+        primary_key=True
+    )  # Entrenador
+    battles = Column(Integer, nullable=False, default=0)  # Batallas disputadas
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    pokemon_used = Column(Integer, nullable=False, default=0)  # Rondas disputadas por sus Pokémon
+    pokemon_fainted = Column(Integer, nullable=False, default=0)  # Rondas que terminaron debilitados
+
+class PokemonBattleStats(Base):
+    """
+    Estadísticas acumuladas de batallas por Pokémon (rollup).
+    """
+    __tablename__ = "pokemon_stats"
+
+    pokemon_id = Column(
+        Integer,
+        ForeignKey("pokemons.id", ondelete="CASCADE"),
+        primary_key=True
+    )  # Pokémon
+    battles = Column(Integer, nullable=False, default=0)  # Batallas en las que participó
+    wins = Column(Integer, nullable=False, default=0)  # Batallas que ganó su entrenador
+    losses = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    rounds = Column(Integer, nullable=False, default=0)  # Rondas disputadas
+    faints = Column(Integer, nullable=False, default=0)  # Rondas que terminó debilitado
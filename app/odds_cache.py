@@ -0,0 +1,108 @@
+"""
+Caché LRU de probabilidades de victoria (POST /batallas/probabilidades).
+
+La clave es la huella de ambos equipos (ids, niveles y estadísticas de cada
+Pokémon) más los parámetros de la simulación, así que un equipo modificado
+nunca reutiliza un resultado viejo. Además, las funciones de crud que cambian
+un equipo o un Pokémon invalidan las entradas afectadas para liberar espacio
+de inmediato en lugar de esperar a que el LRU las desaloje.
+
+La caché vive en la memoria de cada proceso de la API.
+"""
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Sequence, Set
+import os
+
+from .battle_engine import PokemonStats
+
+ODDS_CACHE_SIZE = int(os.getenv("ODDS_CACHE_SIZE", "1024"))
+
+def roster_fingerprint(roster: Sequence[PokemonStats]) -> tuple:
+    """Huella de un equipo: todas las entradas de la simulación, sin importar el orden"""
+    return tuple(sorted(
+        (
+            p.id, p.element, p.hp, p.attack, p.defense, p.special_attack,
+            p.special_defense, p.speed, tuple(p.moves), p.current_hp, p.level
+        )
+        for p in roster
+    ))
+
+class OddsCache:
+    """
+    Diccionario LRU con tope de entradas e índices inversos por entrenador y
+    por Pokémon para invalidar solo lo que cambió.
+    """
+
+    def __init__(self, max_entries: int = ODDS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, dict]" = OrderedDict()
+        self._by_trainer: Dict[int, Set[Hashable]] = {}
+        self._by_pokemon: Dict[int, Set[Hashable]] = {}
+        self._owners: Dict[Hashable, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        """Resultado guardado para `key` (lo marca como usado recientemente)"""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(
+        self,
+        key: Hashable,
+        value: dict,
+        trainer_ids: Iterable[int],
+        pokemon_ids: Iterable[int]
+    ):
+        """Guarda un resultado indicando de qué entrenadores y Pokémon depende"""
+        if self.max_entries <= 0:
+            return
+        self._discard(key)
+        trainer_ids, pokemon_ids = tuple(set(trainer_ids)), tuple(set(pokemon_ids))
+        self._entries[key] = value
+        self._owners[key] = (trainer_ids, pokemon_ids)
+        for trainer_id in trainer_ids:
+            self._by_trainer.setdefault(trainer_id, set()).add(key)
+        for pokemon_id in pokemon_ids:
+            self._by_pokemon.setdefault(pokemon_id, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def invalidate_trainer(self, trainer_id: int):
+        """Descarta los resultados en los que participa el equipo de `trainer_id`"""
+        for key in list(self._by_trainer.get(trainer_id, ())):
+            self._discard(key)
+
+    def invalidate_pokemon(self, pokemon_id: int):
+        """Descarta los resultados de cualquier equipo que incluya a `pokemon_id`"""
+        for key in list(self._by_pokemon.get(pokemon_id, ())):
+            self._discard(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._owners.clear()
+        self._by_trainer.clear()
+        self._by_pokemon.clear()
+
+    def _discard(self, key: Hashable):
+        if self._entries.pop(key, None) is None:
+            return
+        trainer_ids, pokemon_ids = self._owners.pop(key)
+        for index, ids in ((self._by_trainer, trainer_ids), (self._by_pokemon, pokemon_ids)):
+            for owner_id in ids:
+                keys = index.get(owner_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index[owner_id]
+
+ODDS_CACHE = OddsCache()
@@ -0,0 +1,101 @@
+"""
+Paginación por cursor (keyset) de los listados.
+
+En lugar de OFFSET, cada página pide las filas posteriores a la última
+entregada según el orden del listado: `WHERE (clave) > (última clave)
+ORDER BY clave LIMIT n`. Con un índice sobre la clave el costo de una página
+no depende de cuán lejos esté en el listado.
+
+La última clave viaja al cliente como `next_cursor`, un texto opaco (JSON en
+base64 URL-safe) que incluye el alcance del listado (ej: el orden elegido)
+para rechazar cursores de otro listado u otro orden.
+"""
+from typing import Any, Optional, Sequence, Tuple
+import base64
+import binascii
+import json
+
+from sqlalchemy import and_, literal, or_, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+def encode_cursor(scope: str, key: Sequence[Any]) -> str:
+    """Cursor opaco para continuar `scope` después de la fila con clave `key`"""
+    payload = json.dumps([scope, list(key)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def _matches(value: Any, expected) -> bool:
+    """
+    Si `value` es de `expected` (un tipo o tupla de tipos, como en isinstance).
+    JSON no distingue bool de int ni int de float: un bool solo vale donde se
+    espera bool y un entero vale donde se espera float.
+    """
+    expected = expected if isinstance(expected, tuple) else (expected,)
+    if isinstance(value, bool):
+        return bool in expected
+    if isinstance(value, int) and float in expected:
+        return True
+    return isinstance(value, expected)
+
+def decode_cursor(cursor: str, scope: str, types: Sequence[Any]) -> Tuple[Any, ...]:
+    """
+    Clave guardada en `cursor`, con un valor por cada tipo de `types` (un
+    tipo o tupla de tipos por posición, ej: `((int, type(None)), int)`).
+
+    Raises:
+        ValueError: Si el cursor está mal formado, es de otro listado u
+            orden (`scope`) o su clave no coincide con `types`.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_scope, key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Cursor no válido")
+    if cursor_scope != scope or not isinstance(key, list) or len(key) != len(types):
+        raise ValueError("Cursor no válido para este listado u orden")
+    if not all(_matches(value, expected) for value, expected in zip(key, types)):
+        raise ValueError("Cursor no válido")
+    return tuple(key)
+
+def decode_id_cursor(cursor: str, scope: str) -> int:
+    """ID guardado en un cursor de un listado ordenado solo por ID"""
+    (last_id,) = decode_cursor(cursor, scope, (int,))
+    return last_id
+
+def keyset_after(keys: Sequence[Tuple[ColumnElement, bool]], values: Sequence[Any]) -> ColumnElement:
+    """
+    Condición "fila posterior a `values`" para el orden `keys`, una lista de
+    pares (expresión, descendente). Los valores no pueden ser NULL.
+
+    Si todas las expresiones van en la misma dirección se usa una
+    comparación de filas `(a, b) > (x, y)`, que el índice (a, b) resuelve
+    como un rango; con direcciones mixtas se arma la cadena lexicográfica.
+    """
+    expressions = [expression for expression, _ in keys]
+    directions = {descending for _, descending in keys}
+    if len(directions) == 1:
+        if directions.pop():
+            return tuple_(*expressions) < tuple_(*values)
+        return tuple_(*expressions) > tuple_(*values)
+
+    # literal(): los valores booleanos se comparan como parámetros y no como IS TRUE/FALSE
+    values = [literal(value) for value in values]
+    conditions = []
+    for i, ((expression, descending), value) in enumerate(zip(keys, values)):
+        tie = [keys[j][0] == values[j] for j in range(i)]
+        conditions.append(and_(*tie, expression < value if descending else expression > value))
+    return or_(*conditions)
+
+def page_response(items: list, scope: str, next_key: Optional[Sequence[Any]]) -> dict:
+    """Cuerpo de respuesta de una página (`schemas.Page`)"""
+    next_cursor = encode_cursor(scope, next_key) if next_key is not None else None
+    return {"items": items, "next_cursor": next_cursor}
+
+def page_key(rows: list, limit: Optional[int], key_of) -> Optional[Tuple[Any, ...]]:
+    """
+    Recorta `rows` (pedidas con `limit + 1`) a `limit` filas y retorna la
+    clave de la última, o None si no hay más páginas.
+    """
+    if limit is None or len(rows) <= limit:
+        return None
+    del rows[limit:]
+    return key_of(rows[-1])
@@ -0,0 +1,33 @@
+"""
+Cálculo del rating Elo de los entrenadores.
+
+Solo contiene la fórmula; la tabla trainer_ratings se actualiza desde
+`crud.persist_battle` en la misma transacción que registra la batalla.
+"""
+from typing import Optional, Tuple
+import os
+
+INITIAL_RATING = 1500.0
+ELO_K_FACTOR = float(os.getenv("ELO_K_FACTOR", "32"))
+
+def expected_score(rating: float, opponent_rating: float) -> float:
+    """Probabilidad esperada de victoria de `rating` contra `opponent_rating`"""
+    return 1.0 / (1.0 + 10 ** ((opponent_rating - rating) / 400.0))
+
+def elo_update(
+    trainer_rating: float,
+    opponent_rating: float,
+    trainer_id: int,
+    winner_id: Optional[int],
+    k_factor: float = ELO_K_FACTOR
+) -> Tuple[float, float]:
+    """
+    Nuevos ratings tras un combate (victoria = 1, empate = 0.5, derrota = 0).
+    Retorna: (rating del entrenador, rating del oponente)
+    """
+    if winner_id is None:
+        score = 0.5
+    else:
+        score = 1.0 if winner_id == trainer_id else 0.0
+    delta = k_factor * (score - expected_score(trainer_rating, opponent_rating))
+    return trainer_rating + delta, opponent_rating - delta
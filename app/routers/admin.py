@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from app.schemas import AdminCreate, Admin
-from app.crud import create_admin, get_admin_by_username
+from app.schemas import AdminCreate, Admin, BattleStatsRebuild
+from app.crud import create_admin, get_admin_by_username, rebuild_battle_stats
 from app.routers.auth import get_current_superadmin, get_password_hash
 from app.database import get_db 
 
@@ -63,4 +63,22 @@ async def crear_nuevo_admin(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error interno del servidor: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/estadisticas/reconstruir", response_model=BattleStatsRebuild)
+async def reconstruir_estadisticas(
+    db: AsyncSession = Depends(get_db),
+    current_admin: Admin = Depends(get_current_superadmin)
+):
+    """
+    Reconstruye las estadísticas acumuladas de entrenadores y Pokémon desde el
+    historial de batallas (requiere privilegios de superadmin)
+    """
+    try:
+        return await rebuild_battle_stats(db)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al reconstruir las estadísticas: {str(e)}"
+        )
@@ -1,638 +1,765 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from collections import deque
+from dataclasses import asdict
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
-import random
+from typing import Dict, List, Literal, Optional, Set, Tuple
+import asyncio
+import heapq
+import json
+from app.schemas import Admin
+from app.routers.auth import get_current_admin
+
 from .. import schemas, crud, models
-from ..database import get_db
+from ..database import AsyncSessionLocal, get_db
+from ..battle_engine import (
+    ENGINE_VERSION,
+    MAX_POKEMON_LEVEL,
+    PokemonStats,
+    TrainerInfo,
+    build_snapshot,
+    load_snapshot,
+    simulate_best_of_three,
+    simulate_best_of_three_timed,
+)
+from ..export import export_response
+from ..live import LIVE_BATTLES, LiveBattle, start_live_battle, stream_best_of_three
+from ..odds_cache import ODDS_CACHE, roster_fingerprint
+from ..pagination import decode_id_cursor, page_response
+from ..simulation import simulate_battles_batch
+from ..timing import BATTLE_PHASES, PhaseTimer, new_timer
+from ..tournament import MAX_TOURNAMENT_TRAINERS, run_tournament
+from ..workers import BATTLE_POOL_WORKERS, run_in_battle_pool
 
 router = APIRouter(
     tags=["Batallas"]  # Agrupación para la documentación Swagger/OpenAPI
 )
 
-# --------------------------------------------------
-# SISTEMA DE TIPOS POKÉMON (EFECTIVIDADES)
-# --------------------------------------------------
-
-TYPE_ADVANTAGES = {
-    # Efectividades (2x de daño)
-    "Planta": {"Agua": 2.0, "Roca": 2.0, "Tierra": 2.0},
-    "Fuego": {"Planta": 2.0, "Bicho": 2.0, "Hielo": 2.0, "Acero": 2.0},
-    "Agua": {"Fuego": 2.0, "Roca": 2.0, "Tierra": 2.0},
-    "Eléctrico": {"Agua": 2.0, "Volador": 2.0},
-    "Hielo": {"Planta": 2.0, "Tierra": 2.0, "Volador": 2.0, "Dragón": 2.0},
-    "Lucha": {"Normal": 2.0, "Hielo": 2.0, "Roca": 2.0, "Siniestro": 2.0, "Acero": 2.0},
-    "Veneno": {"Planta": 2.0, "Hada": 2.0},
-    "Tierra": {"Fuego": 2.0, "Eléctrico": 2.0, "Veneno": 2.0, "Roca": 2.0, "Acero": 2.0},
-    "Volador": {"Planta": 2.0, "Lucha": 2.0, "Bicho": 2.0},
-    "Psíquico": {"Lucha": 2.0, "Veneno": 2.0},
-    "Bicho": {"Planta": 2.0, "Psíquico": 2.0, "Siniestro": 2.0},
-    "Roca": {"Fuego": 2.0, "Hielo": 2.0, "Volador": 2.0, "Bicho": 2.0},
-    "Fantasma": {"Psíquico": 2.0, "Fantasma": 2.0},
-    "Dragón": {"Dragón": 2.0},
-    "Siniestro": {"Psíquico": 2.0, "Fantasma": 2.0},
-    "Acero": {"Hielo": 2.0, "Roca": 2.0, "Hada": 2.0},
-    "Hada": {"Lucha": 2.0, "Dragón": 2.0, "Siniestro": 2.0},
-
-    # Debilidades (0.5x de daño)
-    "Planta": {"Fuego": 0.5, "Volador": 0.5, "Bicho": 0.5, "Hielo": 0.5, "Veneno": 0.5},
-    "Fuego": {"Agua": 0.5, "Roca": 0.5, "Tierra": 0.5},
-    "Agua": {"Eléctrico": 0.5, "Planta": 0.5},
-    "Eléctrico": {"Tierra": 0.5},
-    "Hielo": {"Fuego": 0.5, "Lucha": 0.5, "Roca": 0.5, "Acero": 0.5},
-    "Lucha": {"Volador": 0.5, "Psíquico": 0.5, "Hada": 0.5},
-    "Veneno": {"Tierra": 0.5, "Psíquico": 0.5},
-    "Tierra": {"Agua": 0.5, "Planta": 0.5, "Hielo": 0.5},
-    "Volador": {"Eléctrico": 0.5, "Hielo": 0.5, "Roca": 0.5},
-    "Psíquico": {"Bicho": 0.5, "Fantasma": 0.5, "Siniestro": 0.5},
-    "Bicho": {"Fuego": 0.5, "Volador": 0.5, "Roca": 0.5},
-    "Roca": {"Agua": 0.5, "Planta": 0.5, "Lucha": 0.5, "Tierra": 0.5, "Acero": 0.5},
-    "Fantasma": {"Fantasma": 0.5, "Siniestro": 0.5},
-    "Dragón": {"Acero": 0.5},
-    "Siniestro": {"Lucha": 0.5, "Bicho": 0.5, "Hada": 0.5},
-    "Acero": {"Fuego": 0.5, "Lucha": 0.5, "Tierra": 0.5},
-    "Hada": {"Veneno": 0.5, "Acero": 0.5}
-}
-
-def get_type_multiplier(attacker_type: str, defender_type: str) -> float:
-    """Calcula el multiplicador de daño basado en los tipos"""
-    multiplier = 1.0
-    attacker_types = attacker_type.split("/")
-    defender_types = defender_type.split("/")
-
-    for atk_type in attacker_types:
-        for def_type in defender_types:
-            if atk_type in TYPE_ADVANTAGES and def_type in TYPE_ADVANTAGES[atk_type]:
-                multiplier *= TYPE_ADVANTAGES[atk_type][def_type]
-
-    return multiplier
+# Límites de POST /batch: parejas por solicitud y simulaciones en curso a la vez
+MAX_BATCH_BATTLES = 1000
+BATCH_IN_FLIGHT = max(1, BATTLE_POOL_WORKERS) * 2
 
 # --------------------------------------------------
-# MECÁNICAS DE COMBATE MEJORADAS CON NIVELES
+# SIMULACIÓN DE BATALLA COMPLETA (MEJOR DE 3)
 # --------------------------------------------------
 
-def get_random_attack(pokemon: schemas.Pokemon) -> str:
-    """Obtiene un ataque aleatorio de los movimientos del Pokémon con 30% de probabilidad de ataque especial"""
-    if pokemon.moves and len(pokemon.moves) > 0:
-        if random.random() < 0.3 and hasattr(pokemon, 'special_attack'):
-            return f"{random.choice(pokemon.moves)} (Especial)"
-        return random.choice(pokemon.moves)
-    return random.choice(["Placaje", "Arañazo", "Gruñido"])
-
-def calculate_damage(
-    attacker: schemas.Pokemon,
-    defender: schemas.Pokemon,
-    attack_used: str,
-    attacker_level: int = 1,
-    defender_level: int = 1
+# Las reglas de combate y el bucle de turnos viven en app/battle_engine.py, un
+# núcleo sin base de datos que se ejecuta en el pool de procesos. Aquí solo se
+# cargan los datos y se persisten los resultados.
+
+def _battle_record(
+    trainer_id: int,
+    opponent_id: int,
+    opponent_name: str,
+    outcome: dict,
+    keep_winner_pokemon: bool,
+    snapshot: dict
 ) -> tuple:
     """
-    Calcula el daño de un ataque considerando:
-    - Ataque/Defensa base o Ataque Especial/Defensa Especial
-    - Ventaja de tipo
-    - Nivel del Pokémon
-    - Aleatoriedad
-    Retorna: (daño, es_crítico, es_especial)
+    Convierte el resultado de `simulate_best_of_three` en las filas a guardar.
+    Retorna: (datos de la batalla, participantes por ronda)
     """
-    # Determinar si es un ataque especial
-    is_special = "especial" in attack_used.lower()
-
-    # Daño base con variación aleatoria
-    if is_special and hasattr(attacker, 'special_attack'):
-        base_damage = random.randint(5, min(attacker.special_attack, 100) or 20)
-        defense_stat = defender.special_defense if hasattr(defender, 'special_defense') else (defender.defense or 10)
-    else:
-        base_damage = random.randint(5, min(attacker.attack, 100) or 15)
-        defense_stat = defender.defense or 10
-
-    # Bonus por nivel del Pokémon (1-2% por nivel)
-    attacker_level_bonus = 1 + (attacker_level * 0.02)
-    base_damage = int(base_damage * attacker_level_bonus)
+    participants = []
+    for battle_round, result in enumerate(outcome["rounds"], start=1):
+        participants.append({
+            "pokemon_id": result["trainer_pokemon"].id,
+            "hp_remaining": result["trainer_hp_remaining"],
+            "battle_round": battle_round,
+            "trainer_id": trainer_id
+        })
+        participants.append({
+            "pokemon_id": result["opponent_pokemon"].id,
+            "hp_remaining": result["opponent_hp_remaining"],
+            "battle_round": battle_round,
+            "trainer_id": opponent_id
+        })
+
+    battle_data = {
+        "trainer_id": trainer_id,
+        "opponent_id": opponent_id,
+        "opponent_name": opponent_name,
+        "winner": outcome["winner_name"] if outcome["winner_id"] is not None else None,
+        "winner_id": outcome["winner_id"],
+        "date": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "seed": outcome["seed"],
+        "engine_version": outcome["engine_version"],
+        "keep_winner_pokemon": keep_winner_pokemon,
+        "snapshot": snapshot
+    }
+    return battle_data, participants
 
-    # Reducción por defensa y nivel del defensor (1-1.5% por nivel)
-    defense_level_reduction = max(1, defense_stat / (10 * (1 + defender_level * 0.015)))
+def _battle_result(
+    battle_id: int,
+    outcome: dict,
+    keep_winner_pokemon: bool,
+    log: schemas.BattleLogMode
+) -> schemas.BattleResult:
+    """Construye la respuesta detallada a partir del resultado de `simulate_best_of_three`"""
+    # Obtener la última batalla para los datos finales
+    last_battle = outcome["rounds"][-1]
 
-    # Multiplicador por tipo
-    type_multiplier = get_type_multiplier(attacker.element or "Normal", defender.element or "Normal")
+    return schemas.BattleResult(
+        battle_id=battle_id,
+        winner_id=outcome["winner_id"],
+        winner_name=outcome["winner_name"],
+        loser_name=outcome["loser_name"],
+        trainer_pokemon=schemas.Pokemon(**asdict(last_battle["trainer_pokemon"])),
+        opponent_pokemon=schemas.Pokemon(**asdict(last_battle["opponent_pokemon"])),
+        trainer_hp_remaining=last_battle["trainer_hp_remaining"],
+        opponent_hp_remaining=last_battle["opponent_hp_remaining"],
+        battle_log=outcome["battle_log"],
+        battle_events=outcome["events"] if log == "events" else None,
+        last_trainer_attack=last_battle["last_trainer_attack"],
+        last_opponent_attack=last_battle["last_opponent_attack"],
+        trainer_wins=outcome["trainer_wins"],
+        opponent_wins=outcome["opponent_wins"],
+        is_best_of_three=True,
+        keep_winner_pokemon=keep_winner_pokemon
+    )
 
-    # Daño final
-    damage = max(1, int((base_damage * type_multiplier) / defense_level_reduction))
+async def _load_battle_records(db: AsyncSession, trainer_id: int, opponent_id: int) -> tuple:
+    """
+    Carga y valida a los dos entrenadores y sus equipos.
+    Retorna registros serializables: (trainer, opponent, trainer_roster, opponent_roster)
+    """
+    # Validación de entrenadores
+    trainer = await crud.get_trainer(db, trainer_id)
+    opponent = await crud.get_trainer(db, opponent_id)
 
-    # Bonus adicional por ataque especial
-    if is_special:
-        damage = int(damage * 1.3)  # 30% más de daño para ataques especiales
+    if not trainer or not opponent:
+        raise HTTPException(status_code=404, detail="Entrenador no encontrado")
 
-    # Posibilidad de golpe crítico (10% base + 0.1% por nivel del atacante)
-    critical_chance = 0.1 + (attacker_level * 0.001)
-    is_critical = random.random() < critical_chance
-    if is_critical:
-        damage = int(damage * 1.5)
+    # Validación de equipos Pokémon
+    trainer_pokemons = await crud.get_trainer_pokemons(db, trainer_id)
+    opponent_pokemons = await crud.get_trainer_pokemons(db, opponent_id)
 
-    # Probabilidad de resistencia (0.1% por nivel del defensor)
-    resist_chance = defender_level * 0.001
-    if random.random() < resist_chance:
-        damage = max(1, int(damage * 0.7))  # Reduce el daño en 30%
-        return damage, is_critical, is_special, True  # Último parámetro indica resistencia
+    if not trainer_pokemons or not opponent_pokemons:
+        raise HTTPException(
+            status_code=400,
+            detail="Ambos entrenadores necesitan Pokémon para pelear"
+        )
 
-    return damage, is_critical, is_special, False
+    # Registros para simular fuera del event loop
+    return (
+        TrainerInfo.from_trainer(trainer),
+        TrainerInfo.from_trainer(opponent),
+        [PokemonStats.from_pokemon(tp.pokemon) for tp in trainer_pokemons],
+        [PokemonStats.from_pokemon(tp.pokemon) for tp in opponent_pokemons]
+    )
 
-def determine_first_attacker(pokemon1: schemas.Pokemon, pokemon2: schemas.Pokemon) -> tuple:
+async def simulate_battle(
+    db: AsyncSession,
+    trainer_id: int,
+    opponent_id: int,
+    keep_winner_pokemon: bool = True,
+    log: schemas.BattleLogMode = "text",
+    timer: Optional[PhaseTimer] = None,
+    job: Optional[Tuple[int, int]] = None
+) -> schemas.BattleResult:
     """
-    Determina qué Pokémon ataca primero basado en la velocidad y nivel.
-    Retorna: (attacker, defender, is_pokemon1_first)
+    Simula una batalla Pokémon completa entre dos entrenadores (mejor de 3)
+    con opción de mantener el Pokémon ganador en la siguiente batalla.
+    - log: "text" genera el registro en español, "events" devuelve los eventos
+      compactos y "none" omite ambos (sin trabajo de texto).
+    - timer: medidor de fases (load, pool, simulate, render, persist, response);
+      al terminar, las fases se suman a los histogramas de GET /metrics.
+    - job: (ID, número de reclamo) del trabajo de la cola; se marca done en
+      la misma transacción que guarda la batalla (ver `crud.persist_battle`).
     """
-    # Velocidad base + 1% por nivel
-    speed1 = (pokemon1.speed if hasattr(pokemon1, 'speed') and pokemon1.speed else 50) * (1 + (pokemon1.level if hasattr(pokemon1, 'level') else 1) * 0.01)
-    speed2 = (pokemon2.speed if hasattr(pokemon2, 'speed') and pokemon2.speed else 50) * (1 + (pokemon2.level if hasattr(pokemon2, 'level') else 1) * 0.01)
-
-    if speed1 == speed2:
-        # Empate en velocidad, se decide al azar
-        if random.random() < 0.5:
-            return pokemon1, pokemon2, True
-        else:
-            return pokemon2, pokemon1, False
-    elif speed1 > speed2:
-        return pokemon1, pokemon2, True
-    else:
-        return pokemon2, pokemon1, False
-
-def calculate_level_up(pokemon: schemas.Pokemon, battle_duration: int, is_winner: bool) -> int:
+    if timer is None:
+        timer = new_timer()
+
+    with timer.phase("load"):
+        trainer_info, opponent_info, trainer_roster, opponent_roster = await _load_battle_records(
+            db, trainer_id, opponent_id
+        )
+
+    with timer.phase("pool"):
+        outcome = await run_in_battle_pool(
+            simulate_best_of_three_timed,
+            trainer_info,
+            opponent_info,
+            trainer_roster,
+            opponent_roster,
+            keep_winner_pokemon,
+            render_log=(log == "text")
+        )
+    # Tiempos medidos dentro del proceso del pool; "pool" queda como espera y transferencia
+    for phase, seconds in outcome["timings"].items():
+        timer.add("pool", -seconds)
+        timer.add(phase, seconds)
+
+    # Registro en base de datos: batalla, participantes y niveles en una sola
+    # transacción. En lugar del registro completo se guarda la semilla y la foto
+    # de estadísticas: GET /{battle_id}/replay lo regenera.
+    with timer.phase("persist"):
+        battle_data, participants = _battle_record(
+            trainer_id,
+            opponent_id,
+            opponent_info.name,
+            outcome,
+            keep_winner_pokemon,
+            build_snapshot(trainer_info, opponent_info, trainer_roster, opponent_roster)
+        )
+        battle_id = await crud.persist_battle(db, battle_data, participants, outcome["levels_gained"], job)
+
+    with timer.phase("response"):
+        result = _battle_result(battle_id, outcome, keep_winner_pokemon, log)
+    BATTLE_PHASES.observe_timer(timer)
+    return result
+
+# --------------------------------------------------
+# LOTES DE BATALLAS (NDJSON)
+# --------------------------------------------------
+
+def _batch_pair_error(
+    pair: schemas.BattleCreate,
+    rosters: Dict[int, Tuple[TrainerInfo, List[PokemonStats]]]
+) -> Optional[str]:
+    """Mismas validaciones que POST /batallas/ para una pareja del lote"""
+    if pair.trainer_id == pair.opponent_id:
+        return "No puedes pelear contra ti mismo"
+    if pair.trainer_id not in rosters or pair.opponent_id not in rosters:
+        return "Entrenador no encontrado"
+    if not rosters[pair.trainer_id][1] or not rosters[pair.opponent_id][1]:
+        return "Ambos entrenadores necesitan Pokémon para pelear"
+    return None
+
+async def _stream_battles_batch(
+    pairs: List[schemas.BattleCreate],
+    keep_winner_pokemon: bool,
+    log: schemas.BattleLogMode
+):
     """
-    Calcula cuántos niveles sube un Pokémon después de una batalla
-    - battle_duration: Número de turnos que duró la batalla
-    - is_winner: Si el Pokémon ganó la batalla
+    Simula las parejas en el pool de procesos y emite cada resultado como una
+    línea JSON en cuanto termina (el orden de salida es el de finalización).
+
+    - Cada entrenador se carga una sola vez aunque aparezca en muchas parejas.
+    - Nunca hay más de BATCH_IN_FLIGHT simulaciones en curso ni se acumulan
+      resultados: la memoria no depende del tamaño del lote.
+    - Un entrenador no pelea dos batallas a la vez y las suyas se lanzan en
+      el orden del lote, así sus subidas de nivel se encadenan igual que con
+      llamadas sucesivas a POST /batallas/.
     """
-    if pokemon.level >= 100:  # Nivel máximo
-        return 0
+    # La sesión de la dependencia se cierra antes de enviar la respuesta:
+    # el generador abre la suya
+    async with AsyncSessionLocal() as db:
+        trainer_ids = list({t for pair in pairs for t in (pair.trainer_id, pair.opponent_id)})
+        rosters = {
+            trainer.id: (
+                TrainerInfo.from_trainer(trainer),
+                [PokemonStats.from_pokemon(tp.pokemon) for tp in trainer.pokemons]
+            )
+            for trainer in await crud.get_trainers_with_pokemons(db, trainer_ids)
+        }
+
+        # Cola de parejas de cada entrenador en el orden del lote. Una pareja
+        # está lista cuando encabeza las colas de sus dos entrenadores y
+        # ninguno pelea; solo hace falta revisarlo al liberar a un entrenador.
+        queues: Dict[int, deque] = {}
+        for index, pair in enumerate(pairs):
+            error = _batch_pair_error(pair, rosters)
+            if error:
+                yield schemas.BattleBatchLine(
+                    index=index,
+                    trainer_id=pair.trainer_id,
+                    opponent_id=pair.opponent_id,
+                    error=error
+                ).json() + "\n"
+                continue
+            queues.setdefault(pair.trainer_id, deque()).append(index)
+            queues.setdefault(pair.opponent_id, deque()).append(index)
+
+        ready: List[int] = []  # Montículo de índices listos (se lanzan en orden del lote)
+        ready_set: Set[int] = set()
+        busy: Set[int] = set()
+        running: Dict[asyncio.Future, tuple] = {}
+
+        def check_ready(trainer_id: int):
+            """Marca como lista la primera pareja de `trainer_id` si puede pelear"""
+            queue = queues.get(trainer_id)
+            if not queue or queue[0] in ready_set:
+                return
+            pair = pairs[queue[0]]
+            if pair.trainer_id in busy or pair.opponent_id in busy:
+                return
+            if queues[pair.trainer_id][0] == queues[pair.opponent_id][0]:
+                heapq.heappush(ready, queue[0])
+                ready_set.add(queue[0])
+
+        for trainer_id in queues:
+            check_ready(trainer_id)
+
+        try:
+            while ready or running:
+                # Lanzar parejas listas hasta llenar la ventana
+                while ready and len(running) < BATCH_IN_FLIGHT:
+                    index = heapq.heappop(ready)
+                    ready_set.discard(index)
+                    pair = pairs[index]
+                    queues[pair.trainer_id].popleft()
+                    queues[pair.opponent_id].popleft()
+
+                    trainer_info, trainer_roster = rosters[pair.trainer_id]
+                    opponent_info, opponent_roster = rosters[pair.opponent_id]
+                    snapshot = build_snapshot(trainer_info, opponent_info, trainer_roster, opponent_roster)
+                    task = asyncio.ensure_future(run_in_battle_pool(
+                        simulate_best_of_three,
+                        trainer_info,
+                        opponent_info,
+                        trainer_roster,
+                        opponent_roster,
+                        keep_winner_pokemon,
+                        render_log=(log == "text")
+                    ))
+                    running[task] = (index, pair, snapshot)
+                    busy.update((pair.trainer_id, pair.opponent_id))
+
+                if not running:
+                    continue
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, pair, snapshot = running.pop(task)
+                    outcome = task.result()
+
+                    battle_data, participants = _battle_record(
+                        pair.trainer_id,
+                        pair.opponent_id,
+                        rosters[pair.opponent_id][0].name,
+                        outcome,
+                        keep_winner_pokemon,
+                        snapshot
+                    )
+                    battle_id = await crud.persist_battle(db, battle_data, participants, outcome["levels_gained"])
+
+                    # Las siguientes batallas parten de los niveles ya actualizados
+                    for _, roster in rosters.values():
+                        for pokemon in roster:
+                            if pokemon.id in outcome["levels_gained"]:
+                                pokemon.level = min(
+                                    MAX_POKEMON_LEVEL,
+                                    pokemon.level + outcome["levels_gained"][pokemon.id]
+                                )
+                    busy.difference_update((pair.trainer_id, pair.opponent_id))
+                    check_ready(pair.trainer_id)
+                    check_ready(pair.opponent_id)
+
+                    yield schemas.BattleBatchLine(
+                        index=index,
+                        trainer_id=pair.trainer_id,
+                        opponent_id=pair.opponent_id,
+                        result=_battle_result(battle_id, outcome, keep_winner_pokemon, log)
+                    ).json() + "\n"
+        finally:
+            # Cliente desconectado o error: no dejar simulaciones huérfanas
+            for task in running:
+                task.cancel()
 
-    base_exp = 10
-    duration_bonus = min(battle_duration * 0.2, 20)  # Máximo 20 de bonus por duración
-    winner_bonus = 15 if is_winner else 0
+# --------------------------------------------------
+# BATALLAS EN VIVO (SSE / WEBSOCKET)
+# --------------------------------------------------
 
-    total_exp = base_exp + duration_bonus + winner_bonus
-    levels_gained = min(int(total_exp / 20), 2)  # Máximo 2 niveles por batalla
+async def _run_live_battle(
+    live: LiveBattle,
+    trainer_info: TrainerInfo,
+    opponent_info: TrainerInfo,
+    trainer_roster: List[PokemonStats],
+    opponent_roster: List[PokemonStats],
+    keep_winner_pokemon: bool,
+    delay: float
+):
+    """
+    Simula la batalla difundiendo cada evento a los espectadores y al final
+    la registra y publica el resultado (mismo formato que POST /batallas/).
+    """
+    try:
+        outcome = None
+        async for item in stream_best_of_three(
+            trainer_info, opponent_info, trainer_roster, opponent_roster, keep_winner_pokemon
+        ):
+            if isinstance(item, dict):
+                outcome = item
+                continue
+            live.publish({"type": "event", "event": list(item)})
+            if delay:
+                await asyncio.sleep(delay)
+
+        battle_data, participants = _battle_record(
+            live.trainer_id,
+            live.opponent_id,
+            opponent_info.name,
+            outcome,
+            keep_winner_pokemon,
+            build_snapshot(trainer_info, opponent_info, trainer_roster, opponent_roster)
+        )
+        async with AsyncSessionLocal() as db:
+            battle_id = await crud.persist_battle(db, battle_data, participants, outcome["levels_gained"])
 
-    return levels_gained
+        result = _battle_result(battle_id, outcome, keep_winner_pokemon, "none")
+        live.publish({"type": "result", "result": result.dict()})
+    except Exception as e:
+        live.publish({"type": "error", "detail": f"Error al simular la batalla: {e}"})
+    finally:
+        live.close()
 
 # --------------------------------------------------
-# SIMULACIÓN DE BATALLA INDIVIDUAL
+# ENDPOINTS DE LA API
 # --------------------------------------------------
 
-async def simulate_single_battle(
-    db: AsyncSession,
-    trainer: schemas.Trainer,
-    opponent: schemas.Trainer,
-    trainer_pokemon: schemas.Pokemon,
-    opponent_pokemon: schemas.Pokemon,
-    previous_trainer_hp: Optional[int] = None
-) -> dict:
-    """
-    Simula una sola batalla entre dos Pokémon.
-    Retorna un diccionario con el resultado.
+@router.post(
+    "/",
+    response_model=schemas.BattleResult,
+    responses={202: {"model": schemas.BattleJob, "description": "Batalla encolada (queue=true)"}}
+)
+async def create_battle(
+    battle: schemas.BattleCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    keep_winner_pokemon: bool = True,
+    log: schemas.BattleLogMode = "text",
+    queue: bool = False
+):
+    """Inicia una nueva batalla entre dos entrenadores (mejor de 3)
+    - keep_winner_pokemon: Si True, los entrenadores mantendrán su Pokémon ganador entre batallas
+    - log: Formato del registro (none, events o text)
+    - queue: Si True, encola la batalla y responde 202 con el trabajo (ver GET /jobs/{job_id})
+
+    La cabecera `Server-Timing` de la respuesta detalla el tiempo de cada fase.
     """
-    # Inicialización de HP
-    max_trainer_hp = trainer_pokemon.hp or 100
-    max_opponent_hp = opponent_pokemon.hp or 100
-    trainer_hp = previous_trainer_hp if previous_trainer_hp is not None else (trainer_pokemon.current_hp if trainer_pokemon.current_hp is not None else max_trainer_hp)
-    opponent_hp = opponent_pokemon.current_hp if opponent_pokemon.current_hp is not None else max_opponent_hp
-
-    # Obtener niveles de los Pokémon
-    trainer_pokemon_level = trainer_pokemon.level if hasattr(trainer_pokemon, 'level') else 1
-    opponent_pokemon_level = opponent_pokemon.level if hasattr(opponent_pokemon, 'level') else 1
-
-    # Registro de batalla
-    battle_log = []
-    last_trainer_attack = ""
-    last_opponent_attack = ""
-    turn_count = 0
-
-    # Determinar quién ataca primero
-    first_attacker, first_defender, is_trainer_first = determine_first_attacker(
-        trainer_pokemon, opponent_pokemon
-    )
+    if battle.trainer_id == battle.opponent_id:
+        raise HTTPException(
+            status_code=400,
+            detail="No puedes pelear contra ti mismo"
+        )
 
-    battle_log.append(
-        f"⚔️ ¡Comienza la batalla entre {trainer_pokemon.name} (Nv. {trainer_pokemon_level}, HP: {trainer_hp}/{max_trainer_hp}), "
-        f"vs {opponent_pokemon.name} (Nv. {opponent_pokemon_level}, HP: {opponent_hp}/{max_opponent_hp})!"
+    if queue:
+        try:
+            job = await crud.create_battle_job(db, battle, keep_winner_pokemon, log)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        return JSONResponse(
+            status_code=202,
+            content=jsonable_encoder(schemas.BattleJob.model_validate(job, from_attributes=True))
+        )
+
+    timer = new_timer()
+    result = await simulate_battle(
+        db, battle.trainer_id, battle.opponent_id, keep_winner_pokemon, log, timer
     )
+    if timer.phases:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return result
 
-    if is_trainer_first:
-        battle_log.append(f"⚡ ¡{trainer_pokemon.name} es más rápido y ataca primero!")
-    else:
-        battle_log.append(f"⚡ ¡{opponent_pokemon.name} es más rápido y ataca primero!")
-
-    # Sistema de turnos
-    while True:
-        turn_count += 1
-
-        # Verificar si la batalla ha terminado
-        if trainer_hp <= 0 or opponent_hp <= 0:
-            break
-
-        # Turno del primer atacante
-        if is_trainer_first:
-            attacker_name = trainer.name
-            defender_name = opponent.name
-            attacker_pokemon = trainer_pokemon
-            defender_pokemon = opponent_pokemon
-            attacker_level = trainer_pokemon_level
-            # defender_level = opponent_pokemon_level  <- Ya definida
-        else:
-            attacker_name = opponent.name
-            defender_name = trainer.name
-            attacker_pokemon = opponent_pokemon
-            defender_pokemon = trainer_pokemon
-            attacker_level = opponent_pokemon_level
-            # defender_level = trainer_pokemon_level  <- Ya definida
-
-        # Ataque
-        attack_used = get_random_attack(attacker_pokemon)
-        damage, is_critical, is_special, resisted = calculate_damage(
-            attacker_pokemon,
-            defender_pokemon,
-            attack_used,
-            attacker_level,
-            opponent_pokemon_level if is_trainer_first else trainer_pokemon_level # Usamos la variable correcta aquí
+@router.get("/jobs/{job_id}", response_model=schemas.BattleJob)
+async def read_battle_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Consulta el estado de una batalla encolada (pending, running, done o failed)"""
+    db_job = await crud.get_battle_job(db, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return db_job
+
+@router.post("/batch")
+async def create_battles_batch(
+    battles: List[schemas.BattleCreate],
+    keep_winner_pokemon: bool = True,
+    log: schemas.BattleLogMode = "none"
+):
+    """Simula muchas batallas (mejor de 3) y transmite cada resultado al terminar
+    - Cuerpo: lista de parejas {trainer_id, opponent_id}
+    - Respuesta: NDJSON, una línea `BattleBatchLine` por pareja en orden de finalización
+    - log: Formato del registro de cada batalla (none, events o text)
+    """
+    if not battles:
+        raise HTTPException(status_code=400, detail="El lote no contiene batallas")
+    if len(battles) > MAX_BATCH_BATTLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Un lote admite como máximo {MAX_BATCH_BATTLES} batallas"
         )
+    return StreamingResponse(
+        _stream_battles_batch(battles, keep_winner_pokemon, log),
+        media_type="application/x-ndjson"
+    )
 
-        # Registrar el último ataque
-        if is_trainer_first:
-            last_trainer_attack = attack_used
-        else:
-            last_opponent_attack = attack_used
-
-        # Aplicar daño
-        if is_trainer_first:
-            opponent_hp -= damage
-            opponent_hp = max(0, opponent_hp)  # No puede ser negativo
-        else:
-            trainer_hp -= damage
-            trainer_hp = max(0, trainer_hp)
-
-        # Mensajes de log
-        type_multiplier = get_type_multiplier(
-            attacker_pokemon.element or "Normal",
-            defender_pokemon.element or "Normal"
+@router.post("/en-vivo", response_model=schemas.LiveBattleStart, status_code=202)
+async def create_live_battle(
+    battle: schemas.BattleCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    keep_winner_pokemon: bool = True,
+    delay: float = Query(0.0, ge=0, le=2)
+):
+    """Inicia una batalla (mejor de 3) que se transmite turno a turno
+    - delay: Segundos de pausa entre eventos para seguir la batalla en pantalla
+    Los espectadores se conectan a `events_url` (SSE) o `websocket_url`; todos
+    comparten la misma simulación. El último mensaje es el resultado final.
+    """
+    if battle.trainer_id == battle.opponent_id:
+        raise HTTPException(
+            status_code=400,
+            detail="No puedes pelear contra ti mismo"
         )
+    records = await _load_battle_records(db, battle.trainer_id, battle.opponent_id)
 
-        type_message = ""
-        if type_multiplier > 1.5:
-            type_message = " ¡Es muy efectivo!"
-        elif type_multiplier < 0.5:
-            type_message = " ¡No es muy efectivo..."
-
-        critical_message = " 💥¡Golpe crítico!" if is_critical else ""
-        special_message = " ✨(Ataque especial)" if is_special else ""
-        resist_message = " 🛡️¡Resistió el daño!" if resisted else ""
-
-        # Determinar HP restante para mostrar
-        if is_trainer_first:
-            remaining_hp = opponent_hp
-            max_hp = max_opponent_hp
-            defender_pokemon_name = opponent_pokemon.name
-        else:
-            remaining_hp = trainer_hp
-            max_hp = max_trainer_hp
-            defender_pokemon_name = trainer_pokemon.name
-
-        hp_percentage = (remaining_hp / max_hp) * 100
-        hp_status = ""
-        if hp_percentage > 60:
-            hp_status = "🟢"
-        elif hp_percentage > 30:
-            hp_status = "🟡"
-        else:
-            hp_status = "🔴"
-
-        battle_log.append(
-            f"🔹 Turno {turn_count}: {attacker_pokemon.name} usa {attack_used}{special_message} "
-            f"contra {defender_pokemon_name} -{damage} HP{type_message}{critical_message}{resist_message} "
-            f"{hp_status} HP: {remaining_hp}/{max_hp}"
-        )
+    live = start_live_battle(battle.trainer_id, battle.opponent_id)
+    live.task = asyncio.create_task(_run_live_battle(live, *records, keep_winner_pokemon, delay))
 
-        # Verificar si el defensor se debilitó
-        if (is_trainer_first and opponent_hp <= 0) or (not is_trainer_first and trainer_hp <= 0):
-            # 10% + 0.1% por nivel de probabilidad de un último ataque antes de debilitarse
-            last_attack_chance = 0.1 + (opponent_pokemon_level if is_trainer_first else trainer_pokemon_level) * 0.001 # Usamos la variable correcta aquí
-            if random.random() < last_attack_chance:
-                last_attack = get_random_attack(defender_pokemon)
-                last_damage, last_critical, last_special, _ = calculate_damage(
-                    defender_pokemon,
-                    attacker_pokemon,
-                    last_attack,
-                    opponent_pokemon_level if is_trainer_first else trainer_pokemon_level, # Usamos la variable correcta aquí
-                    trainer_pokemon_level if is_trainer_first else opponent_pokemon_level  # Usamos la variable correcta aquí
-                )
-
-                if is_trainer_first:
-                    trainer_hp -= last_damage
-                    trainer_hp = max(0, trainer_hp)
-                else:
-                    opponent_hp -= last_damage
-                    opponent_hp = max(0, opponent_hp)
-
-                last_critical_msg = " 💥¡Golpe crítico!" if last_critical else ""
-                last_special_msg = " ✨(Ataque especial)" if last_special else ""
-
-                battle_log.append(
-                    f"🔥 ¡{defender_pokemon.name} contraataca con {last_attack}{last_special_msg} antes de debilitarse! "
-                    f"-{last_damage} HP{last_critical_msg}"
-                )
-
-            battle_log.append(f"💀 ¡{defender_pokemon.name} se debilitó!")
-            break
-
-        # Cambiar turnos para el siguiente ataque
-        is_trainer_first = not is_trainer_first
-
-    # Determinar el ganador de esta batalla
-    if trainer_hp > 0 and opponent_hp <= 0:
-        winner = "trainer"
-        winner_name = trainer.name
-        winner_pokemon = trainer_pokemon
-        loser_name = opponent.name
-        loser_pokemon = opponent_pokemon
-    elif opponent_hp > 0 and trainer_hp <= 0:
-        winner = "opponent"
-        winner_name = opponent.name
-        winner_pokemon = opponent_pokemon
-        loser_name = trainer.name
-        loser_pokemon = trainer_pokemon
-    else:
-        winner = "draw"
-        winner_name = "Empate"
-        loser_name = "Empate"
-        winner_pokemon = None
-        loser_pokemon = None
-
-    # Calcular subida de nivel para los Pokémon
-    trainer_levels_gained = calculate_level_up(trainer_pokemon, turn_count, winner == "trainer")
-    opponent_levels_gained = calculate_level_up(opponent_pokemon, turn_count, winner == "opponent")
-
-    if trainer_levels_gained > 0:
-        battle_log.append(f"🎉 ¡{trainer_pokemon.name} subió {trainer_levels_gained} nivel(es)! Ahora es nivel {trainer_pokemon_level + trainer_levels_gained}")
-    if opponent_levels_gained > 0:
-        battle_log.append(f"🎉 ¡{opponent_pokemon.name} subió {opponent_levels_gained} nivel(es)! Ahora es nivel {opponent_pokemon_level + opponent_levels_gained}")
-
-    return {
-        "winner": winner,
-        "winner_name": winner_name,
-        "loser_name": loser_name,
-        "winner_pokemon": winner_pokemon,
-        "loser_pokemon": loser_pokemon,
-        "trainer_hp_remaining": max(0, trainer_hp),
-        "opponent_hp_remaining": max(0, opponent_hp),
-        "battle_log": battle_log,
-        "trainer_pokemon": trainer_pokemon,
-        "opponent_pokemon": opponent_pokemon,
-        "last_trainer_attack": last_trainer_attack,
-        "last_opponent_attack": last_opponent_attack,
-        "turn_count": turn_count,
-        "trainer_levels_gained": trainer_levels_gained,
-        "opponent_levels_gained": opponent_levels_gained
-    }
-# --------------------------------------------------
-# SIMULACIÓN DE BATALLA COMPLETA (MEJOR DE 3)
-# --------------------------------------------------
+    return schemas.LiveBattleStart(
+        live_id=live.live_id,
+        trainer_id=battle.trainer_id,
+        opponent_id=battle.opponent_id,
+        events_url=str(request.url_for("stream_live_battle", live_id=live.live_id)),
+        websocket_url=str(request.url_for("watch_live_battle", live_id=live.live_id))
+    )
 
-async def simulate_battle(
-    db: AsyncSession,
-    trainer_id: int,
-    opponent_id: int,
-    keep_winner_pokemon: bool = True
-) -> schemas.BattleResult:
+@router.get("/en-vivo/{live_id}/eventos")
+async def stream_live_battle(live_id: str):
+    """Transmite los eventos de una batalla en vivo como Server-Sent Events
+    Tipos de evento: `event` (suceso compacto), `result` y `error`.
     """
-    Simula una batalla Pokémon completa entre dos entrenadores (mejor de 3)
-    con opción de mantener el Pokémon ganador en la siguiente batalla.
+    live = LIVE_BATTLES.get(live_id)
+    if live is None:
+        raise HTTPException(status_code=404, detail="Batalla en vivo no encontrada")
+
+    async def event_stream():
+        async for message in live.subscribe():
+            yield f"event: {message['type']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@router.websocket("/en-vivo/{live_id}/ws")
+async def watch_live_battle(websocket: WebSocket, live_id: str):
+    """Transmite los eventos de una batalla en vivo por WebSocket (un JSON por mensaje)"""
+    live = LIVE_BATTLES.get(live_id)
+    if live is None:
+        await websocket.close(code=4404, reason="Batalla en vivo no encontrada")
+        return
+
+    await websocket.accept()
+    try:
+        async for message in live.subscribe():
+            await websocket.send_json(message)
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+@router.post("/probabilidades", response_model=schemas.BattleOdds)
+async def estimate_battle_odds(
+    battle: schemas.BattleCreate,
+    db: AsyncSession = Depends(get_db),
+    n_battles: int = Query(10000, ge=1, le=100000),
+    keep_winner_pokemon: bool = True,
+    seed: Optional[int] = None
+):
+    """Estima las probabilidades de victoria entre dos entrenadores simulando miles de combates
+    - n_battles: Número de combates (mejor de 3) a simular
+    - seed: Semilla opcional para obtener resultados reproducibles
+    No modifica niveles ni registra batallas en la base de datos. El resultado
+    se guarda en caché hasta que cambie alguno de los dos equipos.
     """
-    # Validación de entrenadores
-    trainer = await crud.get_trainer(db, trainer_id)
-    opponent = await crud.get_trainer(db, opponent_id)
+    if battle.trainer_id == battle.opponent_id:
+        raise HTTPException(
+            status_code=400,
+            detail="No puedes pelear contra ti mismo"
+        )
 
+    trainer = await crud.get_trainer(db, battle.trainer_id)
+    opponent = await crud.get_trainer(db, battle.opponent_id)
     if not trainer or not opponent:
         raise HTTPException(status_code=404, detail="Entrenador no encontrado")
 
-    # Validación de equipos Pokémon
-    trainer_pokemons = await crud.get_trainer_pokemons(db, trainer_id)
-    opponent_pokemons = await crud.get_trainer_pokemons(db, opponent_id)
-
+    trainer_pokemons = await crud.get_trainer_pokemons(db, battle.trainer_id)
+    opponent_pokemons = await crud.get_trainer_pokemons(db, battle.opponent_id)
     if not trainer_pokemons or not opponent_pokemons:
         raise HTTPException(
             status_code=400,
             detail="Ambos entrenadores necesitan Pokémon para pelear"
         )
 
-    # Registro de batalla general
-    master_battle_log = []
-    battle_results = []
-    trainer_wins = 0
-    opponent_wins = 0
-
-    # Variables para mantener Pokémon ganadores entre batallas
-    current_trainer_pokemon = None
-    current_opponent_pokemon = None
-
-    # Comentarista de la batalla
-    commentator = "¡Esto fue épico! 🌟"
-
-    # Mejor de 3 batallas
-    for battle_num in range(1, 4):
-        master_battle_log.append(f"🔥BATALLA {battle_num} 🔥")
-
-        # Selección de Pokémon para esta batalla
-        if keep_winner_pokemon:
-            # Para el entrenador
-            if current_trainer_pokemon and current_trainer_pokemon.get("hp_remaining", 0) > 0:
-                trainer_pokemon = current_trainer_pokemon["pokemon"]
-                master_battle_log.append(f"⚡ {trainer.name} mantiene a {trainer_pokemon.name} en el campo! (HP: {current_trainer_pokemon['hp_remaining']}/{trainer_pokemon.hp})")
-            else:
-                trainer_pokemon_choice = random.choice(trainer_pokemons).pokemon
-                trainer_pokemon = trainer_pokemon_choice
-                master_battle_log.append(f"⚡ {trainer.name} elige a {trainer_pokemon.name} (Nv. {trainer_pokemon.level}) para la Batalla {battle_num}!")
-                current_trainer_pokemon = None
-
-            # Para el oponente
-            if current_opponent_pokemon and current_opponent_pokemon.get("hp_remaining", 0) > 0:
-                opponent_pokemon = current_opponent_pokemon["pokemon"]
-                master_battle_log.append(f"⚡ {opponent.name} mantiene a {opponent_pokemon.name} en combate! (HP: {current_opponent_pokemon['hp_remaining']}/{opponent_pokemon.hp})")
-            else:
-                opponent_pokemon_choice = random.choice(opponent_pokemons).pokemon
-                opponent_pokemon = opponent_pokemon_choice
-                master_battle_log.append(f"⚡ {opponent.name} saca a {opponent_pokemon.name} (Nv. {opponent_pokemon.level}) al ruedo!")
-                current_opponent_pokemon = None
-        else:
-            trainer_pokemon = random.choice(trainer_pokemons).pokemon
-            opponent_pokemon = random.choice(opponent_pokemons).pokemon
-            master_battle_log.append(f"⚡ {trainer.name} elige a {trainer_pokemon.name} (Nv. {trainer_pokemon.level})")
-            master_battle_log.append(f"⚡ {opponent.name} elige a {opponent_pokemon.name} (Nv. {opponent_pokemon.level})")
-
-        # Simular la batalla individual
-        previous_trainer_hp = current_trainer_pokemon["hp_remaining"] if current_trainer_pokemon else None
-        result = await simulate_single_battle(
-            db, trainer, opponent, trainer_pokemon, opponent_pokemon, previous_trainer_hp
-        )
-
-        # Actualizar niveles de los Pokémon
-        if result["trainer_levels_gained"] > 0:
-            updated_pokemon = schemas.PokemonUpdate(
-                level=trainer_pokemon.level + result["trainer_levels_gained"]
-            )
-            await crud.update_pokemon(db, trainer_pokemon.id, updated_pokemon)
-            trainer_pokemon.level += result["trainer_levels_gained"]
+    trainer_roster = [PokemonStats.from_pokemon(tp.pokemon) for tp in trainer_pokemons]
+    opponent_roster = [PokemonStats.from_pokemon(tp.pokemon) for tp in opponent_pokemons]
 
-        if result["opponent_levels_gained"] > 0:
-            updated_pokemon = schemas.PokemonUpdate(
-                level=opponent_pokemon.level + result["opponent_levels_gained"]
-            )
-            await crud.update_pokemon(db, opponent_pokemon.id, updated_pokemon)
-            opponent_pokemon.level += result["opponent_levels_gained"]
-
-        # Actualizar conteo de victorias
-        if result["winner"] == "trainer":
-            trainer_wins += 1
-            if keep_winner_pokemon:
-                current_trainer_pokemon = {
-                    "pokemon": result["winner_pokemon"],
-                    "hp_remaining": result["trainer_hp_remaining"]
-                }
-                current_opponent_pokemon = None
-        elif result["winner"] == "opponent":
-            opponent_wins += 1
-            if keep_winner_pokemon:
-                current_opponent_pokemon = {
-                    "pokemon": result["winner_pokemon"],
-                    "hp_remaining": result["opponent_hp_remaining"]
-                }
-                current_trainer_pokemon = None
-        else:
-            current_trainer_pokemon = None
-            current_opponent_pokemon = None
-
-        # Agregar logs al registro maestro
-        master_battle_log.extend(result["battle_log"])
-        master_battle_log.append(f"🏆 Resultado de la Batalla {battle_num}: ¡{result['winner_name']} se lleva la victoria!")
-        master_battle_log.append(f"📊 Marcador: {trainer.name} {trainer_wins} - {opponent_wins} {opponent.name}")
-
-        # Guardar resultados
-        battle_results.append(result)
-
-        # Verificar si ya hay un ganador definitivo
-        if trainer_wins >= 2 or opponent_wins >= 2:
-            break
-
-    # Determinar el ganador general
-    if trainer_wins > opponent_wins:
-        overall_winner = trainer.name
-        overall_winner_id = trainer.id
-        overall_loser = opponent.name
-        is_trainer_winner = True
-        commentator += f" ¡Y con una actuación estelar, {overall_winner} se corona como el campeón de este encuentro! 🎉"
-    elif opponent_wins > trainer_wins:
-        overall_winner = opponent.name
-        overall_winner_id = opponent.id
-        overall_loser = trainer.name
-        is_trainer_winner = False
-        commentator += f" ¡Increíble! ¡{overall_winner} demuestra su poder y se lleva la victoria general! 🏆"
-    else:
-        overall_winner = "Empate"
-        overall_winner_id = None
-        overall_loser = "Empate"
-        is_trainer_winner = None
-        commentator += " ¡Un final reñido! ¡La batalla termina en un empate! 🤝"
-
-    master_battle_log.append("🎯 RESULTADO FINAL 🎯")
-    master_battle_log.append(
-        f"{trainer.name}: {trainer_wins} victoria(s) | "
-        f"{opponent.name}: {opponent_wins} victoria(s)"
-    )
-    master_battle_log.append(f"🏅 ¡{overall_winner} gana el combate!")
-    master_battle_log.append(f"💬 Comentario del experto: {commentator}")
-
-    # Registro en base de datos
-    battle_data = schemas.BattleCreate(
-        trainer_id=trainer_id,
-        opponent_id=opponent_id,
-        is_best_of_three=True
+    # Mismos equipos y parámetros: se reutiliza la estimación anterior
+    cache_key = (
+        roster_fingerprint(trainer_roster),
+        roster_fingerprint(opponent_roster),
+        n_battles,
+        keep_winner_pokemon,
+        seed
     )
-
-    db_battle = await crud.create_battle(db, battle_data)
-
-    # Actualización con resultado
-    if overall_winner != "Empate":
-        await crud.update_battle(
-            db,
-            db_battle.id,
-            schemas.BattleUpdate(
-                winner=overall_winner,
-                date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                battle_log="\n".join(master_battle_log)
-            )
+    odds = ODDS_CACHE.get(cache_key)
+    if odds is None:
+        # La simulación es CPU intensiva: se ejecuta en el pool de procesos
+        odds = await run_in_battle_pool(
+            simulate_battles_batch,
+            trainer_roster,
+            opponent_roster,
+            n_battles,
+            keep_winner_pokemon,
+            seed
+        )
+        ODDS_CACHE.put(
+            cache_key,
+            odds,
+            (battle.trainer_id, battle.opponent_id),
+            [p.id for p in trainer_roster + opponent_roster]
         )
+    return schemas.BattleOdds(
+        trainer_id=battle.trainer_id,
+        opponent_id=battle.opponent_id,
+        keep_winner_pokemon=keep_winner_pokemon,
+        **odds
+    )
 
-    # Registro de Pokémon participantes (todos los que participaron)
-    for result in battle_results:
-        await crud.add_pokemon_to_battle(
-            db,
-            schemas.BattlePokemonCreate(
-                battle_id=db_battle.id,
-                pokemon_id=result["trainer_pokemon"].id,
-                hp_remaining=result["trainer_hp_remaining"],
-                participated=True,
-                battle_round=battle_results.index(result) + 1
-            )
+@router.post("/torneos", response_model=schemas.TournamentResult)
+async def create_tournament(
+    tournament: schemas.TournamentCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Juega un torneo entre varios entrenadores y devuelve la clasificación
+    - format: round_robin (todos contra todos), single_elimination o swiss
+    - trainer_ids: Participantes en orden de siembra
+    - rounds: Jornadas del sistema suizo (opcional, entre 1 y n - 1)
+    Cada enfrentamiento es un combate mejor de 3 y se registra como batalla.
+    """
+    trainer_ids = tournament.trainer_ids
+    if len(trainer_ids) < 2:
+        raise HTTPException(status_code=400, detail="Un torneo necesita al menos 2 entrenadores")
+    if len(set(trainer_ids)) != len(trainer_ids):
+        raise HTTPException(status_code=400, detail="Un entrenador no puede inscribirse dos veces")
+    if len(trainer_ids) > MAX_TOURNAMENT_TRAINERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Un torneo admite como máximo {MAX_TOURNAMENT_TRAINERS} entrenadores"
         )
-        await crud.add_pokemon_to_battle(
-            db,
-            schemas.BattlePokemonCreate(
-                battle_id=db_battle.id,
-                pokemon_id=result["opponent_pokemon"].id,
-                hp_remaining=result["opponent_hp_remaining"],
-                participated=True,
-                battle_round=battle_results.index(result) + 1
+    if tournament.rounds is not None:
+        if tournament.format != "swiss":
+            raise HTTPException(status_code=400, detail="El número de jornadas solo aplica al sistema suizo")
+        if tournament.rounds > len(trainer_ids) - 1:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Con {len(trainer_ids)} entrenadores hay como máximo {len(trainer_ids) - 1} jornadas"
             )
+
+    # Todos los equipos en una sola consulta
+    trainers = {t.id: t for t in await crud.get_trainers_with_pokemons(db, trainer_ids)}
+    missing = [trainer_id for trainer_id in trainer_ids if trainer_id not in trainers]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Entrenador no encontrado: {missing[0]}")
+
+    without_pokemon = [trainers[trainer_id].name for trainer_id in trainer_ids if not trainers[trainer_id].pokemons]
+    if without_pokemon:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Todos los entrenadores necesitan Pokémon para pelear: {', '.join(without_pokemon)}"
         )
 
-    # Obtener la última batalla para los datos finales
-    last_battle = battle_results[-1]
+    result = await run_tournament(
+        [TrainerInfo.from_trainer(trainers[trainer_id]) for trainer_id in trainer_ids],
+        {
+            trainer_id: [PokemonStats.from_pokemon(tp.pokemon) for tp in trainers[trainer_id].pokemons]
+            for trainer_id in trainer_ids
+        },
+        tournament.format,
+        tournament.keep_winner_pokemon,
+        tournament.rounds
+    )
 
-    # Resultado detallado
-    return schemas.BattleResult(
-        battle_id=db_battle.id,
-        winner_id=overall_winner_id,
-        winner_name=overall_winner,
-        loser_name=overall_loser,
-        trainer_pokemon=last_battle["trainer_pokemon"],
-        opponent_pokemon=last_battle["opponent_pokemon"],
-        trainer_hp_remaining=last_battle["trainer_hp_remaining"],
-        opponent_hp_remaining=last_battle["opponent_hp_remaining"],
-        battle_log=master_battle_log,
-        last_trainer_attack=last_battle["last_trainer_attack"],
-        last_opponent_attack=last_battle["last_opponent_attack"],
-        trainer_wins=trainer_wins,
-        opponent_wins=opponent_wins,
-        is_best_of_three=True,
-        keep_winner_pokemon=keep_winner_pokemon
+    # Todas las batallas y subidas de nivel del torneo en una sola transacción
+    battle_ids = await crud.persist_battles(
+        db,
+        [
+            _battle_record(
+                match["trainer_id"],
+                match["opponent_id"],
+                trainers[match["opponent_id"]].name,
+                match["outcome"],
+                tournament.keep_winner_pokemon,
+                match["snapshot"]
+            )
+            for match in result["matches"]
+        ],
+        result["levels_gained"]
     )
 
-# --------------------------------------------------
-# ENDPOINTS DE LA API
-# --------------------------------------------------
+    return schemas.TournamentResult(
+        format=result["format"],
+        rounds=result["rounds"],
+        champion_id=result["champion_id"],
+        champion_name=result["champion_name"],
+        matches=[
+            schemas.TournamentMatch(
+                battle_id=battle_id,
+                round=match["round"],
+                trainer_id=match["trainer_id"],
+                opponent_id=match["opponent_id"],
+                winner_id=match["winner_id"],
+                trainer_wins=match["trainer_wins"],
+                opponent_wins=match["opponent_wins"]
+            )
+            for battle_id, match in zip(battle_ids, result["matches"])
+        ],
+        standings=result["standings"],
+        keep_winner_pokemon=tournament.keep_winner_pokemon
+    )
 
-@router.post("/", response_model=schemas.BattleResult)
-async def create_battle(
-    battle: schemas.BattleCreate,
-    db: AsyncSession = Depends(get_db),
-    keep_winner_pokemon: bool = True
+@router.get("/export")
+async def export_battles(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    current_admin: Admin = Depends(get_current_admin)
 ):
-    """Inicia una nueva batalla entre dos entrenadores (mejor de 3)
-    - keep_winner_pokemon: Si True, los entrenadores mantendrán su Pokémon ganador entre batallas
+    """Exporta el historial completo de batallas, ordenado por ID, transmitiendo por lotes
+    - format: "ndjson" (una batalla JSON por línea) o "csv"
     """
-    if battle.trainer_id == battle.opponent_id:
+    return export_response(models.Battle, crud.BATTLE_EXPORT_COLUMNS, export_format, "batallas")
+
+@router.get("/{battle_id}/replay", response_model=schemas.BattleReplay)
+async def replay_battle(
+    battle_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Regenera el registro completo de una batalla a partir de su semilla y la foto de estadísticas"""
+    db_battle = await crud.get_battle(db, battle_id)
+    if db_battle is None:
+        raise HTTPException(status_code=404, detail="Batalla no encontrada")
+
+    if db_battle.seed is None or not db_battle.snapshot:
         raise HTTPException(
-            status_code=400,
-            detail="No puedes pelear contra ti mismo"
+            status_code=409,
+            detail="Esta batalla no guardó semilla y no se puede repetir"
         )
-    return await simulate_battle(db, battle.trainer_id, battle.opponent_id, keep_winner_pokemon)
+    if db_battle.engine_version != ENGINE_VERSION:
+        raise HTTPException(
+            status_code=409,
+            detail=f"La batalla se simuló con el motor v{db_battle.engine_version} y el actual es v{ENGINE_VERSION}"
+        )
+
+    outcome = await run_in_battle_pool(
+        simulate_best_of_three,
+        *load_snapshot(db_battle.snapshot),
+        db_battle.keep_winner_pokemon if db_battle.keep_winner_pokemon is not None else True,
+        db_battle.seed,
+        render_log=True
+    )
+    return schemas.BattleReplay(
+        battle_id=db_battle.id,
+        seed=outcome["seed"],
+        engine_version=outcome["engine_version"],
+        winner_name=outcome["winner_name"],
+        trainer_wins=outcome["trainer_wins"],
+        opponent_wins=outcome["opponent_wins"],
+        battle_log=outcome["battle_log"]
+    )
 
 @router.get("/{battle_id}", response_model=schemas.BattleWithPokemon)
 async def read_battle(
@@ -655,14 +782,18 @@ async def read_battle(
 
     return db_battle
 
-@router.get("/", response_model=List[schemas.Battle])
+@router.get("/", response_model=schemas.Page[schemas.Battle])
 async def read_battles(
-    skip: int = 0,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Obtiene un listado paginado de todas las batallas registradas"""
-    battles = await crud.get_battles(db, skip=skip, limit=limit)
+    """Obtiene una página de las batallas registradas, ordenadas por ID (cursor = `next_cursor` anterior)"""
+    try:
+        after = decode_id_cursor(cursor, "battles") if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    battles, next_id = await crud.get_battles(db, limit=limit, after=after)
 
     # Asegurar nombres de entrenadores
     for battle in battles:
@@ -673,4 +804,4 @@ async def read_battles(
             opponent = await crud.get_trainer(db, battle.opponent_id)
             battle.opponent_name = opponent.name if opponent else "Desconocido"
 
-    return battles
\ No newline at end of file
+    return page_response(battles, "battles", None if next_id is None else [next_id])
\ No newline at end of file
@@ -1,37 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, or_
-from typing import List, Optional
-from difflib import get_close_matches
+from typing import Dict, List, Literal, Optional, Tuple
+import os
+
+import Levenshtein
 
 from app.schemas import Admin
 from app.routers.auth import get_current_superadmin, get_current_admin
 
-import unicodedata
-import re
-
 from .. import models, schemas, crud
 from ..database import get_db
+from ..export import export_response
+from ..pagination import decode_cursor, page_response
+from ..search_cache import SEARCH_CACHE
+from ..search_index import (
+    FUZZY_MAX_DISTANCE, POKEMON_NAME_INDEX, POKEMON_NAME_PREFIXES, POKEMON_NAME_TREE, normalize_text
+)
 
 router = APIRouter(
     tags=["Pokémon"]    # Agrupación para la documentación Swagger/OpenAPI
 )
 
+# Segundos que clientes y proxies pueden reutilizar una respuesta de /autocomplete
+AUTOCOMPLETE_MAX_AGE = int(os.getenv("AUTOCOMPLETE_MAX_AGE", "60"))
+
 # --------------------------------------------------
 # FUNCIONES AUXILIARES PARA BÚSQUEDA INTELIGENTE
 # --------------------------------------------------
 
-def normalize_text(text: str) -> str:
-    """
-    Normaliza texto para búsquedas:
-    - Convierte a minúsculas
-    - Elimina acentos y caracteres especiales
-    - Elimina espacios extras
-    """
-    text = text.lower().strip()
-    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
-    return re.sub(r'\s+', ' ', text)
-
 def find_similar_names(search_term: str, names: List[str], threshold: float = 0.6) -> List[str]:
     """
     Encuentra nombres similares usando coincidencia aproximada.
@@ -45,22 +42,60 @@ def find_similar_names(search_term: str, names: List[str], threshold: float = 0.
         Lista de nombres que superan el umbral de similitud
     """
     normalized_search = normalize_text(search_term)
-    normalized_names = [normalize_text(name) for name in names]
-    
-    matches = get_close_matches(
-        normalized_search,
-        normalized_names,
-        n=5,
-        cutoff=threshold
+    # Nombre normalizado -> primer nombre original (sin búsquedas lineales)
+    originals = {}
+    for name in names:
+        originals.setdefault(normalize_text(name), name)
+
+    scored = sorted(
+        (-Levenshtein.ratio(normalized_search, normalized), normalized)
+        for normalized in originals
     )
+    return [originals[normalized] for score, normalized in scored[:5] if -score >= threshold]
+
+def _to_schemas(pokemons: List[models.Pokemon]) -> List[schemas.Pokemon]:
+    """Copia independiente de la sesión, apta para guardar en la caché de búsquedas"""
+    return [schemas.Pokemon.model_validate(p, from_attributes=True) for p in pokemons]
+
+async def _flexible_search(
+    db: AsyncSession,
+    search_term: str,
+    max_distance: int,
+    limit: int,
+    after: Optional[tuple] = None
+) -> Tuple[List[models.Pokemon], Optional[tuple]]:
+    """
+    Las 3 capas de /flexible-search/ (lista vacía si ninguna encuentra nada)
+    y la clave de la página siguiente. Solo la capa 3 tiene más de una página,
+    así que con `after` se continúa directamente en ella.
+    """
+    if after is not None:
+        return await crud.search_pokemons_by_name(db, name=search_term, limit=limit, after=after)
+
+    # Capa 1: Búsqueda exacta
+    exact_match = await crud.get_pokemon_by_name(db, search_term)
+    if exact_match:
+        return [exact_match], None
     
-    # Recuperar los nombres originales
-    original_matches = []
-    for match in matches:
-        index = normalized_names.index(match)
-        original_matches.append(names[index])
+    # Capa 2: Coincidencia aproximada (sin leer la tabla completa)
+    if POKEMON_NAME_INDEX.ready:
+        similar_ids = (
+            POKEMON_NAME_TREE.search(search_term, max_distance)
+            or POKEMON_NAME_INDEX.search(search_term)
+        )
+        pokemons = await crud.get_pokemons_by_ids(db, similar_ids)
+        if pokemons:
+            return pokemons, None
+    else:
+        all_pokemons, _ = await crud.get_pokemons(db,)
+        similar_names = find_similar_names(search_term, [p.name for p in all_pokemons])
+        if similar_names:
+            pokemons = await crud.get_pokemons_by_names(db, similar_names)
+            if pokemons:
+                return pokemons, None
     
-    return original_matches
+    # Capa 3: Búsqueda por subcadena
+    return await crud.search_pokemons_by_name(db, name=search_term, limit=limit)
 
 # --------------------------------------------------
 # ENDPOINTS
@@ -84,30 +119,77 @@ async def create_pokemon(
     """
     return await crud.create_pokemon(db, pokemon)
 
-@router.get("/", response_model=List[schemas.Pokemon])
+def pokemon_stat_ranges(
+    min_level: Optional[int] = None, max_level: Optional[int] = None,
+    min_hp: Optional[int] = None, max_hp: Optional[int] = None,
+    min_attack: Optional[int] = None, max_attack: Optional[int] = None,
+    min_defense: Optional[int] = None, max_defense: Optional[int] = None,
+    min_special_attack: Optional[int] = None, max_special_attack: Optional[int] = None,
+    min_special_defense: Optional[int] = None, max_special_defense: Optional[int] = None,
+    min_speed: Optional[int] = None, max_speed: Optional[int] = None,
+) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+    """Rangos inclusivos por estadística (min_X / max_X) para `crud.get_pokemons`"""
+    bounds = locals()
+    return {
+        stat: (bounds[f"min_{stat}"], bounds[f"max_{stat}"])
+        for stat in crud.POKEMON_STAT_COLUMNS
+        if bounds[f"min_{stat}"] is not None or bounds[f"max_{stat}"] is not None
+    }
+
+@router.get("/", response_model=schemas.Page[schemas.Pokemon])
 async def read_pokemons(
     name: Optional[str] = None,
+    element: Optional[List[str]] = Query(None),
+    ranges: Dict[str, Tuple[Optional[int], Optional[int]]] = Depends(pokemon_stat_ranges),
+    sort: Optional[str] = None,
+    desc: bool = False,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
-    Obtiene un listado paginado de Pokémon.
+    Obtiene una página de Pokémon filtrados y ordenados en la base de datos.
+    
+    Ejemplo: tipo Fuego con velocidad mayor a 90, de mayor a menor ataque:
+    `?element=Fuego&min_speed=91&sort=attack&desc=true&limit=50`
     
     Args:
-        skip: Número de registros a omitir (paginación)
-        limit: Máximo número de registros a devolver
-        name: Filtro opcional por nombre (búsqueda exacta)
+        name: Filtro opcional por nombre (búsqueda parcial)
+        element: Tipo(s) que debe tener (se repite para exigir varios)
+        ranges: min_X / max_X para level, hp, attack, defense,
+            special_attack, special_defense y speed
+        sort: Campo de orden (id, name o una estadística)
+        desc: Orden descendente
+        limit: Máximo número de registros por página
+        cursor: `next_cursor` de la página anterior (mismos filtros y orden)
         db: Sesión de base de datos
         
     Returns:
-        Lista de Pokémon paginados
+        Página de Pokémon con el cursor de la siguiente
     """
-    pokemons = await crud.get_pokemons(db,name=name)
-    return pokemons
+    sort = sort or "id"
+    if sort not in crud.POKEMON_SORT_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Orden no válido; usa uno de: {', '.join(crud.POKEMON_SORT_COLUMNS)}"
+        )
+    scope = f"pokemons:{sort}:{'desc' if desc else 'asc'}"
+    try:
+        after = decode_cursor(cursor, scope, crud.pokemon_cursor_types(sort)) if cursor else None
+        pokemons, next_key = await crud.get_pokemons(
+            db, name=name, elements=element, ranges=ranges, sort=sort, descending=desc,
+            limit=limit, after=after
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(pokemons, scope, next_key)
 
-@router.get("/search/", response_model=List[schemas.Pokemon])
+@router.get("/search/", response_model=schemas.Page[schemas.Pokemon])
 async def search_pokemons_by_name(
     name: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -117,31 +199,46 @@ async def search_pokemons_by_name(
     - Case insensitive
     - Coincidencias parciales
     - Ordena por mejor coincidencia primero
+    - Con pg_trgm (POKEMON_SEARCH_BACKEND) también encuentra nombres parecidos
     
     Args:
         name: Término de búsqueda (ej: "pika")
-        skip: Número de registros a omitir
-        limit: Máximo número de resultados
+        limit: Máximo número de resultados por página
+        cursor: `next_cursor` de la página anterior (mismo término)
         db: Sesión de base de datos
         
     Returns:
-        Lista de Pokémon que coinciden con el criterio
+        Página de Pokémon que coinciden con el criterio
         
     Example:
         GET /pokemon/search/?name=pika
         Encontrará "Pikachu", "Pikachu Gigamax", etc.
     """
-    pokemons = await crud.search_pokemons_by_name(db, name=name)
-    if not pokemons:
+    scope, key_types = crud.search_cursor_scope(name)
+
+    async def load():
+        after = decode_cursor(cursor, scope, key_types) if cursor else None
+        pokemons, next_key = await crud.search_pokemons_by_name(db, name=name, limit=limit, after=after)
+        return page_response(_to_schemas(pokemons), scope, next_key)
+
+    # Resultados recientes en caché (se invalidan al crear, editar o borrar Pokémon)
+    try:
+        page = await SEARCH_CACHE.get_or_load(("search", normalize_text(name), limit, cursor), load)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not page["items"] and cursor is None:
         raise HTTPException(
             status_code=404,
             detail=f"No se encontraron Pokémon con nombre similar a '{name}'"
         )
-    return pokemons
+    return page
 
-@router.get("/flexible-search/", response_model=List[schemas.Pokemon])
+@router.get("/flexible-search/", response_model=schemas.Page[schemas.Pokemon])
 async def flexible_pokemon_search(
     search_term: str,
+    max_distance: int = Query(FUZZY_MAX_DISTANCE, ge=0, le=5),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_admin: Admin = Depends(get_current_admin)
 ):
@@ -150,45 +247,90 @@ async def flexible_pokemon_search(
     
     Implementa un sistema de 3 capas:
     1. Búsqueda exacta (case insensitive)
-    2. Coincidencia aproximada (difflib)
+    2. Coincidencia aproximada: primero por distancia de edición (árbol BK,
+       hasta `max_distance` letras cambiadas, las más cercanas primero) y si
+       no hay resultados por similitud (índice de trigramas + difflib)
     3. Búsqueda por subcadena
     
     Args:
         search_term: Término a buscar (ej: "picachu")
-        skip: Registros a omitir
-        limit: Máximo resultados
+        max_distance: Máximo de letras distintas para la capa 2 (FUZZY_MAX_DISTANCE)
+        limit: Máximo de resultados por página de la capa 3
+        cursor: `next_cursor` de la página anterior (mismo término)
         db: Sesión de base de datos
         
     Returns:
-        Lista de Pokémon ordenados por relevancia
+        Página de Pokémon ordenados por relevancia
         
     Example:
         GET /pokemon/flexible-search/?search_term=picachu
         Encontrará "Pikachu" aunque esté mal escrito
     """
-    # Capa 1: Búsqueda exacta
-    exact_match = await crud.get_pokemon_by_name(db, search_term)
-    if exact_match:
-        return [exact_match]
-    
-    # Capa 2: Coincidencia aproximada
-    all_pokemons = await crud.get_pokemons(db,)
-    all_names = [p.name for p in all_pokemons]
-    
-    similar_names = find_similar_names(search_term, all_names)
-    if similar_names:
-        pokemons = await crud.get_pokemons_by_names(db, similar_names)
-        if pokemons:
-            return pokemons
-    
-    # Capa 3: Búsqueda por subcadena
-    pokemons = await crud.search_pokemons_by_name(db, name=search_term)
-    if not pokemons:
+    scope, key_types = crud.search_cursor_scope(search_term)
+
+    async def load():
+        after = decode_cursor(cursor, scope, key_types) if cursor else None
+        pokemons, next_key = await _flexible_search(db, search_term, max_distance, limit, after)
+        return page_response(_to_schemas(pokemons), scope, next_key)
+
+    try:
+        page = await SEARCH_CACHE.get_or_load(
+            ("flexible", normalize_text(search_term), max_distance, limit, cursor), load
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not page["items"] and cursor is None:
         raise HTTPException(
             status_code=404,
             detail=f"No se encontraron Pokémon para el término '{search_term}'"
         )
-    return pokemons
+    return page
+
+@router.get("/export")
+async def export_pokemons(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Exporta la pokédex completa, ordenada por ID, transmitiendo por lotes.
+    
+    Args:
+        export_format: "ndjson" (un Pokémon JSON por línea) o "csv"
+            (movimientos como lista JSON dentro de la celda)
+        
+    Returns:
+        Respuesta en streaming (pokedex.ndjson / pokedex.csv)
+    """
+    return export_response(models.Pokemon, crud.POKEMON_EXPORT_COLUMNS, export_format, "pokedex")
+
+@router.get("/autocomplete", response_model=List[schemas.PokemonSuggestion])
+async def autocomplete_pokemon_names(
+    response: Response,
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Sugerencias para el buscador mientras se escribe.
+    
+    Devuelve solo (id, nombre) de los Pokémon cuyo nombre empieza por
+    `prefix` (sin distinguir mayúsculas ni acentos), en orden alfabético,
+    desde el índice ordenado en memoria.
+    
+    Args:
+        prefix: Texto escrito hasta ahora (ej: "pik")
+        limit: Máximo de sugerencias
+        db: Sesión de base de datos (solo si el índice no está cargado)
+        
+    Returns:
+        Lista de sugerencias {id, name}
+    """
+    if POKEMON_NAME_INDEX.ready:
+        suggestions = POKEMON_NAME_PREFIXES.complete(prefix, limit)
+    else:
+        suggestions = await crud.autocomplete_pokemon_names(db, prefix, limit)
+    response.headers["Cache-Control"] = f"public, max-age={AUTOCOMPLETE_MAX_AGE}"
+    return [schemas.PokemonSuggestion(id=pokemon_id, name=name) for pokemon_id, name in suggestions]
 
 @router.get("/{pokemon_id}", response_model=schemas.Pokemon)
 async def read_pokemon(
@@ -213,6 +355,32 @@ async def read_pokemon(
         raise HTTPException(status_code=404, detail="Pokémon no encontrado")
     return db_pokemon
 
+@router.get("/{pokemon_id}/estadisticas", response_model=schemas.PokemonBattleStats)
+async def read_pokemon_stats(
+    pokemon_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Obtiene las estadísticas de batallas de un Pokémon leídas directamente
+    de la tabla rollup.
+    
+    Args:
+        pokemon_id: ID del Pokémon
+        db: Sesión de base de datos
+        
+    Returns:
+        Los contadores acumulados (en cero si aún no participó en batallas)
+        
+    Raises:
+        HTTPException: 404 si no se encuentra
+    """
+    stats = await crud.get_pokemon_stats(db, pokemon_id)
+    if stats is not None:
+        return stats
+    if await crud.get_pokemon(db, pokemon_id=pokemon_id) is None:
+        raise HTTPException(status_code=404, detail="Pokémon no encontrado")
+    return schemas.PokemonBattleStats(pokemon_id=pokemon_id)
+
 @router.put("/{pokemon_id}", response_model=schemas.Pokemon)
 async def update_pokemon(
     pokemon_id: int, 
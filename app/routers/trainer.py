@@ -1,11 +1,12 @@
 # Importamos las bibliotecas necesarias
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 # Importamos los esquemas, operaciones CRUD y la conexión a la base de datos desde nuestros módulos
 from .. import schemas, crud
 from ..database import get_db
+from ..pagination import decode_id_cursor, page_response
 
 # Creamos un router de FastAPI para agrupar todas las rutas relacionadas con entrenadores
 router = APIRouter(
@@ -31,25 +32,79 @@ async def create_trainer(
     return await crud.create_trainer(db, trainer)
 
 # Endpoint para obtener una lista de entrenadores
-@router.get("/", response_model=List[schemas.Trainer])
+@router.get("/", response_model=schemas.Page[schemas.Trainer])
 async def read_trainers(
-    skip: int = 0,  # Número de registros a saltar (para paginación)
-    limit: int = 10,  # Número máximo de registros a devolver (para paginación)
+    limit: int = Query(10, ge=1, le=100),  # Número máximo de entrenadores por página
+    cursor: Optional[str] = None,  # `next_cursor` de la página anterior
     db: AsyncSession = Depends(get_db)  # Conexión a la base de datos
 ):
     """
-    Obtiene una lista de entrenadores con paginación.
+    Obtiene una página de entrenadores ordenados por ID.
     
     Args:
-        skip: Número de entrenadores a saltar.
         limit: Número máximo de entrenadores a devolver.
+        cursor: Cursor de la página anterior (None = primera página).
         db: Sesión de base de datos asíncrona.
         
     Returns:
-        Lista de entrenadores.
+        Página de entrenadores con el cursor de la siguiente.
     """
-    trainers = await crud.get_trainers(db, skip=skip, limit=limit)
-    return trainers
+    try:
+        after = decode_id_cursor(cursor, "trainers") if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    trainers, next_id = await crud.get_trainers(db, limit=limit, after=after)
+    return page_response(trainers, "trainers", None if next_id is None else [next_id])
+
+# Endpoint para la tabla de posiciones por rating Elo (antes de /{trainer_id})
+@router.get("/leaderboard", response_model=schemas.Leaderboard)
+async def read_leaderboard(
+    limit: int = Query(10, ge=1, le=100),  # Número de entrenadores en la tabla
+    trainer_id: Optional[int] = None,  # Entrenador cuya posición se quiere conocer
+    db: AsyncSession = Depends(get_db)  # Conexión a la base de datos
+):
+    """
+    Obtiene la tabla de posiciones por rating Elo.
+    
+    Args:
+        limit: Número de entrenadores a devolver.
+        trainer_id: ID de un entrenador para incluir su posición.
+        db: Sesión de base de datos asíncrona.
+        
+    Returns:
+        Los mejores entrenadores y, si se indicó, la posición del entrenador pedido.
+        
+    Raises:
+        HTTPException: 404 si el entrenador no tiene batallas calificadas.
+    """
+    top = []
+    previous_rating, rank = None, 0
+    for position, (rating, name) in enumerate(await crud.get_leaderboard(db, limit), start=1):
+        # Empates en el rating comparten posición
+        if rating.rating != previous_rating:
+            previous_rating, rank = rating.rating, position
+        top.append(_leaderboard_entry(rating, name, rank))
+
+    trainer = None
+    if trainer_id is not None:
+        found = await crud.get_trainer_rating(db, trainer_id)
+        if found is None:
+            raise HTTPException(status_code=404, detail="El entrenador no tiene batallas calificadas")
+        trainer = _leaderboard_entry(*found)
+
+    return schemas.Leaderboard(top=top, trainer=trainer)
+
+def _leaderboard_entry(rating, trainer_name: str, rank: int) -> schemas.LeaderboardEntry:
+    return schemas.LeaderboardEntry(
+        rank=rank,
+        trainer_id=rating.trainer_id,
+        trainer_name=trainer_name,
+        rating=round(rating.rating, 1),
+        games=rating.games,
+        wins=rating.wins,
+        losses=rating.losses,
+        draws=rating.draws
+    )
 
 # Endpoint para obtener un entrenador específico por su ID
 @router.get("/{trainer_id}", response_model=schemas.Trainer)
@@ -75,6 +130,33 @@ async def read_trainer(
         raise HTTPException(status_code=404, detail="Entrenador no encontrado")
     return db_trainer
 
+# Endpoint para obtener las estadísticas acumuladas de batallas
+@router.get("/{trainer_id}/estadisticas", response_model=schemas.TrainerBattleStats)
+async def read_trainer_stats(
+    trainer_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Obtiene las estadísticas de batallas de un entrenador (victorias, derrotas,
+    empates y rondas de sus Pokémon) leídas directamente de la tabla rollup.
+    
+    Args:
+        trainer_id: ID del entrenador.
+        db: Sesión de base de datos asíncrona.
+        
+    Returns:
+        Los contadores acumulados (en cero si aún no tiene batallas).
+        
+    Raises:
+        HTTPException: 404 si el entrenador no se encuentra.
+    """
+    stats = await crud.get_trainer_stats(db, trainer_id)
+    if stats is not None:
+        return stats
+    if await crud.get_trainer(db, trainer_id=trainer_id) is None:
+        raise HTTPException(status_code=404, detail="Entrenador no encontrado")
+    return schemas.TrainerBattleStats(trainer_id=trainer_id)
+
 # Endpoint para actualizar un entrenador existente
 @router.put("/{trainer_id}", response_model=schemas.Trainer)
 async def update_trainer(
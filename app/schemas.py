@@ -1,6 +1,7 @@
 # Importaciones necesarias
-from typing import List, Optional
-from pydantic import BaseModel, EmailStr  # BaseModel para esquemas, EmailStr para validación de email
+from datetime import datetime
+from typing import Generic, List, Literal, Optional, Tuple, TypeVar
+from pydantic import BaseModel, EmailStr, Field  # BaseModel para esquemas, EmailStr para validación de email
 
 class AdminBase(BaseModel):
     username: str
@@ -39,6 +40,13 @@ class PokemonBase(BaseModel):
     current_hp: Optional[int] = None  # HP actual (para combates)
     level: Optional[int] = 1  # Nivel del Pokémon (nuevo campo con valor por defecto 1)
 
+class PokemonSuggestion(BaseModel):
+    """
+    Sugerencia de autocompletado: solo ID y nombre para respuestas mínimas.
+    """
+    id: int
+    name: str
+
 class PokemonCreate(PokemonBase):
     """
     Esquema para creación de Pokémon. Hereda todos los campos de PokemonBase.
@@ -87,6 +95,26 @@ class Trainer(TrainerBase):
     class Config:
         orm_mode = True  # Habilita compatibilidad con ORM
 
+class LeaderboardEntry(BaseModel):
+    """
+    Posición de un entrenador en la tabla de rating Elo.
+    """
+    rank: int  # Posición (empates comparten posición)
+    trainer_id: int
+    trainer_name: str
+    rating: float
+    games: int
+    wins: int
+    losses: int
+    draws: int
+
+class Leaderboard(BaseModel):
+    """
+    Esquema de la tabla de posiciones: los mejores N y, si se pidió, un entrenador concreto.
+    """
+    top: List[LeaderboardEntry]
+    trainer: Optional[LeaderboardEntry] = None
+
 ## ------------------------- ESQUEMAS PARA RELACIÓN ENTRENADOR-POKÉMON ------------------------- ##
 
 class TrainerPokemonBase(BaseModel):
@@ -120,6 +148,7 @@ class BattleBase(BaseModel):
     trainer_id: int  # ID del entrenador que inicia la batalla
     opponent_id: int  # ID del entrenador oponente
     winner: Optional[str] = None  # Nombre del ganador (se establece al terminar)
+    winner_id: Optional[int] = None  # ID del ganador (None en empate)
     date: Optional[str] = None  # Fecha de la batalla (auto-generada)
 
 class BattleCreate(BaseModel):
@@ -137,6 +166,10 @@ class BattleUpdate(BaseModel):
     """
     winner: Optional[str] = None  # Para establecer el ganador
     date: Optional[str] = None  # Fecha personalizada (raro pero posible)
+    seed: Optional[int] = None  # Semilla usada para simular la batalla
+    engine_version: Optional[int] = None  # Versión del motor de batallas
+    keep_winner_pokemon: Optional[bool] = None  # Regla usada en la simulación
+    snapshot: Optional[dict] = None  # Estadísticas iniciales para repetir la batalla
 
 class Battle(BattleBase):
     """
@@ -146,6 +179,8 @@ class Battle(BattleBase):
     id: int  # ID único de la batalla
     trainer_name: Optional[str] = None  # Nombre del entrenador (para mostrar)
     opponent_name: Optional[str] = None  # Nombre del oponente (para mostrar)
+    seed: Optional[int] = None  # Semilla para repetir la batalla
+    engine_version: Optional[int] = None  # Versión del motor que la simuló
 
     class Config:
         orm_mode = True  # Compatibilidad con ORM
@@ -159,6 +194,8 @@ class BattlePokemonBase(BaseModel):
     pokemon_id: int  # ID del Pokémon
     hp_remaining: int  # HP actual durante la batalla
     participated: bool = False  # Si participó efectivamente
+    battle_round: Optional[int] = None  # Ronda del mejor de 3
+    trainer_id: Optional[int] = None  # Entrenador con el que peleó
 
 class BattlePokemonCreate(BattlePokemonBase):
     """
@@ -189,6 +226,10 @@ class BattleWithPokemon(Battle):
 
 ## ------------------------- RESULTADO DETALLADO DE BATALLA ------------------------- ##
 
+# Evento compacto de batalla: (kind, turn, side, pokemon, move, damage, flags, hp)
+# Ver app/battle_engine.BattleEvent para el significado de cada campo
+BattleEvent = Tuple[int, int, int, int, str, int, int, int]
+
 class BattleResult(BaseModel):
     """
     Esquema para el resultado detallado de una batalla.
@@ -202,13 +243,203 @@ class BattleResult(BaseModel):
     opponent_pokemon: Pokemon
     trainer_hp_remaining: int
     opponent_hp_remaining: int
-    battle_log: List[str]
+    battle_log: Optional[List[str]] = None  # Solo con log=text
+    battle_events: Optional[List[BattleEvent]] = None  # Solo con log=events
     last_trainer_attack: Optional[str] = None  # Hacer opcional o proporcionar valor por defecto
     last_opponent_attack: Optional[str] = None
     trainer_wins: int
     opponent_wins: int
     is_best_of_three: bool
     keep_winner_pokemon: bool # Indica si se mantiene el Pokémon ganador para la siguiente batalla
+
+class BattleReplay(BaseModel):
+    """
+    Esquema con la repetición de una batalla regenerada a partir de su semilla.
+    """
+    battle_id: int
+    seed: int
+    engine_version: int
+    winner_name: str
+    trainer_wins: int
+    opponent_wins: int
+    battle_log: List[str]
+
+class BattleBatchLine(BaseModel):
+    """
+    Línea del resultado de POST /batallas/batch (una por pareja, en orden de llegada).
+    `index` es la posición de la pareja en la solicitud; `error` explica por qué no se peleó.
+    """
+    index: int
+    trainer_id: int
+    opponent_id: int
+    result: Optional[BattleResult] = None
+    error: Optional[str] = None
+
+class LiveBattleStart(BaseModel):
+    """
+    Esquema con los datos para seguir una batalla en vivo.
+    """
+    live_id: str
+    trainer_id: int
+    opponent_id: int
+    events_url: str  # Server-Sent Events
+    websocket_url: str  # Mismos mensajes por WebSocket
+
+class BattleJob(BaseModel):
+    """
+    Esquema de una batalla encolada (POST /batallas/?queue=true).
+    Se consulta en GET /batallas/jobs/{job_id} hasta que `status` sea done o failed.
+    """
+    id: int
+    status: Literal["pending", "running", "done", "failed"]
+    trainer_id: int
+    opponent_id: int
+    keep_winner_pokemon: bool = True
+    attempts: int = 0
+    battle_id: Optional[int] = None  # Batalla registrada al terminar
+    result: Optional[BattleResult] = None  # Mismo contenido que la respuesta síncrona
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True  # Compatibilidad con ORM
+
+# Formato del registro de batalla en la respuesta
+BattleLogMode = Literal["none", "events", "text"]
+
+## ------------------------- PROBABILIDADES DE BATALLA (MONTE CARLO) ------------------------- ##
+
+class HPDistribution(BaseModel):
+    """
+    Resumen de la distribución del HP restante al final de la última ronda.
+    """
+    mean: float
+    p10: float
+    p50: float
+    p90: float
+
+class BattleOdds(BaseModel):
+    """
+    Esquema con las estimaciones de una simulación Monte Carlo entre dos entrenadores.
+    """
+    trainer_id: int
+    opponent_id: int
+    n_battles: int  # Número de combates simulados
+    trainer_win_probability: float
+    opponent_win_probability: float
+    draw_probability: float
+    average_turns: float  # Turnos promedio por combate (sumando todas las rondas)
+    average_rounds: float  # Rondas promedio por combate (2 o 3)
+    trainer_hp_remaining: HPDistribution
+    opponent_hp_remaining: HPDistribution
+    keep_winner_pokemon: bool
+
+## ------------------------- TORNEOS ------------------------- ##
+
+TournamentFormat = Literal["round_robin", "single_elimination", "swiss"]
+
+class TournamentCreate(BaseModel):
+    """
+    Esquema para iniciar un torneo.
+    El orden de `trainer_ids` es la siembra (el primero es el mejor sembrado).
+    """
+    trainer_ids: List[int]
+    format: TournamentFormat = "round_robin"
+    keep_winner_pokemon: bool = True
+    rounds: Optional[int] = Field(None, ge=1)  # Jornadas del sistema suizo (por defecto ceil(log2(n)), máximo n - 1)
+
+class TournamentMatch(BaseModel):
+    """
+    Esquema con el resultado de un enfrentamiento del torneo.
+    """
+    round: int  # Jornada del torneo
+    battle_id: int
+    trainer_id: int
+    opponent_id: int
+    winner_id: Optional[int] = None  # None en empate
+    trainer_wins: int
+    opponent_wins: int
+
+class TournamentStanding(BaseModel):
+    """
+    Esquema con la posición de un entrenador en la clasificación.
+    """
+    position: int
+    trainer_id: int
+    trainer_name: str
+    played: int
+    wins: int
+    draws: int
+    losses: int
+    byes: int  # Jornadas sin rival
+    points: int  # 3 por victoria, 1 por empate
+    round_difference: int  # Rondas ganadas menos rondas perdidas
+
+class TournamentResult(BaseModel):
+    """
+    Esquema con el resultado completo de un torneo.
+    """
+    format: TournamentFormat
+    rounds: int
+    champion_id: Optional[int] = None
+    champion_name: Optional[str] = None
+    matches: List[TournamentMatch]
+    standings: List[TournamentStanding]
+    keep_winner_pokemon: bool
+
+## ------------------------- ESTADÍSTICAS DE BATALLAS ------------------------- ##
+
+class TrainerBattleStats(BaseModel):
+    """
+    Estadísticas acumuladas de un entrenador (leídas de la tabla rollup).
+    """
+    trainer_id: int
+    battles: int = 0
+    wins: int = 0
+    losses: int = 0
+    draws: int = 0
+    pokemon_used: int = 0  # Rondas disputadas por sus Pokémon
+    pokemon_fainted: int = 0  # Rondas en que su Pokémon terminó debilitado
+
+    class Config:
+        orm_mode = True  # Compatibilidad con ORM
+
+class PokemonBattleStats(BaseModel):
+    """
+    Estadísticas acumuladas de un Pokémon (leídas de la tabla rollup).
+    """
+    pokemon_id: int
+    battles: int = 0
+    wins: int = 0  # Batallas que ganó su entrenador
+    losses: int = 0
+    draws: int = 0
+    rounds: int = 0  # Rondas disputadas
+    faints: int = 0  # Rondas que terminó debilitado
+
+    class Config:
+        orm_mode = True  # Compatibilidad con ORM
+
+class BattleStatsRebuild(BaseModel):
+    """
+    Resultado de reconstruir las estadísticas desde el historial.
+    """
+    trainers: int  # Filas de trainer_stats reconstruidas
+    pokemons: int  # Filas de pokemon_stats reconstruidas
+
+## ------------------------- PAGINACIÓN POR CURSOR ------------------------- ##
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    """
+    Página de un listado. Para pedir la siguiente se envía `next_cursor` en
+    el parámetro `cursor`; es None en la última página.
+    """
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 ## ------------------------- MANEJO DE REFERENCIAS CIRCULARES ------------------------- ##
 
 # Resuelve referencias circulares entre esquemas que se referencian mutuamente
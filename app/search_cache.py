@@ -0,0 +1,95 @@
+"""
+Caché de resultados de búsqueda por nombre (/pokemons/search/ y /flexible-search/).
+
+La clave es el término normalizado (`normalize_text`) más los parámetros de
+la búsqueda. Cada entrada vence a los SEARCH_CACHE_TTL_SECONDS y el total se
+limita a SEARCH_CACHE_SIZE con desalojo LRU.
+
+Invalidación: `crud.create_pokemon`, `update_pokemon` y `delete_pokemon`
+incrementan `version`; las entradas guardadas con una versión anterior dejan
+de servirse. Los cambios que no pasan por esas funciones (subidas de nivel,
+HP) y las escrituras de otros procesos de la API se ven al vencer el TTL.
+
+Varias solicitudes simultáneas con la misma clave comparten una sola consulta
+a la base de datos (single-flight).
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import os
+import time
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "60"))
+
+class SearchCache:
+    """Diccionario LRU con vencimiento, versión global y consultas compartidas"""
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_SIZE, ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        # Clave -> (vencimiento, versión, resultado)
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[Hashable, int], asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def bump(self):
+        """Invalida todas las entradas (un Pokémon se creó, cambió o se eliminó)"""
+        self.version += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Resultado guardado para `key` o, si no hay uno vigente, el de `loader()`.
+        Si otra solicitud ya está cargando la misma clave, espera su resultado
+        en lugar de repetir la consulta.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, version, value = entry
+            if version == self.version and expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+
+        version = self.version
+        flight_key = (key, version)
+        inflight = self._inflight.get(flight_key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # Se canceló esta solicitud, no la consulta compartida
+            # La consulta compartida falló: cada una reintenta por su cuenta
+            return await loader()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight_key] = future
+        try:
+            value = await loader()
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[flight_key]
+        future.set_result(value)
+
+        # Si hubo escrituras durante la consulta, el resultado puede ser viejo
+        if version == self.version and self.max_entries > 0:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+SEARCH_CACHE = SearchCache()
@@ -0,0 +1,274 @@
+"""
+Índices en memoria de nombres de Pokémon para la búsqueda tolerante a errores.
+
+- `TrigramIndex`: cada nombre normalizado (`normalize_text`) se descompone en
+  trigramas y se guarda en un índice invertido trigrama → IDs. Una búsqueda
+  solo puntúa los nombres que comparten trigramas con el término.
+- `BKTree`: árbol BK con distancia de Levenshtein (biblioteca C
+  python-Levenshtein). Devuelve los nombres a una distancia de edición
+  máxima, ordenados de menor a mayor distancia, visitando solo las ramas
+  que la desigualdad triangular no descarta.
+- `PrefixIndex`: arreglo ordenado de nombres normalizados para autocompletar;
+  un prefijo es una búsqueda binaria más una lectura secuencial.
+
+Los índices viven en la memoria de cada proceso de la API: se construyen al
+iniciar la aplicación y las funciones de crud que crean, renombran o eliminan
+Pokémon los actualizan en el acto (`index_pokemon_name` / `unindex_pokemon_name`).
+"""
+from bisect import bisect_left, insort
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import os
+import re
+import unicodedata
+
+import Levenshtein
+
+# Candidatos (por trigramas compartidos) que se puntúan en cada búsqueda
+MAX_CANDIDATES = 50
+
+# Distancia de edición máxima por defecto de la búsqueda con errores
+FUZZY_MAX_DISTANCE = int(os.getenv("FUZZY_MAX_DISTANCE", "2"))
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza texto para búsquedas:
+    - Convierte a minúsculas
+    - Elimina acentos y caracteres especiales
+    - Elimina espacios extras
+    """
+    text = text.lower().strip()
+    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
+    return re.sub(r'\s+', ' ', text)
+
+def trigrams(normalized: str) -> Set[str]:
+    """Trigramas de un texto ya normalizado (con relleno para marcar el inicio y el fin)"""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramIndex:
+    """Índice invertido de trigramas sobre los nombres normalizados"""
+
+    def __init__(self):
+        self._names: Dict[int, Tuple[str, str]] = {}  # ID -> (nombre, nombre normalizado)
+        self._postings: Dict[str, Set[int]] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def rebuild(self, rows: Iterable[Tuple[int, str]]):
+        """Reemplaza el contenido del índice con los pares (id, nombre)"""
+        self._names.clear()
+        self._postings.clear()
+        for pokemon_id, name in rows:
+            self.add(pokemon_id, name)
+        self.ready = True
+
+    def add(self, pokemon_id: int, name: str):
+        """Agrega un Pokémon o actualiza su nombre"""
+        self.remove(pokemon_id)
+        normalized = normalize_text(name)
+        self._names[pokemon_id] = (name, normalized)
+        for gram in trigrams(normalized):
+            self._postings.setdefault(gram, set()).add(pokemon_id)
+
+    def remove(self, pokemon_id: int):
+        entry = self._names.pop(pokemon_id, None)
+        if entry is None:
+            return
+        for gram in trigrams(entry[1]):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(pokemon_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, term: str, limit: int = 5, cutoff: float = 0.6) -> List[int]:
+        """
+        IDs de los nombres más parecidos a `term`, del más al menos parecido.
+        La similitud es la de `difflib` (0-1) y solo se devuelven los que
+        alcanzan `cutoff`.
+        """
+        normalized = normalize_text(term)
+        shared = Counter()
+        for gram in trigrams(normalized):
+            shared.update(self._postings.get(gram, ()))
+
+        scored = []
+        matcher = SequenceMatcher()
+        matcher.set_seq2(normalized)
+        for pokemon_id, _ in shared.most_common(MAX_CANDIDATES):
+            matcher.set_seq1(self._names[pokemon_id][1])
+            if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+                continue
+            score = matcher.ratio()
+            if score >= cutoff:
+                scored.append((-score, self._names[pokemon_id][1], pokemon_id))
+        scored.sort()
+        return [pokemon_id for _, _, pokemon_id in scored[:limit]]
+
+class _BKNode:
+    __slots__ = ("word", "ids", "children")
+
+    def __init__(self, word: str):
+        self.word = word
+        self.ids: Set[int] = set()
+        self.children: Dict[int, "_BKNode"] = {}
+
+class BKTree:
+    """
+    Árbol BK sobre los nombres normalizados. Los nombres repetidos comparten
+    nodo. Al eliminar, el nodo queda vacío (sigue sirviendo de ruta) y el árbol
+    se reconstruye cuando los nodos vacíos pasan a ser mayoría.
+    """
+
+    def __init__(self):
+        self._root: Optional[_BKNode] = None
+        self._nodes: Dict[str, _BKNode] = {}  # Nombre normalizado -> nodo
+        self._words: Dict[int, str] = {}  # ID -> nombre normalizado
+        self._empty_nodes = 0
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def rebuild(self, rows: Iterable[Tuple[int, str]]):
+        """Reemplaza el contenido del árbol con los pares (id, nombre)"""
+        self._words = {pokemon_id: normalize_text(name) for pokemon_id, name in rows}
+        self._rebuild_nodes()
+
+    def _rebuild_nodes(self):
+        self._root = None
+        self._nodes = {}
+        self._empty_nodes = 0
+        for pokemon_id, word in self._words.items():
+            self._node(word).ids.add(pokemon_id)
+
+    def _node(self, word: str) -> _BKNode:
+        """Nodo de `word`, insertándolo si no existe"""
+        node = self._nodes.get(word)
+        if node is not None:
+            return node
+        new = self._nodes[word] = _BKNode(word)
+        if self._root is None:
+            self._root = new
+            return new
+        node = self._root
+        while True:
+            distance = Levenshtein.distance(word, node.word)
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = new
+                return new
+            node = child
+
+    def add(self, pokemon_id: int, name: str):
+        """Agrega un Pokémon o actualiza su nombre"""
+        self.remove(pokemon_id)
+        word = normalize_text(name)
+        self._words[pokemon_id] = word
+        node = self._nodes.get(word)
+        if node is None:
+            node = self._node(word)
+        elif not node.ids:
+            self._empty_nodes -= 1  # Nodo vacío que vuelve a usarse
+        node.ids.add(pokemon_id)
+
+    def remove(self, pokemon_id: int):
+        word = self._words.pop(pokemon_id, None)
+        if word is None:
+            return
+        node = self._nodes[word]
+        node.ids.discard(pokemon_id)
+        if not node.ids:
+            self._empty_nodes += 1
+            if self._empty_nodes > 1000 and self._empty_nodes * 2 > len(self._nodes):
+                self._rebuild_nodes()
+
+    def search(self, term: str, max_distance: int = FUZZY_MAX_DISTANCE, limit: int = 5) -> List[int]:
+        """
+        IDs de los nombres a distancia de Levenshtein <= `max_distance` de
+        `term`, ordenados por distancia y luego por similitud (ratio).
+        """
+        if self._root is None:
+            return []
+        word = normalize_text(term)
+        matches = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = Levenshtein.distance(word, node.word)
+            if distance <= max_distance and node.ids:
+                matches.append((distance, -Levenshtein.ratio(word, node.word), node.word, sorted(node.ids)))
+            low, high = distance - max_distance, distance + max_distance
+            for edge, child in node.children.items():
+                if low <= edge <= high:
+                    stack.append(child)
+        matches.sort()
+        return [pokemon_id for *_, ids in matches for pokemon_id in ids][:limit]
+
+class PrefixIndex:
+    """Pares (nombre normalizado, id) ordenados para búsquedas por prefijo"""
+
+    def __init__(self):
+        self._sorted: List[Tuple[str, int]] = []
+        self._names: Dict[int, Tuple[str, str]] = {}  # ID -> (nombre, nombre normalizado)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def rebuild(self, rows: Iterable[Tuple[int, str]]):
+        """Reemplaza el contenido del índice con los pares (id, nombre)"""
+        self._names = {pokemon_id: (name, normalize_text(name)) for pokemon_id, name in rows}
+        self._sorted = sorted((normalized, pokemon_id) for pokemon_id, (_, normalized) in self._names.items())
+
+    def add(self, pokemon_id: int, name: str):
+        """Agrega un Pokémon o actualiza su nombre"""
+        self.remove(pokemon_id)
+        normalized = normalize_text(name)
+        self._names[pokemon_id] = (name, normalized)
+        insort(self._sorted, (normalized, pokemon_id))
+
+    def remove(self, pokemon_id: int):
+        entry = self._names.pop(pokemon_id, None)
+        if entry is None:
+            return
+        position = bisect_left(self._sorted, (entry[1], pokemon_id))
+        del self._sorted[position]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """Hasta `limit` pares (id, nombre) cuyo nombre normalizado empieza por `prefix`, en orden alfabético"""
+        prefix = normalize_text(prefix)
+        matches = []
+        position = bisect_left(self._sorted, (prefix,))
+        while len(matches) < limit and position < len(self._sorted):
+            normalized, pokemon_id = self._sorted[position]
+            if not normalized.startswith(prefix):
+                break
+            matches.append((pokemon_id, self._names[pokemon_id][0]))
+            position += 1
+        return matches
+
+POKEMON_NAME_INDEX = TrigramIndex()
+POKEMON_NAME_TREE = BKTree()
+POKEMON_NAME_PREFIXES = PrefixIndex()
+
+def rebuild_name_indexes(rows: Iterable[Tuple[int, str]]):
+    """Construye todos los índices con los pares (id, nombre)"""
+    rows = list(rows)
+    POKEMON_NAME_INDEX.rebuild(rows)
+    POKEMON_NAME_TREE.rebuild(rows)
+    POKEMON_NAME_PREFIXES.rebuild(rows)
+
+def index_pokemon_name(pokemon_id: int, name: str):
+    """Agrega o renombra un Pokémon en todos los índices"""
+    POKEMON_NAME_INDEX.add(pokemon_id, name)
+    POKEMON_NAME_TREE.add(pokemon_id, name)
+    POKEMON_NAME_PREFIXES.add(pokemon_id, name)
+
+def unindex_pokemon_name(pokemon_id: int):
+    """Quita un Pokémon de todos los índices"""
+    POKEMON_NAME_INDEX.remove(pokemon_id)
+    POKEMON_NAME_TREE.remove(pokemon_id)
+    POKEMON_NAME_PREFIXES.remove(pokemon_id)
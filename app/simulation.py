@@ -0,0 +1,305 @@
+"""
+Motor Monte Carlo vectorizado para estimar probabilidades de victoria.
+
+Reproduce las reglas de `app/battle_engine.py` (cálculo de daño, orden de
+ataque por velocidad, contraataque antes de debilitarse, subida de nivel entre
+rondas y mejor de 3 con Pokémon ganador en el campo) pero avanza miles de
+batallas a la vez con operaciones de NumPy en lugar de un turno por vez.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .battle_engine import MAX_POKEMON_LEVEL
+from .type_chart import get_type_id, get_type_vector
+
+# --------------------------------------------------
+# PREPARACIÓN DE EQUIPOS
+# --------------------------------------------------
+
+def _roster_arrays(pokemons: Sequence) -> dict:
+    """
+    Convierte una lista de Pokémon (esquemas u objetos ORM) en arreglos de NumPy
+    con las estadísticas ya resueltas según los valores por defecto del motor.
+
+    Los valores que harían fallar a `calculate_damage` (estadísticas nulas o
+    menores que 5) se acotan para que `randint(5, x)` siempre sea válido.
+    """
+    max_hp, start_hp = [], []
+    attack_hi, special_hi = [], []
+    defense, special_defense = [], []
+    speed, level, special_prob = [], [], []
+
+    for pokemon in pokemons:
+        hp = pokemon.hp or 100
+        max_hp.append(hp)
+        start_hp.append(pokemon.current_hp if pokemon.current_hp is not None else hp)
+
+        # Rango superior del daño base: min(stat, 100) or valor_por_defecto
+        attack_hi.append(max(5, min(pokemon.attack or 0, 100) or 15))
+        special_hi.append(max(5, min(pokemon.special_attack or 0, 100) or 20))
+
+        physical_defense = pokemon.defense or 10
+        defense.append(physical_defense)
+        special_defense.append(
+            pokemon.special_defense if pokemon.special_defense is not None else physical_defense
+        )
+
+        speed.append(pokemon.speed or 50)
+        level.append(pokemon.level if pokemon.level is not None else 1)
+
+        # 30% de ataque especial explícito + movimientos cuyo nombre ya es "especial"
+        moves = pokemon.moves or []
+        if moves:
+            named_special = sum("especial" in move.lower() for move in moves) / len(moves)
+            special_prob.append(0.3 + 0.7 * named_special)
+        else:
+            special_prob.append(0.0)  # Placaje, Arañazo y Gruñido nunca son especiales
+
+    return {
+        "max_hp": np.array(max_hp, dtype=np.int64),
+        "start_hp": np.array(start_hp, dtype=np.int64),
+        "attack_hi": np.array(attack_hi, dtype=np.int64),
+        "special_hi": np.array(special_hi, dtype=np.int64),
+        "defense": np.array(defense, dtype=np.float64),
+        "special_defense": np.array(special_defense, dtype=np.float64),
+        "speed": np.array(speed, dtype=np.float64),
+        "level": np.array(level, dtype=np.int64),
+        "special_prob": np.array(special_prob, dtype=np.float64),
+    }
+
+def _type_matrix(attackers: Sequence, defenders: Sequence) -> np.ndarray:
+    """Matriz [atacante, defensor] con el multiplicador de tipo de cada cruce"""
+    # Los identificadores antes que los vectores: así cada vector los cubre a todos
+    defender_ids = [get_type_id(d.element or "Normal") for d in defenders]
+    return np.array(
+        [get_type_vector(a.element)[defender_ids] for a in attackers], dtype=np.float64
+    ).reshape(len(attackers), len(defenders))
+
+# --------------------------------------------------
+# MECÁNICAS DE COMBATE VECTORIZADAS
+# --------------------------------------------------
+
+def _damage(rng, attack_hi, special_hi, defense, special_defense, special_prob,
+            type_multiplier, attacker_level, defender_level) -> np.ndarray:
+    """Versión vectorizada de `calculate_damage` (ver reglas en battle_engine.py)"""
+    n = type_multiplier.shape[0]
+    is_special = rng.random(n) < special_prob
+
+    base_damage = rng.integers(5, np.where(is_special, special_hi, attack_hi) + 1)
+    defense_stat = np.where(is_special, special_defense, defense)
+
+    base_damage = np.floor(base_damage * (1 + attacker_level * 0.02))
+    defense_level_reduction = np.maximum(1, defense_stat / (10 * (1 + defender_level * 0.015)))
+    damage = np.maximum(1, np.floor((base_damage * type_multiplier) / defense_level_reduction))
+    damage = np.where(is_special, np.floor(damage * 1.3), damage)
+
+    is_critical = rng.random(n) < 0.1 + attacker_level * 0.001
+    damage = np.where(is_critical, np.floor(damage * 1.5), damage)
+
+    resisted = rng.random(n) < defender_level * 0.001
+    damage = np.where(resisted, np.maximum(1, np.floor(damage * 0.7)), damage)
+    return damage.astype(np.int64)
+
+def _run_round(rng, trainer, opponent, to_opponent, to_trainer,
+               trainer_idx, opponent_idx, trainer_level, opponent_level,
+               trainer_hp, opponent_hp):
+    """
+    Simula en paralelo una ronda (equivalente a `simulate_single_battle`) para
+    cada batalla del lote. Modifica `trainer_hp` y `opponent_hp` en el lugar.
+
+    Retorna: (turnos por batalla, ganador por batalla: 1 entrenador, -1 oponente, 0 empate)
+    """
+    n = trainer_idx.shape[0]
+
+    # Determinar quién ataca primero (velocidad + 1% por nivel, empate al azar)
+    speed_t = trainer["speed"][trainer_idx] * (1 + trainer_level * 0.01)
+    speed_o = opponent["speed"][opponent_idx] * (1 + opponent_level * 0.01)
+    trainer_turn = np.where(speed_t == speed_o, rng.random(n) < 0.5, speed_t > speed_o)
+
+    # La batalla termina antes del primer ataque si algún HP ya es 0 (turno 1)
+    running = (trainer_hp > 0) & (opponent_hp > 0)
+    turns = np.where(running, 0, 1)
+
+    def gather(side, idx):
+        return {key: side[key][idx] for key in ("attack_hi", "special_hi", "defense", "special_defense", "special_prob")}
+
+    t = gather(trainer, trainer_idx)
+    o = gather(opponent, opponent_idx)
+    mult_to_opponent = to_opponent[trainer_idx, opponent_idx]
+    mult_to_trainer = to_trainer[opponent_idx, trainer_idx]
+
+    while True:
+        active = np.flatnonzero(running)
+        if active.size == 0:
+            break
+        turns[active] += 1
+        tt = trainer_turn[active]
+
+        def pick(key, attacker_is_trainer):
+            return np.where(attacker_is_trainer, t[key][active], o[key][active])
+
+        atk_level = np.where(tt, trainer_level[active], opponent_level[active])
+        def_level = np.where(tt, opponent_level[active], trainer_level[active])
+
+        damage = _damage(
+            rng,
+            pick("attack_hi", tt), pick("special_hi", tt),
+            pick("defense", ~tt), pick("special_defense", ~tt),
+            pick("special_prob", tt),
+            np.where(tt, mult_to_opponent[active], mult_to_trainer[active]),
+            atk_level, def_level,
+        )
+
+        opponent_hp[active] = np.where(tt, np.maximum(0, opponent_hp[active] - damage), opponent_hp[active])
+        trainer_hp[active] = np.where(tt, trainer_hp[active], np.maximum(0, trainer_hp[active] - damage))
+
+        defender_hp = np.where(tt, opponent_hp[active], trainer_hp[active])
+        fainted = defender_hp <= 0
+
+        # Contraataque antes de debilitarse (10% + 0.1% por nivel del defensor)
+        counter = fainted & (rng.random(active.size) < 0.1 + def_level * 0.001)
+        if counter.any():
+            c = active[counter]
+            ct = tt[counter]  # True: el defensor es el oponente y contraataca al entrenador
+            counter_damage = _damage(
+                rng,
+                np.where(ct, o["attack_hi"][c], t["attack_hi"][c]),
+                np.where(ct, o["special_hi"][c], t["special_hi"][c]),
+                np.where(ct, t["defense"][c], o["defense"][c]),
+                np.where(ct, t["special_defense"][c], o["special_defense"][c]),
+                np.where(ct, o["special_prob"][c], t["special_prob"][c]),
+                np.where(ct, mult_to_trainer[c], mult_to_opponent[c]),
+                def_level[counter], atk_level[counter],
+            )
+            trainer_hp[c] = np.where(ct, np.maximum(0, trainer_hp[c] - counter_damage), trainer_hp[c])
+            opponent_hp[c] = np.where(ct, opponent_hp[c], np.maximum(0, opponent_hp[c] - counter_damage))
+
+        running[active[fainted]] = False
+        still = active[~fainted]
+        trainer_turn[still] = ~trainer_turn[still]
+
+    winner = np.where(
+        (trainer_hp > 0) & (opponent_hp <= 0), 1,
+        np.where((opponent_hp > 0) & (trainer_hp <= 0), -1, 0),
+    )
+    return turns, winner
+
+def _levels_gained(level: np.ndarray, turns: np.ndarray, is_winner: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de `calculate_level_up`"""
+    total_exp = 10 + np.minimum(turns * 0.2, 20) + np.where(is_winner, 15, 0)
+    gained = np.minimum(np.floor(total_exp / 20), 2).astype(np.int64)
+    return np.minimum(gained, np.maximum(MAX_POKEMON_LEVEL - level, 0))
+
+# --------------------------------------------------
+# SIMULACIÓN MONTE CARLO (MEJOR DE 3)
+# --------------------------------------------------
+
+def simulate_battles_batch(
+    trainer_pokemons: Sequence,
+    opponent_pokemons: Sequence,
+    n_battles: int = 10000,
+    keep_winner_pokemon: bool = True,
+    seed: Optional[int] = None
+) -> dict:
+    """
+    Simula `n_battles` combates completos (mejor de 3) entre dos equipos y
+    resume los resultados.
+
+    Args:
+        trainer_pokemons: Pokémon del entrenador (esquemas u objetos ORM).
+        opponent_pokemons: Pokémon del oponente.
+        n_battles: Número de combates a simular.
+        keep_winner_pokemon: Mantener el Pokémon ganador en la siguiente ronda.
+        seed: Semilla opcional para resultados reproducibles.
+
+    Returns:
+        Diccionario con probabilidades de victoria/empate, turnos promedio y
+        distribución del HP restante en la última ronda.
+    """
+    if not trainer_pokemons or not opponent_pokemons:
+        raise ValueError("Ambos equipos necesitan Pokémon")
+    if n_battles < 1:
+        raise ValueError("n_battles debe ser mayor que 0")
+
+    rng = np.random.default_rng(seed)
+    trainer = _roster_arrays(trainer_pokemons)
+    opponent = _roster_arrays(opponent_pokemons)
+    to_opponent = _type_matrix(trainer_pokemons, opponent_pokemons)
+    to_trainer = _type_matrix(opponent_pokemons, trainer_pokemons)
+    n_trainer, n_opponent = len(trainer_pokemons), len(opponent_pokemons)
+
+    # Los niveles suben entre rondas, así que cada combate lleva su propia copia
+    trainer_levels = np.tile(trainer["level"], (n_battles, 1))
+    opponent_levels = np.tile(opponent["level"], (n_battles, 1))
+
+    trainer_wins = np.zeros(n_battles, dtype=np.int64)
+    opponent_wins = np.zeros(n_battles, dtype=np.int64)
+    total_turns = np.zeros(n_battles, dtype=np.int64)
+    rounds = np.zeros(n_battles, dtype=np.int64)
+    final_trainer_hp = np.zeros(n_battles, dtype=np.int64)
+    final_opponent_hp = np.zeros(n_battles, dtype=np.int64)
+
+    # Pokémon que sigue en el campo (-1 si hay que elegir uno nuevo)
+    kept_trainer = np.full(n_battles, -1, dtype=np.int64)
+    kept_trainer_hp = np.zeros(n_battles, dtype=np.int64)
+    kept_opponent = np.full(n_battles, -1, dtype=np.int64)
+
+    for _ in range(3):
+        idx = np.flatnonzero((trainer_wins < 2) & (opponent_wins < 2))
+        if idx.size == 0:
+            break
+        n = idx.size
+
+        # Selección de Pokémon para esta ronda
+        random_trainer = rng.integers(0, n_trainer, size=n)
+        random_opponent = rng.integers(0, n_opponent, size=n)
+        keep_t = kept_trainer[idx] >= 0
+        keep_o = kept_opponent[idx] >= 0
+        trainer_idx = np.where(keep_t, kept_trainer[idx], random_trainer)
+        opponent_idx = np.where(keep_o, kept_opponent[idx], random_opponent)
+
+        # Solo el HP del entrenador se arrastra entre rondas (igual que simulate_battle)
+        trainer_hp = np.where(keep_t, kept_trainer_hp[idx], trainer["start_hp"][trainer_idx])
+        opponent_hp = opponent["start_hp"][opponent_idx].copy()
+
+        trainer_level = trainer_levels[idx, trainer_idx]
+        opponent_level = opponent_levels[idx, opponent_idx]
+
+        turns, winner = _run_round(
+            rng, trainer, opponent, to_opponent, to_trainer,
+            trainer_idx, opponent_idx, trainer_level, opponent_level,
+            trainer_hp, opponent_hp
+        )
+
+        trainer_levels[idx, trainer_idx] += _levels_gained(trainer_level, turns, winner == 1)
+        opponent_levels[idx, opponent_idx] += _levels_gained(opponent_level, turns, winner == -1)
+
+        trainer_wins[idx] += winner == 1
+        opponent_wins[idx] += winner == -1
+        total_turns[idx] += turns
+        rounds[idx] += 1
+        final_trainer_hp[idx] = trainer_hp
+        final_opponent_hp[idx] = opponent_hp
+
+        if keep_winner_pokemon:
+            trainer_won = (winner == 1) & (trainer_hp > 0)
+            opponent_won = (winner == -1) & (opponent_hp > 0)
+            kept_trainer[idx] = np.where(trainer_won, trainer_idx, -1)
+            kept_trainer_hp[idx] = np.where(trainer_won, trainer_hp, 0)
+            kept_opponent[idx] = np.where(opponent_won, opponent_idx, -1)
+
+    def hp_distribution(hp: np.ndarray) -> dict:
+        p10, p50, p90 = np.percentile(hp, [10, 50, 90])
+        return {"mean": float(hp.mean()), "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+    return {
+        "n_battles": n_battles,
+        "trainer_win_probability": float(np.mean(trainer_wins > opponent_wins)),
+        "opponent_win_probability": float(np.mean(opponent_wins > trainer_wins)),
+        "draw_probability": float(np.mean(trainer_wins == opponent_wins)),
+        "average_turns": float(total_turns.mean()),
+        "average_rounds": float(rounds.mean()),
+        "trainer_hp_remaining": hp_distribution(final_trainer_hp),
+        "opponent_hp_remaining": hp_distribution(final_opponent_hp),
+    }
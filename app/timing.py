@@ -0,0 +1,127 @@
+"""
+Medición de fases de las batallas: cabecera Server-Timing e histogramas.
+
+`simulate_battle` mide cada fase (carga de equipos, espera del pool,
+simulación, registro de texto, persistencia y armado de la respuesta) con un
+`PhaseTimer`. POST /batallas/ devuelve esos tiempos en la cabecera
+`Server-Timing` (visible en las herramientas de desarrollo del navegador) y
+todos se acumulan en `BATTLE_PHASES`, que GET /metrics expone en el formato
+de texto de Prometheus.
+
+Con BATTLE_TIMING=0 se usa `NULL_TIMER`: cada fase es un contexto vacío
+compartido y no se registra nada. Los histogramas viven en la memoria de
+cada proceso de la API.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Sequence
+import os
+import time
+
+BATTLE_TIMING = os.getenv("BATTLE_TIMING", "1") != "0"
+
+# Límites superiores (segundos) de los buckets de los histogramas
+PHASE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# --------------------------------------------------
+# MEDICIÓN POR SOLICITUD
+# --------------------------------------------------
+
+class _Phase:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: "PhaseTimer", name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+
+class PhaseTimer:
+    """Acumula la duración de cada fase en orden de aparición"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def phase(self, name: str) -> _Phase:
+        """Contexto que suma su duración a la fase `name`"""
+        return _Phase(self, name)
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Valor de la cabecera Server-Timing (duraciones en milisegundos)"""
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.phases.items())
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+class _NullTimer(PhaseTimer):
+    """Medidor deshabilitado: no toma tiempos ni guarda fases"""
+    _phase = _NullPhase()
+
+    def phase(self, name: str) -> _NullPhase:
+        return self._phase
+
+    def add(self, name: str, seconds: float):
+        pass
+
+NULL_TIMER = _NullTimer()
+
+def new_timer() -> PhaseTimer:
+    """Medidor para una solicitud (NULL_TIMER si BATTLE_TIMING=0)"""
+    return PhaseTimer() if BATTLE_TIMING else NULL_TIMER
+
+# --------------------------------------------------
+# HISTOGRAMAS POR FASE
+# --------------------------------------------------
+
+class PhaseHistograms:
+    """Histogramas de duración por fase, con el formato de Prometheus"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = PHASE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._counts: Dict[str, List[int]] = {}  # Por bucket (el último es +Inf), sin acumular
+        self._sums: Dict[str, float] = {}
+
+    def observe(self, phase: str, seconds: float):
+        counts = self._counts.get(phase)
+        if counts is None:
+            counts = self._counts[phase] = [0] * (len(self.buckets) + 1)
+            self._sums[phase] = 0.0
+        counts[bisect_left(self.buckets, seconds)] += 1
+        self._sums[phase] += seconds
+
+    def observe_timer(self, timer: PhaseTimer):
+        """Registra todas las fases medidas por `timer`"""
+        for phase, seconds in timer.phases.items():
+            self.observe(phase, seconds)
+
+    def render(self) -> str:
+        """Exposición en formato de texto de Prometheus"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for phase in sorted(self._counts):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self._counts[phase]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{phase="{phase}",le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{phase="{phase}"}} {self._sums[phase]}')
+            lines.append(f'{self.name}_count{{phase="{phase}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+BATTLE_PHASES = PhaseHistograms(
+    "pykedex_battle_phase_seconds",
+    "Duración de cada fase de POST /batallas/ (y de la cola de batallas)"
+)
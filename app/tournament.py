@@ -0,0 +1,286 @@
+"""
+Motor de torneos: todos contra todos, eliminación directa y sistema suizo.
+
+Cada enfrentamiento es un combate mejor de 3 de `simulate_best_of_three`
+(las mismas reglas que POST /batallas/). Los enfrentamientos de una misma
+jornada son independientes y se simulan a la vez en el pool de procesos; las
+subidas de nivel se aplican a los equipos entre jornadas, igual que si los
+combates se hubieran lanzado uno tras otro.
+
+Este módulo no toca la base de datos: devuelve los enfrentamientos (con su
+semilla y foto de estadísticas) para que el llamador los persista.
+"""
+import asyncio
+import math
+from dataclasses import replace
+from typing import Dict, List, Literal, Optional, Sequence, Set, Tuple
+
+from .battle_engine import MAX_POKEMON_LEVEL, PokemonStats, TrainerInfo, build_snapshot, simulate_best_of_three
+from .workers import run_in_battle_pool
+
+TournamentFormat = Literal["round_robin", "single_elimination", "swiss"]
+
+MAX_TOURNAMENT_TRAINERS = 64
+
+# Puntos por enfrentamiento (los descansos del sistema suizo cuentan como victoria)
+POINTS_WIN = 3
+POINTS_DRAW = 1
+
+# --------------------------------------------------
+# EMPAREJAMIENTOS
+# --------------------------------------------------
+
+def round_robin_schedule(trainer_ids: Sequence[int]) -> List[List[Tuple[int, int]]]:
+    """
+    Calendario de todos contra todos (método del círculo).
+    Con un número impar de entrenadores, cada jornada uno descansa.
+    """
+    ids: List[Optional[int]] = list(trainer_ids)
+    if len(ids) % 2:
+        ids.append(None)
+
+    schedule = []
+    for _ in range(len(ids) - 1):
+        pairs = []
+        for i in range(len(ids) // 2):
+            home, away = ids[i], ids[-1 - i]
+            if home is not None and away is not None:
+                pairs.append((home, away))
+        schedule.append(pairs)
+        ids = [ids[0], ids[-1]] + ids[1:-1]  # Rotar todos menos el primero
+    return schedule
+
+def elimination_pairings(alive: Sequence[int]) -> Tuple[List[Tuple[int, int]], List[int]]:
+    """
+    Cruces de una ronda de eliminación directa: mejor sembrado contra peor.
+    Si el número de entrenadores no es potencia de 2, los mejores sembrados
+    pasan sin pelear lo justo para que la siguiente ronda sí lo sea.
+    Retorna: (cruces, entrenadores con pase directo)
+    """
+    bracket_size = 1 << (len(alive) - 1).bit_length()
+    n_byes = bracket_size - len(alive)
+    byes, playing = list(alive[:n_byes]), list(alive[n_byes:])
+    half = len(playing) // 2
+    return [(playing[i], playing[-1 - i]) for i in range(half)], byes
+
+def swiss_pairings(
+    ranking: Sequence[int],
+    played: Set[frozenset],
+    had_bye: Set[int]
+) -> Tuple[List[Tuple[int, int]], Optional[int]]:
+    """
+    Cruces de una ronda del sistema suizo sobre la clasificación actual.
+    Cada entrenador enfrenta al siguiente de la tabla con el que no haya
+    peleado; si ya enfrentó a todos los disponibles, se permite la revancha.
+    Con un número impar, descansa el peor clasificado que no haya descansado.
+    Retorna: (cruces, entrenador que descansa o None)
+    """
+    pending = list(ranking)
+    bye = None
+    if len(pending) % 2:
+        bye = next((t for t in reversed(pending) if t not in had_bye), pending[-1])
+        pending.remove(bye)
+
+    pairs = []
+    while pending:
+        first = pending.pop(0)
+        rival = next((t for t in pending if frozenset((first, t)) not in played), pending[0])
+        pending.remove(rival)
+        pairs.append((first, rival))
+    return pairs, bye
+
+# --------------------------------------------------
+# CLASIFICACIÓN
+# --------------------------------------------------
+
+def _empty_record(trainer: TrainerInfo, seed_position: int) -> dict:
+    return {
+        "trainer_id": trainer.id,
+        "trainer_name": trainer.name,
+        "seed_position": seed_position,
+        "played": 0,
+        "wins": 0,
+        "draws": 0,
+        "losses": 0,
+        "byes": 0,
+        "points": 0,
+        "round_difference": 0,
+    }
+
+def _ranking(table: Dict[int, dict]) -> List[dict]:
+    """Ordena por puntos, diferencia de rondas ganadas y siembra inicial"""
+    return sorted(
+        table.values(),
+        key=lambda r: (-r["points"], -r["round_difference"], r["seed_position"])
+    )
+
+def _record_match(table: Dict[int, dict], match: dict):
+    trainer, opponent = table[match["trainer_id"]], table[match["opponent_id"]]
+    for record, won, lost in (
+        (trainer, match["trainer_wins"], match["opponent_wins"]),
+        (opponent, match["opponent_wins"], match["trainer_wins"]),
+    ):
+        record["played"] += 1
+        record["round_difference"] += won - lost
+        if match["winner_id"] is None:
+            record["draws"] += 1
+            record["points"] += POINTS_DRAW
+        elif match["winner_id"] == record["trainer_id"]:
+            record["wins"] += 1
+            record["points"] += POINTS_WIN
+        else:
+            record["losses"] += 1
+
+# --------------------------------------------------
+# EJECUCIÓN DEL TORNEO
+# --------------------------------------------------
+
+async def _play_round(
+    round_number: int,
+    pairs: Sequence[Tuple[int, int]],
+    trainers: Dict[int, TrainerInfo],
+    rosters: Dict[int, List[PokemonStats]],
+    keep_winner_pokemon: bool
+) -> List[dict]:
+    """Simula en paralelo los enfrentamientos de una jornada"""
+    outcomes = await asyncio.gather(*(
+        run_in_battle_pool(
+            simulate_best_of_three,
+            trainers[trainer_id],
+            trainers[opponent_id],
+            rosters[trainer_id],
+            rosters[opponent_id],
+            keep_winner_pokemon
+        )
+        for trainer_id, opponent_id in pairs
+    ))
+
+    matches = []
+    for (trainer_id, opponent_id), outcome in zip(pairs, outcomes):
+        matches.append({
+            "round": round_number,
+            "trainer_id": trainer_id,
+            "opponent_id": opponent_id,
+            "winner_id": outcome["winner_id"],
+            "trainer_wins": outcome["trainer_wins"],
+            "opponent_wins": outcome["opponent_wins"],
+            "outcome": outcome,
+            # Estadísticas al iniciar el combate, antes de aplicar sus subidas de nivel
+            "snapshot": build_snapshot(
+                trainers[trainer_id], trainers[opponent_id], rosters[trainer_id], rosters[opponent_id]
+            ),
+        })
+    return matches
+
+def _apply_level_ups(
+    matches: Sequence[dict],
+    rosters: Dict[int, List[PokemonStats]],
+    levels_gained: Dict[int, int]
+):
+    """Sube de nivel los Pokémon de los equipos antes de la siguiente jornada"""
+    round_gains: Dict[int, int] = {}
+    for match in matches:
+        for pokemon_id, gained in match["outcome"]["levels_gained"].items():
+            round_gains[pokemon_id] = round_gains.get(pokemon_id, 0) + gained
+
+    for pokemon_id, gained in round_gains.items():
+        levels_gained[pokemon_id] = levels_gained.get(pokemon_id, 0) + gained
+    for roster in rosters.values():
+        for pokemon in roster:
+            if pokemon.id in round_gains:
+                pokemon.level = min(MAX_POKEMON_LEVEL, pokemon.level + round_gains[pokemon.id])
+
+async def run_tournament(
+    trainers: Sequence[TrainerInfo],
+    rosters: Dict[int, List[PokemonStats]],
+    tournament_format: TournamentFormat = "round_robin",
+    keep_winner_pokemon: bool = True,
+    rounds: Optional[int] = None
+) -> dict:
+    """
+    Juega un torneo completo entre `trainers` (en orden de siembra).
+
+    - round_robin: todos contra todos una vez.
+    - single_elimination: el perdedor queda fuera; los empates los gana el
+      mejor sembrado del cruce.
+    - swiss: `rounds` jornadas (por defecto ceil(log2(n))) emparejando a
+      entrenadores con puntuación similar sin repetir rivales.
+
+    Retorna un diccionario con los enfrentamientos, la clasificación, el
+    campeón, el número de jornadas y los niveles ganados por cada Pokémon en
+    todo el torneo (`levels_gained`).
+    """
+    trainers_by_id = {t.id: t for t in trainers}
+    rosters = {trainer_id: [replace(p) for p in roster] for trainer_id, roster in rosters.items()}
+    table = {t.id: _empty_record(t, position) for position, t in enumerate(trainers, start=1)}
+    matches: List[dict] = []
+    levels_gained: Dict[int, int] = {}
+    champion_id = None
+
+    async def play(round_number: int, pairs: Sequence[Tuple[int, int]]) -> List[dict]:
+        played = await _play_round(round_number, pairs, trainers_by_id, rosters, keep_winner_pokemon)
+        for match in played:
+            _record_match(table, match)
+        _apply_level_ups(played, rosters, levels_gained)
+        matches.extend(played)
+        return played
+
+    if tournament_format == "round_robin":
+        schedule = round_robin_schedule(list(trainers_by_id))
+        for round_number, pairs in enumerate(schedule, start=1):
+            await play(round_number, pairs)
+        total_rounds = len(schedule)
+
+    elif tournament_format == "single_elimination":
+        alive = list(trainers_by_id)
+        total_rounds = 0
+        while len(alive) > 1:
+            total_rounds += 1
+            pairs, byes = elimination_pairings(alive)
+            for bye in byes:
+                table[bye]["byes"] += 1
+            played = await play(total_rounds, pairs)
+            # En empate avanza el mejor sembrado (lado del entrenador en el cruce)
+            advancing = {m["winner_id"] if m["winner_id"] is not None else m["trainer_id"] for m in played}
+            alive = [t for t in alive if t in advancing or t in byes]
+        champion_id = alive[0]
+
+    elif tournament_format == "swiss":
+        # Sin repetir rivales no hay más de n - 1 jornadas
+        total_rounds = min(
+            rounds or max(1, math.ceil(math.log2(len(trainers_by_id)))),
+            len(trainers_by_id) - 1
+        )
+        played_pairs: Set[frozenset] = set()
+        had_bye: Set[int] = set()
+        for round_number in range(1, total_rounds + 1):
+            ranking = [r["trainer_id"] for r in _ranking(table)]
+            pairs, bye = swiss_pairings(ranking, played_pairs, had_bye)
+            if bye is not None:
+                had_bye.add(bye)
+                table[bye]["byes"] += 1
+                table[bye]["points"] += POINTS_WIN
+            played_pairs.update(frozenset(pair) for pair in pairs)
+            await play(round_number, pairs)
+
+    else:
+        raise ValueError(f"Formato de torneo desconocido: {tournament_format}")
+
+    standings = _ranking(table)
+    if tournament_format == "single_elimination":
+        # El campeón encabeza la tabla aunque otro sume más puntos
+        standings.sort(key=lambda r: r["trainer_id"] != champion_id)
+    elif standings:
+        champion_id = standings[0]["trainer_id"]
+    for position, record in enumerate(standings, start=1):
+        record["position"] = position
+
+    return {
+        "format": tournament_format,
+        "rounds": total_rounds,
+        "champion_id": champion_id,
+        "champion_name": trainers_by_id[champion_id].name if champion_id is not None else None,
+        "matches": matches,
+        "standings": standings,
+        "levels_gained": levels_gained,
+    }
@@ -0,0 +1,219 @@
+"""
+Registro de tipos Pokémon y tabla de efectividades precompilada.
+
+Cada cadena `element` (ej: "Fuego/Volador") se traduce una sola vez a un
+identificador entero. Con esos identificadores se consulta una matriz densa
+[atacante, defensor] que ya incluye todas las combinaciones de tipo doble, de
+modo que el multiplicador de un turno es una búsqueda O(1).
+"""
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, List, Tuple
+import threading
+
+import numpy as np
+
+# --------------------------------------------------
+# TABLA DE EFECTIVIDADES (TIPO SIMPLE)
+# --------------------------------------------------
+
+TYPE_ADVANTAGES = {
+    "Planta": {
+        "Agua": 2.0, "Roca": 2.0, "Tierra": 2.0,
+        "Fuego": 0.5, "Volador": 0.5, "Bicho": 0.5, "Hielo": 0.5, "Veneno": 0.5,
+    },
+    "Fuego": {
+        "Planta": 2.0, "Bicho": 2.0, "Hielo": 2.0, "Acero": 2.0,
+        "Agua": 0.5, "Roca": 0.5, "Tierra": 0.5,
+    },
+    "Agua": {
+        "Fuego": 2.0, "Roca": 2.0, "Tierra": 2.0,
+        "Eléctrico": 0.5, "Planta": 0.5,
+    },
+    "Eléctrico": {
+        "Agua": 2.0, "Volador": 2.0,
+        "Tierra": 0.5,
+    },
+    "Hielo": {
+        "Planta": 2.0, "Tierra": 2.0, "Volador": 2.0, "Dragón": 2.0,
+        "Fuego": 0.5, "Lucha": 0.5, "Roca": 0.5, "Acero": 0.5,
+    },
+    "Lucha": {
+        "Normal": 2.0, "Hielo": 2.0, "Roca": 2.0, "Siniestro": 2.0, "Acero": 2.0,
+        "Volador": 0.5, "Psíquico": 0.5, "Hada": 0.5,
+    },
+    "Veneno": {
+        "Planta": 2.0, "Hada": 2.0,
+        "Tierra": 0.5, "Psíquico": 0.5,
+    },
+    "Tierra": {
+        "Fuego": 2.0, "Eléctrico": 2.0, "Veneno": 2.0, "Roca": 2.0, "Acero": 2.0,
+        "Agua": 0.5, "Planta": 0.5, "Hielo": 0.5,
+    },
+    "Volador": {
+        "Planta": 2.0, "Lucha": 2.0, "Bicho": 2.0,
+        "Eléctrico": 0.5, "Hielo": 0.5, "Roca": 0.5,
+    },
+    "Psíquico": {
+        "Lucha": 2.0, "Veneno": 2.0,
+        "Bicho": 0.5, "Fantasma": 0.5, "Siniestro": 0.5,
+    },
+    "Bicho": {
+        "Planta": 2.0, "Psíquico": 2.0, "Siniestro": 2.0,
+        "Fuego": 0.5, "Volador": 0.5, "Roca": 0.5,
+    },
+    "Roca": {
+        "Fuego": 2.0, "Hielo": 2.0, "Volador": 2.0, "Bicho": 2.0,
+        "Agua": 0.5, "Planta": 0.5, "Lucha": 0.5, "Tierra": 0.5, "Acero": 0.5,
+    },
+    "Fantasma": {
+        # Fantasma contra Fantasma figuraba como 2x y 0.5x; se conserva la efectividad
+        "Psíquico": 2.0, "Fantasma": 2.0,
+        "Siniestro": 0.5,
+    },
+    "Dragón": {
+        "Dragón": 2.0,
+        "Acero": 0.5,
+    },
+    "Siniestro": {
+        "Psíquico": 2.0, "Fantasma": 2.0,
+        "Lucha": 0.5, "Bicho": 0.5, "Hada": 0.5,
+    },
+    "Acero": {
+        "Hielo": 2.0, "Roca": 2.0, "Hada": 2.0,
+        "Fuego": 0.5, "Lucha": 0.5, "Tierra": 0.5,
+    },
+    "Hada": {
+        "Lucha": 2.0, "Dragón": 2.0, "Siniestro": 2.0,
+        "Veneno": 0.5, "Acero": 0.5,
+    },
+}
+
+# Tipos simples conocidos (incluye los que solo aparecen como defensores)
+BASE_TYPES: List[str] = sorted(
+    set(TYPE_ADVANTAGES) | {t for chart in TYPE_ADVANTAGES.values() for t in chart} | {"Normal"}
+)
+
+# --------------------------------------------------
+# REGISTRO DE TIPOS Y MATRIZ DENSA
+# --------------------------------------------------
+
+def _parse_element(element: str) -> Tuple[str, ...]:
+    """
+    Convierte una cadena de tipos en su clave canónica: tipos conocidos,
+    sin repetir y ordenados. Los tipos desconocidos no alteran el daño (1x),
+    por lo que se descartan.
+    """
+    parts = {part.strip() for part in (element or "Normal").split("/")}
+    return tuple(sorted(part for part in parts if part in BASE_TYPES))
+
+def _combined_multiplier(attacker: Tuple[str, ...], defender: Tuple[str, ...]) -> float:
+    """Producto de las efectividades de cada tipo atacante contra cada tipo defensor"""
+    multiplier = 1.0
+    for atk_type in attacker:
+        chart = TYPE_ADVANTAGES.get(atk_type, {})
+        for def_type in defender:
+            multiplier *= chart.get(def_type, 1.0)
+    return multiplier
+
+class TypeChart:
+    """
+    Registro de combinaciones de tipo con su matriz de multiplicadores.
+
+    - `matrix`: arreglo NumPy [atacante, defensor] para uso vectorizado.
+    - `rows`: la misma matriz como listas de Python para búsquedas escalares rápidas.
+
+    Las tablas nunca se modifican en el lugar: registrar una combinación nueva
+    (con el lock tomado) publica tablas nuevas y recién después su
+    identificador, así los hilos que simulan batallas nunca ven un
+    identificador sin su fila.
+    """
+
+    def __init__(self):
+        self._ids: Dict[Tuple[str, ...], int] = {}
+        self._keys: List[Tuple[str, ...]] = []
+        self._lock = threading.Lock()
+
+        # Tipo simple, combinaciones dobles y la clave vacía (solo tipos desconocidos)
+        keys = [()] + [(t,) for t in BASE_TYPES] + list(combinations(BASE_TYPES, 2))
+        for key in keys:
+            self._ids[key] = len(self._keys)
+            self._keys.append(key)
+        self._publish(np.array(
+            [[_combined_multiplier(a, d) for d in self._keys] for a in self._keys],
+            dtype=np.float64,
+        ))
+
+    def _publish(self, matrix: np.ndarray):
+        """Reemplaza `matrix`, `rows` y los vectores cacheados por las tablas nuevas"""
+        matrix.setflags(write=False)
+        self.matrix, self.rows, self._vectors = matrix, matrix.tolist(), {}
+
+    def type_id(self, element: str) -> int:
+        """
+        Identificador entero de una cadena `element`.
+        Las combinaciones de más de dos tipos se registran bajo demanda.
+        """
+        key = _parse_element(element)
+        type_id = self._ids.get(key)
+        if type_id is None:
+            with self._lock:
+                type_id = self._ids.get(key)
+                if type_id is None:
+                    type_id = self._register(key)
+        return type_id
+
+    def _register(self, key: Tuple[str, ...]) -> int:
+        """
+        Agrega la combinación `key` (con el lock tomado). Solo se calculan su
+        fila y su columna; el resto se copia de la matriz actual.
+        """
+        type_id = len(self._keys)
+        self._keys.append(key)
+        matrix = np.empty((type_id + 1, type_id + 1), dtype=np.float64)
+        matrix[:type_id, :type_id] = self.matrix
+        matrix[type_id] = [_combined_multiplier(key, d) for d in self._keys]
+        matrix[:type_id, type_id] = [_combined_multiplier(a, key) for a in self._keys[:-1]]
+        self._publish(matrix)
+        self._ids[key] = type_id  # Después de publicar las tablas que lo incluyen
+        return type_id
+
+    def vector(self, element: str) -> np.ndarray:
+        """
+        Fila de `matrix` de un atacante de tipo `element`, cacheada por cadena
+        junto a las tablas vigentes (una combinación nueva la vuelve a tomar
+        de la matriz ampliada).
+        """
+        vector = self._vectors.get(element)
+        if vector is None:
+            type_id = self.type_id(element)
+            vectors = self._vectors
+            vector = vectors[element] = self.matrix[type_id]
+        return vector
+
+    def multiplier(self, attacker_id: int, defender_id: int) -> float:
+        """Multiplicador de daño entre dos identificadores de tipo"""
+        return self.rows[attacker_id][defender_id]
+
+TYPE_CHART = TypeChart()
+
+# --------------------------------------------------
+# API DE CONSULTA
+# --------------------------------------------------
+
+@lru_cache(maxsize=None)
+def get_type_id(element: str) -> int:
+    """Identificador de tipo cacheado por cadena `element` (None equivale a "Normal")"""
+    return TYPE_CHART.type_id(element or "Normal")
+
+def get_type_vector(element: str) -> np.ndarray:
+    """
+    Vector de efectividades de un Pokémon atacante contra cada identificador de tipo.
+    Se calcula una vez por cadena `element` y se reutiliza en todas las batallas;
+    cubre todos los identificadores obtenidos antes de pedirlo.
+    """
+    return TYPE_CHART.vector(element or "Normal")
+
+def get_type_multiplier(attacker_type: str, defender_type: str) -> float:
+    """Calcula el multiplicador de daño basado en los tipos"""
+    return TYPE_CHART.multiplier(get_type_id(attacker_type), get_type_id(defender_type))
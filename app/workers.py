@@ -0,0 +1,43 @@
+"""
+Pool de procesos para trabajo CPU intensivo (simulaciones de batalla).
+
+El número de procesos se configura con la variable de entorno
+BATTLE_POOL_WORKERS. Con 0 las simulaciones se ejecutan en un hilo del
+proceso actual (útil en desarrollo), nunca en el event loop.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Optional
+import asyncio
+import multiprocessing
+import os
+
+BATTLE_POOL_WORKERS = int(os.getenv("BATTLE_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+_executor: Optional[Executor] = None
+
+def get_battle_executor() -> Optional[Executor]:
+    """Crea el pool la primera vez que se necesita (None si está deshabilitado)"""
+    global _executor
+    if _executor is None and BATTLE_POOL_WORKERS > 0:
+        # "spawn" evita heredar el event loop y las conexiones del proceso padre
+        _executor = ProcessPoolExecutor(
+            max_workers=BATTLE_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+async def run_in_battle_pool(func, *args, **kwargs):
+    """
+    Ejecuta `func(*args, **kwargs)` en el pool de procesos sin bloquear el event loop.
+    La función y sus argumentos deben poder serializarse con pickle.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_battle_executor(), partial(func, *args, **kwargs))
+
+def shutdown_battle_executor():
+    """Detiene el pool de procesos (evento de apagado de la aplicación)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None